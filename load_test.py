@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Load test for the web interface API.
+Sends concurrent keep-alive requests to the idea routes and reports latency percentiles.
+"""
+
+import argparse
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+DEFAULT_ROUTES = [
+    '/api/ideas',
+    '/api/ideas?limit=200',
+    '/api/ideas?format=tutorial&platform=YouTube',
+    '/api/ideas/facets'
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test the Business Content Agent web API")
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help="server base URL")
+    parser.add_argument('--requests', type=int, default=2000, help="requests per route")
+    parser.add_argument('--concurrency', type=int, default=16, help="concurrent connections")
+    parser.add_argument('--route', action='append', dest='routes', help="route to test (repeatable)")
+    parser.add_argument('--gzip', action='store_true', help="send Accept-Encoding: gzip")
+    parser.add_argument('--ideas', type=int, default=0,
+                        help="publish this many generated ideas first (for an empty server)")
+    return parser.parse_args()
+
+
+def publish_ideas(base, count):
+    """POST a generated idea set so the routes have something to serve"""
+    from src.script_generator import ScriptGenerator
+
+    ideas = ScriptGenerator().generate_ideas({}, {}, count).to_dicts()
+    connection = http.client.HTTPConnection(base.hostname, base.port or 80, timeout=60)
+    connection.request('POST', '/api/ideas', body=json.dumps({'ideas': ideas}),
+                       headers={'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    print(f"Published idea set: {response.read().decode('utf-8')}")
+    connection.close()
+
+
+def run_route(base, route, total, concurrency, headers):
+    """Hit one route ``total`` times over ``concurrency`` connections"""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    remaining = [total]
+
+    def worker():
+        connection = http.client.HTTPConnection(base.hostname, base.port or 80, timeout=30)
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    break
+                remaining[0] -= 1
+            start = time.perf_counter()
+            try:
+                connection.request('GET', route, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                elapsed = time.perf_counter() - start
+                with lock:
+                    if response.status >= 400:
+                        errors.append(response.status)
+                    else:
+                        latencies.append(elapsed)
+            except (OSError, http.client.HTTPException) as e:
+                with lock:
+                    errors.append(type(e).__name__)
+                connection.close()
+                connection = http.client.HTTPConnection(base.hostname, base.port or 80, timeout=30)
+        connection.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - started
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float('nan')
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def main():
+    args = parse_args()
+    base = urlsplit(args.url)
+    headers = {'Accept-Encoding': 'gzip'} if args.gzip else {}
+
+    if args.ideas:
+        publish_ideas(base, args.ideas)
+
+    print(f"{'route':<48} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for route in args.routes or DEFAULT_ROUTES:
+        latencies, errors, duration = run_route(base, route, args.requests, args.concurrency, headers)
+        latencies.sort()
+        print(f"{route:<48} {len(latencies) / duration:>8.0f} "
+              f"{percentile(latencies, 0.50) * 1000:>8.2f} {percentile(latencies, 0.95) * 1000:>8.2f} "
+              f"{percentile(latencies, 0.99) * 1000:>8.2f} {len(errors):>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,10 @@ generating audiovisual content script ideas, and iteratively improving based on
 """
 
 import os
+import argparse
 import json
 import sys
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from pathlib import Path
 
 # Add src to path
@@ -15,12 +17,25 @@ sys.path.insert(0, str(Path(__file__).parent / 'src'))
 
 from src.drive_access import GoogleDriveAccess
 from src.text_processor import TextProcessor
+from src.duplicate_detector import DuplicateDetector
+from src.pipelined_ingest import PipelinedIngest
+from src.sharding import ShardedIngest
+from src.pipeline import Components, Pipeline, Stage
+from src.checkpoint import CheckpointStore
 from src.web_search import WebSearch
 from src.form_handler import FormHandler
 from src.business_analyzer import BusinessAnalyzer
 from src.audience_analyzer import AudienceAnalyzer
 from src.script_generator import ScriptGenerator
+from src.feedback_log import FeedbackLog
+from src.run_budget import RunBudget
+from src.vocabulary import Vocabulary
 from src.ui import UserInterface
+from src.web_server import WebServer
+from src.daemon import AgentDaemon, DaemonClient, RemoteFormHandler
+
+CHECKPOINT_ARTIFACTS = ['processed_data', 'additional_info', 'form_answers',
+                        'business_analysis', 'audience_profile', 'script_ideas']
 
 def load_config():
     """Load configuration from config.json"""
@@ -28,53 +43,282 @@ def load_config():
     with open(config_path, 'r') as f:
         return json.load(f)
 
-def main():
-    """Main execution flow"""
-    print("Starting Business Content Agent...")
+def build_stages(config, components, budget=None):
+    """Declare the pipeline stages with their inputs and outputs"""
+    # Drive and NLP components are looked up when their stages run, so a resumed run never builds them
+    duplicate_detector = components['duplicate_detector']
+    web_search = components['web_search']
+    form_handler = components['form_handler']
+    business_analyzer = components['business_analyzer']
+    audience_analyzer = components['audience_analyzer']
+    script_generator = components['script_generator']
 
-    # Load configuration
-    config = load_config()
+    pipeline_config = config.get('pipeline', {})
+    dedup_enabled = config.get('dedup', {}).get('enabled', True)
+    form_config = config.get('form', {})
+    budget = budget or RunBudget()
+
+    def stage_budget(name):
+        # Components only get a budget, and only check the clock, when a limit is set
+        return budget.stage(name) if budget.enabled else None
+
+    def fetch_documents(drive_config):
+        # Step 1: Access Google Drive and extract business information
+        print("Accessing Google Drive repository...")
+        documents = components['drive_access'].get_documents(stage_budget('drive'))
+
+        # Collapse near-identical drafts so each is only parsed and counted once
+        if dedup_enabled:
+            documents, duplicates = duplicate_detector.collapse(documents)
+            for cluster in duplicates:
+                print(f"Skipping near-duplicates of {cluster['kept']}: {', '.join(cluster['collapsed'])}")
+        return documents
+
+    def process_documents(documents):
+        # Step 2: Process documents to understand context and key ideas
+        print("Processing documents...")
+        return components['text_processor'].process_documents(documents, stage_budget('nlp'))
+
+    def search(processed_data):
+        # Step 3: Search for additional relevant information
+        print("Searching for additional information...")
+        vocabulary = processed_data['vocabulary']
+        return web_search.search_related_info(vocabulary.terms_of(Vocabulary.KEY_IDEA), vocabulary,
+                                              stage_budget('search'))
+
+    def ingest(drive_config):
+        # Steps 1-3 overlapped: download, parse and search run concurrently
+        print("Accessing Google Drive, processing documents and searching concurrently...")
+        pipelined = PipelinedIngest(components['drive_access'], components['text_processor'], web_search,
+                                    pipeline_config, duplicate_detector if dedup_enabled else None)
+        processed_data, additional_info, _ = pipelined.run(stage_budget('ingest'))
+        return processed_data, additional_info
+
+    def map_reduce(drive_config):
+        # Steps 1-2 as map/reduce: shards are processed by separate workers and merged
+        print("Accessing Google Drive and processing document shards...")
+        return ShardedIngest(config, components['drive_access']).run()
+
+    def request_form(processed_data, additional_info):
+        # Step 4: Request additional information if needed
+        print("Checking if additional information is needed...")
+        if not business_analyzer.has_sufficient_info(processed_data, additional_info):
+            if form_config.get('speculative'):
+                # Carry on without answers; generate_script_ideas folds them in when they arrive
+                form_handler.start(console=form_config.get('channel', 'console') == 'console')
+                return {}
+            return form_handler.request_additional_info()
+        return {}
+
+    def split_answers(form_answers):
+        # Each analysis only sees the answers it uses, so other answers don't invalidate it
+        return form_handler.split_answers(form_answers)
+
+    def analyze_business(processed_data, additional_info, business_answers):
+        # Step 5: Perform business topological analysis
+        print("Performing business analysis...")
+        return business_analyzer.analyze_business(dict(processed_data, **business_answers), additional_info,
+                                                  stage_budget('business_analysis'),
+                                                  budget.max_relationship_entities)
+
+    def analyze_audience(business_analysis, audience_answers):
+        # Step 6: Analyze target audience
+        print("Analyzing target audience...")
+        return audience_analyzer.analyze_audience(business_analysis, audience_answers)
+
+    def generate_ideas(business_analysis, audience_profile, preferences):
+        # Step 7: Generate 40 script ideas, leaning towards what past feedback favoured
+        print("Generating script ideas...")
+        return script_generator.generate_ideas(business_analysis, audience_profile, 40, preferences)
 
-    # Initialize components
+    def stage_config(*sections):
+        # The settings a stage's result depends on; changing them invalidates its cache
+        return {section: config.get(section) for section in sections}
+
+    # Drive contents can change between runs, so documents are refetched unless configured otherwise
+    memoize_drive = pipeline_config.get('memoize_drive', False)
+
+    if pipeline_config.get('mode') == 'sharded':
+        stages = [
+            Stage('shards', map_reduce, ['drive_config'], ['processed_data'],
+                  memoize=memoize_drive, depends_on=[GoogleDriveAccess, TextProcessor, ShardedIngest],
+                  config=stage_config('nlp', 'sharding')),
+            Stage('search', search, ['processed_data'], ['additional_info'],
+                  depends_on=[web_search], config=stage_config('web_search'))
+        ]
+    elif pipeline_config.get('mode') == 'pipelined':
+        stages = [
+            Stage('ingest', ingest, ['drive_config'], ['processed_data', 'additional_info'],
+                  memoize=memoize_drive,
+                  depends_on=[GoogleDriveAccess, TextProcessor, web_search, duplicate_detector],
+                  config=stage_config('nlp', 'dedup', 'web_search', 'pipeline'))
+        ]
+    else:
+        stages = [
+            Stage('drive', fetch_documents, ['drive_config'], ['documents'],
+                  memoize=memoize_drive, depends_on=[GoogleDriveAccess, duplicate_detector],
+                  config=stage_config('dedup')),
+            Stage('nlp', process_documents, ['documents'], ['processed_data'],
+                  depends_on=[TextProcessor], config=stage_config('nlp')),
+            Stage('search', search, ['processed_data'], ['additional_info'],
+                  depends_on=[web_search], config=stage_config('web_search'))
+        ]
+
+    return stages + [
+        # Answers come from the user, so the form is never replayed from cache
+        Stage('form', request_form, ['processed_data', 'additional_info'], ['form_answers'],
+              memoize=False, depends_on=[form_handler, business_analyzer]),
+        Stage('answers', split_answers, ['form_answers'], ['business_answers', 'audience_answers'],
+              memoize=False, depends_on=[form_handler]),
+        Stage('business_analysis', analyze_business,
+              ['processed_data', 'additional_info', 'business_answers'], ['business_analysis'],
+              depends_on=[business_analyzer]),
+        Stage('audience', analyze_audience, ['business_analysis', 'audience_answers'], ['audience_profile'],
+              depends_on=[audience_analyzer]),
+        # Ideas are sampled at random, so every run draws a fresh set
+        Stage('scripts', generate_ideas, ['business_analysis', 'audience_profile', 'preferences'],
+              ['script_ideas'],
+              memoize=False, depends_on=[script_generator])
+    ]
+
+def check_config(config):
+    """Validate the configuration without touching the network or loading models"""
+    problems = []
+
+    for section in ['google_drive', 'web_search', 'nlp', 'ui']:
+        if section not in config:
+            problems.append(f"Missing '{section}' section")
+
+    drive_config = config.get('google_drive', {})
+    if not drive_config.get('folder_id') or drive_config['folder_id'].startswith(('YOUR_', 'TU_')):
+        problems.append("google_drive.folder_id is not set")
+    if not Path(drive_config.get('credentials_path', 'credentials.json')).exists() and \
+            not Path(drive_config.get('token_path', 'token.json')).exists():
+        problems.append("Neither the Drive credentials file nor a saved token exists")
+
+    nlp_config = config.get('nlp', {})
+    default_language = nlp_config.get('default_language', 'en')
+    if nlp_config.get('models') and default_language not in nlp_config['models']:
+        problems.append(f"nlp.default_language '{default_language}' has no model in nlp.models")
+
+    search_config = config.get('web_search', {})
+    if search_config.get('api_key', '').startswith(('YOUR_', 'TU_')):
+        problems.append("web_search.api_key is not set")
+
+    for problem in problems:
+        print(f"✗ {problem}")
+    if not problems:
+        print("✓ Configuration looks complete")
+    return not problems
+
+def list_documents(config):
+    """Print the Drive files a run would process"""
     drive_access = GoogleDriveAccess(config['google_drive'])
-    text_processor = TextProcessor(config['nlp'])
-    web_search = WebSearch(config['web_search'])
-    form_handler = FormHandler()
-    business_analyzer = BusinessAnalyzer()
-    audience_analyzer = AudienceAnalyzer()
-    script_generator = ScriptGenerator()
-    ui = UserInterface(config['ui'])
-
-    # Step 1: Access Google Drive and extract business information
-    print("Accessing Google Drive repository...")
-    documents = drive_access.get_documents()
-
-    # Step 2: Process documents to understand context and key ideas
-    print("Processing documents...")
-    processed_data = text_processor.process_documents(documents)
-
-    # Step 3: Search for additional relevant information
-    print("Searching for additional information...")
-    additional_info = web_search.search_related_info(processed_data['key_ideas'])
-
-    # Step 4: Request additional information if needed
-    print("Checking if additional information is needed...")
-    if not business_analyzer.has_sufficient_info(processed_data, additional_info):
-        additional_data = form_handler.request_additional_info()
-        processed_data.update(additional_data)
-
-    # Step 5: Perform business topological analysis
-    print("Performing business analysis...")
-    business_analysis = business_analyzer.analyze_business(processed_data, additional_info)
-
-    # Step 6: Analyze target audience
-    print("Analyzing target audience...")
-    audience_profile = audience_analyzer.analyze_audience(business_analysis)
-
-    # Step 7: Generate 40 script ideas
-    print("Generating script ideas...")
-    script_ideas = script_generator.generate_ideas(business_analysis, audience_profile, 40)
+    files = drive_access.list_files()
+    for item in files:
+        print(f"{item.get('path', item['name'])}  ({item['mimeType']})")
+    print(f"{len(files)} documents")
+
+def create_components(config):
+    """Initialize components"""
+    feedback_config = config.get('feedback', {})
+    return Components({
+        'duplicate_detector': DuplicateDetector(config.get('dedup')),
+        'web_search': WebSearch(config['web_search']),
+        'form_handler': FormHandler(),
+        'business_analyzer': BusinessAnalyzer(),
+        'audience_analyzer': AudienceAnalyzer(),
+        'script_generator': ScriptGenerator(),
+        'feedback_log': FeedbackLog(feedback_config) if feedback_config.get('enabled') else None
+    }, factories={
+        # Built when a stage first needs them; loading spaCy alone takes seconds
+        'drive_access': lambda: GoogleDriveAccess(config['google_drive']),
+        'text_processor': lambda: TextProcessor(config['nlp'])
+    })
+
+def generate_script_ideas(config, components, form_answers=None):
+    """Run steps 1-7 and return every pipeline result by name"""
+    # Steps 1-7 run as a stage graph; finished stages are memoized so a rerun resumes
+    pipeline_config = config.get('pipeline', {})
+    budget = RunBudget(config.get('budget'))
+    pipeline = Pipeline(build_stages(config, components, budget),
+                        cache_dir=pipeline_config.get('cache_dir', '.cache/pipeline'),
+                        max_workers=pipeline_config.get('max_workers', 4),
+                        # Cut-short results must not be replayed later as if they were complete
+                        memoize_if=lambda stage: not budget.degraded(stage.name))
+    feedback_log = components.get('feedback_log')
+    initial = {'drive_config': config['google_drive'],
+               'preferences': feedback_log.preferences() if feedback_log else {}}
+    if form_answers is not None:
+        initial['form_answers'] = form_answers
+
+    # Optionally start from checkpointed artifacts instead of recomputing them
+    checkpoint_config = config.get('checkpoint', {})
+    checkpoints = CheckpointStore(checkpoint_config) if checkpoint_config.get('enabled') else None
+    if checkpoints:
+        for name in checkpoint_config.get('resume', []):
+            if checkpoints.exists(name) and name not in initial:
+                print(f"Loading checkpoint: {name}")
+                initial[name] = checkpoints.load(name)
+
+    # Only what the ideas depend on runs, so resumed artifacts skip Drive and spaCy entirely
+    results = pipeline.run(initial, targets=['script_ideas'])
+
+    form_handler = components['form_handler']
+    if form_handler.pending is not None:
+        # Everything so far ran speculatively without the form; fold the answers in now
+        answers = wait_for_form(form_handler, budget, config.get('form', {}).get('timeout_s', 300))
+        if answers:
+            print("Updating the analysis with the form answers...")
+            results = pipeline.update(results, {'form_answers': answers}, targets=['script_ideas'])
 
+    results['run_report'] = budget.report()
+    if budget.enabled:
+        print_run_report(results['run_report'])
+
+    if checkpoints:
+        print("Saving checkpoints...")
+        for name in CHECKPOINT_ARTIFACTS:
+            if name in results and name not in initial:
+                checkpoints.save(name, results[name])
+
+    return results
+
+def wait_for_form(form_handler, budget, timeout):
+    """Answers of the speculatively opened form, or ``{}`` if they don't come in time"""
+    remaining = budget.remaining()
+    if remaining is not None:
+        timeout = min(timeout, remaining) if timeout else remaining
+    print("Ideas are ready from the documents alone; waiting for the form answers...")
+    future = form_handler.pending
+    try:
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # Later steps read the console, so its form reader has to stop first
+            if form_handler.cancel():
+                budget.degrade('form', f"no answers within {timeout:.0f}s; kept the ideas from the documents alone")
+                return {}
+            print("The form can't be interrupted on this console; please finish it to continue")
+            return future.result()
+    except (Exception, KeyboardInterrupt) as e:
+        print(f"Form not answered ({type(e).__name__}); keeping the ideas from the documents alone")
+        return {}
+    finally:
+        # Late answers are refused rather than silently ignored
+        form_handler.cancel()
+
+def print_run_report(report):
+    """Print how long the run took and what was degraded to meet its deadline"""
+    deadline = f" of {report['deadline_s']}s" if report['deadline_s'] is not None else ""
+    print(f"Run took {report['elapsed_s']}s{deadline}" + ("" if report['on_time'] else " (late)"))
+    if not report['degradations']:
+        print("Nothing was degraded")
+    for entry in report['degradations']:
+        print(f"  - {entry['stage']}: {entry['detail']} (at {entry['at']}s)")
+
+def present_and_improve(ui, script_generator, script_ideas):
+    """Steps 8-9: present ideas, collect feedback and improve until the user is done"""
     # Step 8: Present ideas to user and collect feedback
     print("Presenting ideas to user...")
     selected_ideas, feedback = ui.present_ideas_and_get_feedback(script_ideas)
@@ -85,7 +329,157 @@ def main():
         improved_ideas = script_generator.improve_ideas(selected_ideas, feedback)
         selected_ideas, feedback = ui.present_ideas_and_get_feedback(improved_ideas)
 
+def run(config):
+    """Main execution flow"""
+    print("Starting Business Content Agent...")
+
+    components = create_components(config)
+    ui = UserInterface(config['ui'], components['feedback_log'], components['form_handler'])
+    form_config = config.get('form', {})
+    if form_config.get('speculative') and form_config.get('channel') == 'web':
+        # The form is answered in the browser while the analysis runs
+        ui.serve_in_background()
+        print(f"Answer the form, if asked, at http://{config['ui'].get('host', '127.0.0.1')}:"
+              f"{config['ui']['port']}/form")
+
+    results = generate_script_ideas(config, components)
+    present_and_improve(ui, components['script_generator'], results['script_ideas'])
+
+    print("Process completed successfully!")
+
+def daemon_socket(config):
+    """Path of the daemon's Unix socket"""
+    return config.get('daemon', {}).get('socket_path', '.cache/agent.sock')
+
+def serve_daemon(config):
+    """Keep components warm and serve analysis jobs over a Unix socket"""
+    print("Starting Business Content Agent daemon...")
+    components = create_components(config)
+
+    # Authenticate and load the default model now so the first job does not pay for them
+    components['drive_access'].service
+    components['text_processor']
+    # The daemon has no terminal; questions are sent back to the client instead
+    components['form_handler'] = RemoteFormHandler(components['form_handler'].questions)
+
+    def analyze(form_answers=None, deadline=None):
+        job_config = config
+        if deadline:
+            job_config = dict(config, budget=dict(config.get('budget', {}), deadline_s=deadline))
+        script_ideas = generate_script_ideas(job_config, components, form_answers)['script_ideas']
+        # Ideas are compact records internally; the socket carries plain dicts
+        return [dict(idea) for idea in script_ideas]
+
+    AgentDaemon(daemon_socket(config), {'analyze': analyze}).serve_forever()
+
+def run_with_daemon(config):
+    """Run the analysis on a warm daemon and handle the interactive steps locally"""
+    client = DaemonClient(daemon_socket(config))
+    if not client.is_running():
+        print("No daemon is running. Start one with: python main.py daemon")
+        return 1
+
+    print("Sending analysis job to daemon...")
+    deadline = config.get('budget', {}).get('deadline_s')
+    response = client.request('analyze', deadline=deadline)
+    if response['status'] == 'input_required':
+        # Step 4 happens here, where the user is
+        form_answers = FormHandler().request_additional_info()
+        response = client.request('analyze', form_answers=form_answers, deadline=deadline)
+
+    if response['status'] != 'ok':
+        print(f"Daemon job failed: {response.get('error')}")
+        return 1
+
+    feedback_config = config.get('feedback', {})
+    feedback_log = FeedbackLog(feedback_config) if feedback_config.get('enabled') else None
+    present_and_improve(UserInterface(config['ui'], feedback_log), ScriptGenerator(), response['result'])
     print("Process completed successfully!")
+    return 0
+
+def map_shard(config, index):
+    """Process one shard on this node and save its partial for the coordinating run"""
+    shards = config.get('sharding', {}).get('shards', 4)
+    if not 0 <= index < shards:
+        print(f"✗ --shard must be between 0 and {shards - 1} (sharding.shards is {shards})")
+        return False
+    path = ShardedIngest(config, GoogleDriveAccess(config['google_drive'])).map(index)
+    print(f"Saved partial for shard {index} to {path}")
+    return True
+
+def serve_web(config):
+    """Serve the web interface with published ideas loaded before workers start"""
+    feedback_config = config.get('feedback', {})
+    # Every worker appends to the same log; each opens its own writer on first use
+    ui = UserInterface(config['ui'], FeedbackLog(feedback_config) if feedback_config.get('enabled') else None)
+
+    def preload():
+        # No route runs the analysis, so spaCy and the API clients are not loaded here.
+        # Ideas from the last run are published up front so every worker shares them
+        checkpoint_config = config.get('checkpoint', {})
+        if checkpoint_config.get('enabled'):
+            checkpoints = CheckpointStore(checkpoint_config)
+            if checkpoints.exists('script_ideas'):
+                idea_set = ui.publish_ideas(checkpoints.load('script_ideas'))
+                print(f"Published {len(idea_set)} ideas from the last checkpoint")
+
+    ui.run_web_app(preload)
+
+def reload_web(config):
+    """Gracefully replace the workers of a running production server"""
+    pid = WebServer(UserInterface(config['ui']), config['ui']).reload()
+    print(f"Sent reload signal to server {pid}")
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Business Content Agent")
+    subparsers = parser.add_subparsers(dest='command')
+    run_parser = subparsers.add_parser('run', help="run the full analysis and idea generation (default)")
+    run_parser.add_argument('--daemon', action='store_true',
+                            help="send the job to a running daemon instead of loading everything here")
+    run_parser.add_argument('--deadline', type=float, metavar='SECONDS',
+                            help="return ideas within this many seconds, degrading stages as needed")
+    subparsers.add_parser('check-config', help="validate config/config.json")
+    subparsers.add_parser('list-documents', help="list the Drive documents that would be processed")
+    subparsers.add_parser('daemon', help="start a resident daemon that keeps models and clients loaded")
+    subparsers.add_parser('stop-daemon', help="stop the resident daemon")
+    map_parser = subparsers.add_parser('map-shard', help="process one shard of the Drive folder on this node")
+    map_parser.add_argument('--shard', type=int, required=True, help="shard number, from 0")
+    subparsers.add_parser('serve', help="serve the web interface (set ui.mode to 'production' for prefork workers)")
+    subparsers.add_parser('reload-web', help="gracefully restart the workers of a production web server")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Dispatch to the requested command"""
+    args = parse_args(argv)
+    config = load_config()
+    if getattr(args, 'deadline', None):
+        config.setdefault('budget', {})['deadline_s'] = args.deadline
+
+    if args.command == 'check-config':
+        return 0 if check_config(config) else 1
+    if args.command == 'list-documents':
+        list_documents(config)
+        return 0
+    if args.command == 'daemon':
+        serve_daemon(config)
+        return 0
+    if args.command == 'stop-daemon':
+        DaemonClient(daemon_socket(config)).request('shutdown')
+        return 0
+    if args.command == 'map-shard':
+        return 0 if map_shard(config, args.shard) else 1
+    if args.command == 'serve':
+        serve_web(config)
+        return 0
+    if args.command == 'reload-web':
+        reload_web(config)
+        return 0
+    if getattr(args, 'daemon', False):
+        return run_with_daemon(config)
+
+    run(config)
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
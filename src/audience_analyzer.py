@@ -6,6 +6,9 @@ Analyzes target audience characteristics including tone, language, and cultural
 class AudienceAnalyzer:
     """Analyzes target audience characteristics"""
 
+    # Phrases that steer the communication preferences
+    CHANNEL_KEYWORDS = ('social media', 'instagram', 'video', 'blog', 'article', 'presentation')
+
     def __init__(self):
         self.tone_profiles = {
             'professional': ['formal', 'corporate', 'business-like', 'serious'],
@@ -30,18 +33,44 @@ class AudienceAnalyzer:
             'professional': ['expertise', 'credibility', 'results']
         }
 
-    def analyze_audience(self, business_analysis):
-        """Analyze target audience based on business analysis"""
+    def analyze_audience(self, business_analysis, answers=None):
+        """Analyze target audience based on business analysis and any form answers about it"""
+        # Find every keyword in one walk over the analysis instead of flattening it to a string
+        pieces = list(self._text_pieces(business_analysis))
+        if answers:
+            pieces.extend(answer.lower() for answer in answers.values())
+        mentioned = self._mentioned(pieces)
+
         audience_profile = {
             'demographics': self._extract_demographics(business_analysis),
-            'tone': self._determine_tone(business_analysis),
-            'language': self._determine_language(business_analysis),
-            'cultural_elements': self._identify_cultural_elements(business_analysis),
-            'communication_preferences': self._identify_communication_prefs(business_analysis)
+            'tone': self._determine_tone(business_analysis, mentioned),
+            'language': self._determine_language(business_analysis, mentioned),
+            'cultural_elements': self._identify_cultural_elements(business_analysis, mentioned),
+            'communication_preferences': self._identify_communication_prefs(business_analysis, mentioned)
         }
 
         return audience_profile
 
+    def _text_pieces(self, value):
+        """Yield the lowercased strings (keys and values) nested in an analysis"""
+        if isinstance(value, str):
+            yield value.lower()
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                yield from self._text_pieces(key)
+                yield from self._text_pieces(item)
+        elif isinstance(value, (list, tuple, set)):
+            for item in value:
+                yield from self._text_pieces(item)
+
+    def _mentioned(self, pieces):
+        """The keywords of every profile that occur in any of ``pieces``"""
+        keywords = set(self.CHANNEL_KEYWORDS)
+        for profile in (self.tone_profiles, self.language_styles, self.cultural_elements):
+            for words in profile.values():
+                keywords.update(words)
+        return {keyword for keyword in keywords if any(keyword in piece for piece in pieces)}
+
     def _extract_demographics(self, analysis):
         """Extract audience demographics"""
         demographics = {
@@ -52,78 +81,85 @@ class AudienceAnalyzer:
         }
 
         # Analyze structure and market position for demographic clues
-        structure = analysis.get('structure', {})
-        market_pos = analysis.get('market_position', {})
+        structure = list(self._text_pieces(analysis.get('structure', {})))
+        market_pos = list(self._text_pieces(analysis.get('market_position', {})))
+
+        def mentions(pieces, word):
+            return any(word in piece for piece in pieces)
 
         # Simple demographic inference
-        if 'youth' in str(structure).lower() or 'young' in str(market_pos).lower():
+        if mentions(structure, 'youth') or mentions(market_pos, 'young'):
             demographics['age_group'] = '18-35'
-        elif 'professional' in str(structure).lower():
+        elif mentions(structure, 'professional'):
             demographics['age_group'] = '25-55'
 
-        if 'premium' in str(market_pos).lower():
+        if mentions(market_pos, 'premium'):
             demographics['income_level'] = 'high'
-        elif 'budget' in str(market_pos).lower():
+        elif mentions(market_pos, 'budget'):
             demographics['income_level'] = 'medium'
 
         return demographics
 
-    def _determine_tone(self, analysis):
+    def _determine_tone(self, analysis, mentioned=None):
         """Determine appropriate tone for content"""
-        text_content = str(analysis).lower()
+        if mentioned is None:
+            mentioned = self._mentioned(list(self._text_pieces(analysis)))
 
         tone_scores = {}
         for tone, keywords in self.tone_profiles.items():
-            score = sum(1 for keyword in keywords if keyword in text_content)
+            score = sum(1 for keyword in keywords if keyword in mentioned)
             tone_scores[tone] = score
 
         # Return tone with highest score, default to professional
         best_tone = max(tone_scores, key=tone_scores.get)
         return best_tone if tone_scores[best_tone] > 0 else 'professional'
 
-    def _determine_language(self, analysis):
+    def _determine_language(self, analysis, mentioned=None):
         """Determine language style"""
-        text_content = str(analysis).lower()
+        if mentioned is None:
+            mentioned = self._mentioned(list(self._text_pieces(analysis)))
 
         language_scores = {}
         for style, keywords in self.language_styles.items():
-            score = sum(1 for keyword in keywords if keyword in text_content)
+            score = sum(1 for keyword in keywords if keyword in mentioned)
             language_scores[style] = score
 
         # Return style with highest score, default to simple
         best_style = max(language_scores, key=language_scores.get)
         return best_style if language_scores[best_style] > 0 else 'simple'
 
-    def _identify_cultural_elements(self, analysis):
+    def _identify_cultural_elements(self, analysis, mentioned=None):
         """Identify relevant cultural elements"""
-        text_content = str(analysis).lower()
+        if mentioned is None:
+            mentioned = self._mentioned(list(self._text_pieces(analysis)))
 
         cultural_scores = {}
         for culture, elements in self.cultural_elements.items():
-            score = sum(1 for element in elements if element in text_content)
+            score = sum(1 for element in elements if element in mentioned)
             cultural_scores[culture] = score
 
         # Return top 2 cultural elements
         sorted_cultures = sorted(cultural_scores.items(), key=lambda x: x[1], reverse=True)
         return [culture for culture, score in sorted_cultures[:2] if score > 0]
 
-    def _identify_communication_prefs(self, analysis):
+    def _identify_communication_prefs(self, analysis, mentioned=None):
         """Identify communication preferences"""
         preferences = []
 
-        text_content = str(analysis).lower()
+        if mentioned is None:
+            mentioned = self._mentioned(list(self._text_pieces(analysis)))
 
-        if 'social media' in text_content or 'instagram' in text_content:
+        if 'social media' in mentioned or 'instagram' in mentioned:
             preferences.append('visual content')
-        if 'video' in text_content:
+        if 'video' in mentioned:
             preferences.append('video content')
-        if 'blog' in text_content or 'article' in text_content:
+        if 'blog' in mentioned or 'article' in mentioned:
             preferences.append('written content')
-        if 'presentation' in text_content:
+        if 'presentation' in mentioned:
             preferences.append('live presentations')
 
         # Default preferences if none identified
         if not preferences:
             preferences = ['visual content', 'video content']
 
-        return preferences
\ No newline at end of file
+        return preferences
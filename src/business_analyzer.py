@@ -4,8 +4,11 @@ Performs topological analysis of business information.
 """
 
 import re
+import time
 from collections import defaultdict
 
+from src.vocabulary import Vocabulary
+
 class BusinessAnalyzer:
     """Analyzes business information using topological methods"""
 
@@ -24,18 +27,24 @@ class BusinessAnalyzer:
         """Check if we have sufficient information for analysis"""
         key_indicators = [
             'business' in processed_data['full_text'].lower(),
-            len(processed_data['key_ideas']) > 5,
-            len(processed_data['entities']) > 3,
+            len(self._term_keys(processed_data, Vocabulary.KEY_IDEA)) > 5,
+            len(self._term_keys(processed_data, Vocabulary.ENTITY)) > 3,
             len(additional_info) > 0
         ]
 
         return sum(key_indicators) >= 3  # At least 3 indicators present
 
-    def analyze_business(self, processed_data, additional_info):
-        """Perform topological business analysis"""
+    def analyze_business(self, processed_data, additional_info, budget=None, max_entities=None):
+        """Perform topological business analysis.
+
+        In a budgeted run with more than ``max_entities`` entities, the
+        relationship pass is first run on the most frequent ones. If that
+        timing, scaled up, says the full pass would not fit in the time
+        left, the capped relationships are kept; otherwise the full pass runs.
+        """
         analysis = {
             'structure': self._analyze_structure(processed_data),
-            'relationships': self._analyze_relationships(processed_data),
+            'relationships': self._budgeted_relationships(processed_data, budget, max_entities),
             'market_position': self._analyze_market_position(processed_data, additional_info),
             'value_network': self._build_value_network(processed_data),
             'growth_opportunities': self._identify_growth_opportunities(processed_data, additional_info)
@@ -56,11 +65,40 @@ class BusinessAnalyzer:
 
         return structure
 
-    def _analyze_relationships(self, data):
-        """Analyze business relationships and connections"""
-        entities = data['entities']
+    def _term_keys(self, data, kind):
+        """Key ideas or entities of ``data``: vocabulary ids, or plain strings without a vocabulary"""
+        vocabulary = data.get('vocabulary')
+        if vocabulary is not None:
+            return vocabulary.ids(kind)
+        return data.get('key_ideas' if kind == Vocabulary.KEY_IDEA else 'entities', [])
+
+    def _terms(self, data, kind, limit=None):
+        """Key ideas or entities of ``data`` as strings, looked up only when needed"""
+        keys = self._term_keys(data, kind)
+        if limit is not None:
+            keys = keys[:limit]
+        vocabulary = data.get('vocabulary')
+        return vocabulary.lookup(keys) if vocabulary is not None else list(keys)
+
+    def _analyze_relationships(self, data, entities=None):
+        """Analyze business relationships and connections.
+
+        ``entities`` restricts the pass to some entities, given the same way
+        as ``_term_keys`` returns them.
+        """
+        if entities is None:
+            entities = self._term_keys(data, Vocabulary.ENTITY)
         relationships = defaultdict(list)
 
+        vocabulary = data.get('vocabulary')
+        if vocabulary is not None:
+            # Work on entity ids and their recorded offsets instead of rescanning the text per pair
+            terms = vocabulary.terms
+            for id1, id2 in vocabulary.cooccurring(entities, 500):
+                relationships[terms[id1]].append(terms[id2])
+                relationships[terms[id2]].append(terms[id1])
+            return dict(relationships)
+
         # Simple relationship extraction based on co-occurrence
         for i, entity1 in enumerate(entities):
             for entity2 in entities[i+1:]:
@@ -70,12 +108,39 @@ class BusinessAnalyzer:
 
         return dict(relationships)
 
+    def _budgeted_relationships(self, data, budget, max_entities):
+        """Relationships of every entity, or of the top ones when time is short"""
+        entities = self._term_keys(data, Vocabulary.ENTITY)
+        if budget is None or budget.remaining() is None or not max_entities or len(entities) <= max_entities:
+            return self._analyze_relationships(data, entities)
+
+        top = self._top_entities(data, entities, max_entities)
+        started = time.monotonic()
+        capped = self._analyze_relationships(data, top)
+        # Candidate pairs grow with the square of the entity count
+        estimate = (time.monotonic() - started) * (len(entities) / len(top)) ** 2
+        if estimate <= budget.remaining():
+            return self._analyze_relationships(data, entities)
+
+        budget.degrade(f"related the top {len(top)} of {len(entities)} entities "
+                       f"(full pass estimated at {estimate:.1f}s)")
+        return capped
+
+    def _top_entities(self, data, entities, limit):
+        """The ``limit`` most frequent of ``entities``, in their original order"""
+        vocabulary = data.get('vocabulary')
+        if vocabulary is None:
+            return entities[:limit]
+
+        keep = set(sorted(entities, key=lambda term_id: vocabulary.counts[term_id], reverse=True)[:limit])
+        return [term_id for term_id in entities if term_id in keep]
+
     def _analyze_market_position(self, data, additional_info):
         """Analyze market position"""
         position = {
             'competitive_advantages': self._extract_competitive_advantages(data),
             'market_gaps': self._identify_market_gaps(data, additional_info),
-            'unique_selling_points': data['key_ideas'][:5]
+            'unique_selling_points': self._terms(data, Vocabulary.KEY_IDEA, 5)
         }
 
         return position
@@ -87,7 +152,7 @@ class BusinessAnalyzer:
             'customers': [],
             'partners': [],
             'competitors': [],
-            'stakeholders': data['entities']
+            'stakeholders': self._terms(data, Vocabulary.ENTITY)
         }
 
         return network
@@ -141,7 +206,7 @@ class BusinessAnalyzer:
         advantages = []
         advantage_keywords = ['unique', 'better', 'faster', 'cheaper', 'quality', 'innovation']
 
-        for idea in data['key_ideas']:
+        for idea in self._terms(data, Vocabulary.KEY_IDEA):
             if any(keyword in idea.lower() for keyword in advantage_keywords):
                 advantages.append(idea)
 
@@ -153,7 +218,13 @@ class BusinessAnalyzer:
 
         # Look for problem statements in additional info
         for info in additional_info:
-            if 'problem' in info['snippet'].lower() or 'gap' in info['snippet'].lower():
+            if info.get('content'):
+                # Full page text was fetched; quote the sentences that mention a gap
+                sentences = re.split(r'(?<=[.!?])\s+', info['content'])
+                found = [sentence for sentence in sentences
+                         if 'problem' in sentence.lower() or 'gap' in sentence.lower()]
+                gaps.extend(sentence[:100] + '...' for sentence in found[:3])
+            elif 'problem' in info['snippet'].lower() or 'gap' in info['snippet'].lower():
                 gaps.append(info['snippet'][:100] + '...')
 
         return gaps
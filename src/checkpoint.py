@@ -0,0 +1,323 @@
+"""
+Checkpoint Module
+Stores analysis artifacts as typed columnar files so later stages can be re-run quickly.
+"""
+
+import json
+import math
+import os
+import re
+import shutil
+from collections.abc import Sequence
+from pathlib import Path
+
+from src.idea_store import IdeaStore
+from src.pipeline import content_digest
+from src.vocabulary import Vocabulary
+
+
+class LazyTable(Sequence):
+    """List-like view of a checkpointed table that is only read on first access"""
+
+    def __init__(self, store, artifact, ref):
+        self._store = store
+        self._artifact = artifact
+        self._ref = ref
+        self._rows = None
+
+    @property
+    def rows(self):
+        if self._rows is None:
+            self._rows = self._store._rows_from_ref(self._artifact, self._ref)
+        return self._rows
+
+    def __getitem__(self, index):
+        return self.rows[index]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __eq__(self, other):
+        return list(self.rows) == list(other)
+
+    def content_digest(self):
+        """Digest of the rows, as recorded when they were saved"""
+        # Checkpoints written before digests were recorded have to be read
+        return self._ref.get('digest') or content_digest(self.rows)
+
+    def __repr__(self):
+        return repr(self.rows)
+
+
+class CheckpointStore:
+    """Writes artifacts as Parquet/Feather tables plus a JSON manifest.
+
+    Large lists (key ideas, entities, search results, script ideas, ...)
+    become one typed table each. Small nested parts stay in the manifest.
+    Loading returns the same structure with tables replaced by
+    ``LazyTable`` views, and ``table`` reads selected columns directly.
+    """
+
+    FORMATS = {'parquet': '.parquet', 'feather': '.feather'}
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.directory = Path(config.get('dir', 'checkpoints'))
+        self.format = config.get('format', 'parquet')
+        self.min_table_rows = config.get('min_table_rows', 16)
+        self.min_text_length = config.get('min_text_length', 4096)
+
+        if self.format not in self.FORMATS:
+            raise ValueError(f"Unsupported checkpoint format: {self.format}")
+
+    def exists(self, name):
+        return (self.directory / name / 'manifest.json').exists()
+
+    def save(self, name, value):
+        """Write an artifact, replacing any previous checkpoint with the same name"""
+        target = self.directory / name
+        tmp_dir = self.directory / f".{name}.tmp{os.getpid()}"
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir)
+        tmp_dir.mkdir(parents=True)
+
+        tables = []
+        skeleton = self._encode(value, tmp_dir, tables, 'root')
+        with open(tmp_dir / 'manifest.json', 'w') as f:
+            json.dump({'format': self.format, 'value': skeleton, 'tables': tables}, f)
+
+        # Swap the finished directory in so readers never see a partial checkpoint
+        if target.exists():
+            shutil.rmtree(target)
+        os.replace(tmp_dir, target)
+
+    def load(self, name, exclude=()):
+        """Load an artifact; tables are read lazily and ``exclude`` skips top-level keys"""
+        manifest = self._manifest(name)
+        value = manifest['value']
+        if exclude and isinstance(value, dict) and value.get('__kind__') == 'dict':
+            value = dict(value, items={k: v for k, v in value['items'].items() if k not in exclude})
+        return self._decode(name, value)
+
+    def table(self, name, table, columns=None):
+        """Read one table of an artifact as a DataFrame, optionally only some columns"""
+        manifest = self._manifest(name)
+        return self._read_frame(self.directory / name / f"{table}{self.FORMATS[manifest['format']]}",
+                                manifest['format'], columns)
+
+    def tables(self, name):
+        """List the table names stored for an artifact"""
+        return self._manifest(name)['tables']
+
+    def _manifest(self, name):
+        with open(self.directory / name / 'manifest.json', 'r') as f:
+            return json.load(f)
+
+    def _encode(self, value, directory, tables, path):
+        """Turn a value into a JSON skeleton, writing large parts to side files"""
+        if isinstance(value, Vocabulary):
+            frame = self._frame({
+                'term': value.terms,
+                'kind': list(value.kinds),
+                'count': list(value.counts),
+                'doc_count': list(value.doc_counts),
+                'first_offset': list(value.first_offsets)
+            })
+            return self._write_table(frame, 'vocabulary', directory, tables, path)
+
+        if isinstance(value, IdeaStore):
+            # Checkpoints hold the rendered ideas so they can be read without this code
+            value = value.to_dicts()
+
+        if isinstance(value, dict):
+            adjacency = self._as_adjacency(value)
+            if adjacency is not None:
+                frame = self._frame({'source': adjacency[0], 'target': adjacency[1]})
+                return self._write_table(frame, 'adjacency', directory, tables, path)
+            return {'__kind__': 'dict', 'items': {
+                str(key): self._encode(item, directory, tables, f"{path}.{key}")
+                for key, item in value.items()
+            }}
+
+        if isinstance(value, (list, tuple)) and len(value) >= self.min_table_rows:
+            kind = self._list_kind(value)
+            if kind is not None:
+                # Loaded tables report this, so they hash like the saved list without being read
+                ref = self._encode_table(value, kind, directory, tables, path)
+                ref['digest'] = content_digest(value)
+                return ref
+
+        if isinstance(value, str) and len(value) >= self.min_text_length:
+            file_name = re.sub(r'[^\w.-]', '_', path) + '.txt'
+            with open(directory / file_name, 'w', encoding='utf-8') as f:
+                f.write(value)
+            return {'__kind__': 'text', 'file': file_name}
+
+        if isinstance(value, (list, tuple)):
+            return {'__kind__': 'tuple' if isinstance(value, tuple) else 'list',
+                    'items': [self._encode(item, directory, tables, f"{path}.{i}")
+                              for i, item in enumerate(value)]}
+
+        return value
+
+    def _encode_table(self, value, kind, directory, tables, path):
+        """Write a list of records, tuples or scalar values as one table"""
+        if kind == 'records':
+            keys = self._record_keys(value)
+            frame = self._frame({key: self._column([row.get(key) for row in value])
+                                 for key in keys})
+            ref = self._write_table(frame, kind, directory, tables, path)
+            # Tables have no "absent" cell, so remember which rows lacked each key
+            missing = {key: [i for i, row in enumerate(value) if key not in row] for key in keys}
+            missing = {key: rows for key, rows in missing.items() if rows}
+            if missing:
+                ref['missing'] = missing
+            return ref
+        if kind == 'tuples':
+            width = len(value[0])
+            frame = self._frame({f"c{i}": [row[i] for row in value] for i in range(width)})
+            return self._write_table(frame, kind, directory, tables, path)
+        return self._write_table(self._frame({'value': list(value)}), kind, directory, tables, path)
+
+    def _decode(self, name, value):
+        """Rebuild a value from its JSON skeleton"""
+        if not isinstance(value, dict):
+            return value
+
+        kind = value.get('__kind__')
+        if kind == 'dict':
+            return {key: self._decode(name, item) for key, item in value['items'].items()}
+        if kind == 'list':
+            return [self._decode(name, item) for item in value['items']]
+        if kind == 'tuple':
+            return tuple(self._decode(name, item) for item in value['items'])
+        if kind == 'text':
+            with open(self.directory / name / value['file'], 'r', encoding='utf-8') as f:
+                return f.read()
+        if kind in ('vocabulary', 'adjacency'):
+            # These are used as objects/dicts rather than sequences, so load them now
+            return self._rows_from_ref(name, value)
+        if kind in ('records', 'tuples', 'values'):
+            return LazyTable(self, name, value)
+        return value
+
+    def _rows_from_ref(self, name, ref):
+        """Materialize a table reference back into Python objects"""
+        frame = self.table(name, ref['table'])
+        kind = ref['__kind__']
+
+        if kind == 'values':
+            return frame['value'].tolist()
+        if kind == 'tuples':
+            return list(zip(*(frame[column].tolist() for column in frame.columns)))
+        if kind == 'records':
+            rows = [{} for _ in range(len(frame))]
+            for key in frame.columns:
+                absent = set(ref.get('missing', {}).get(key, ()))
+                for i, item in enumerate(frame[key].tolist()):
+                    if i not in absent:
+                        rows[i][key] = self._to_python(item)
+            return rows
+        if kind == 'adjacency':
+            adjacency = {}
+            for source, target in zip(frame['source'].tolist(), frame['target'].tolist()):
+                adjacency.setdefault(source, []).append(target)
+            return adjacency
+        if kind == 'vocabulary':
+            vocabulary = Vocabulary()
+            for term, kind_mask, count, doc_count, offset in zip(
+                    frame['term'].tolist(), frame['kind'].tolist(), frame['count'].tolist(),
+                    frame['doc_count'].tolist(), frame['first_offset'].tolist()):
+                term_id = vocabulary.add(term, kind_mask, offset=offset)
+                vocabulary.counts[term_id] = count
+                vocabulary.doc_counts[term_id] = doc_count
+            return vocabulary
+        raise ValueError(f"Unknown table kind: {kind}")
+
+    def _write_table(self, frame, kind, directory, tables, path):
+        table_name = re.sub(r'[^\w.-]', '_', path[len('root.'):] if path != 'root' else path)
+        if table_name in tables:
+            table_name = f"{table_name}_{len(tables)}"
+        extension = self.FORMATS[self.format]
+        if self.format == 'parquet':
+            frame.to_parquet(directory / f"{table_name}{extension}", index=False)
+        else:
+            frame.to_feather(directory / f"{table_name}{extension}")
+        tables.append(table_name)
+        return {'__kind__': kind, 'table': table_name}
+
+    def _read_frame(self, file_path, file_format, columns):
+        import pandas as pd
+
+        if file_format == 'parquet':
+            return pd.read_parquet(file_path, columns=columns)
+        return pd.read_feather(file_path, columns=columns)
+
+    def _frame(self, columns):
+        import pandas as pd
+
+        return pd.DataFrame(columns)
+
+    def _column(self, values):
+        """Build a column, keeping ints and bools intact when some cells are empty"""
+        present = [item for item in values if item is not None]
+        if not present or len(present) == len(values):
+            return values
+        import pandas as pd
+
+        if all(type(item) is int for item in present):
+            return pd.array(values, dtype='Int64')
+        if all(type(item) is bool for item in present):
+            return pd.array(values, dtype='boolean')
+        return values
+
+    def _list_kind(self, values):
+        """Classify a list as records, fixed-width tuples or scalar values"""
+        if all(isinstance(item, dict) for item in values):
+            return 'records'
+        if all(isinstance(item, tuple) for item in values) and len({len(item) for item in values}) == 1:
+            return 'tuples'
+        if all(isinstance(item, (str, int, float, bool)) for item in values) and \
+                len({type(item) for item in values}) == 1:
+            return 'values'
+        return None
+
+    def _record_keys(self, records):
+        keys = {}
+        for record in records:
+            for key in record:
+                keys.setdefault(key, None)
+        return list(keys)
+
+    def _as_adjacency(self, value):
+        """Return ``(sources, targets)`` if ``value`` maps strings to lists of strings"""
+        # Empty lists would vanish from an edge table, so those dicts stay in the manifest
+        if not value or not all(isinstance(key, str) and isinstance(item, list) and item
+                                for key, item in value.items()):
+            return None
+        if sum(len(item) for item in value.values()) < self.min_table_rows:
+            return None
+        if not all(isinstance(target, str) for item in value.values() for target in item):
+            return None
+
+        sources, targets = [], []
+        for key, item in value.items():
+            for target in item:
+                sources.append(key)
+                targets.append(target)
+        return sources, targets
+
+    @staticmethod
+    def _to_python(value):
+        # List columns come back from Parquet as numpy arrays
+        if hasattr(value, 'tolist'):
+            return value.tolist()
+        import pandas as pd
+
+        # Empty cells read back as NaN or NA depending on the column type
+        if value is pd.NA or (isinstance(value, float) and math.isnan(value)):
+            return None
+        return value
@@ -0,0 +1,179 @@
+"""
+Corpus Store Module
+Append-only on-disk document store read through mmap.
+"""
+
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+
+from src.file_lock import locked
+
+
+class CorpusStore:
+    """Keeps downloaded documents in one append-only blob file with an offset index.
+
+    ``corpus.bin`` holds the raw UTF-8 bytes of every stored document back
+    to back and ``index.jsonl`` records where each one lives. Reads go
+    through ``mmap`` so the corpus sits in the OS page cache instead of the
+    Python heap, and a document already stored at the same Drive version
+    does not need to be downloaded again.
+
+    Several processes (e.g. shard workers) may share a store: each
+    document is first spooled to a private temporary file, then copied to
+    the end of the blob and indexed while holding an exclusive lock on
+    ``corpus.lock``, so appends from different processes never interleave.
+    """
+
+    BLOB_NAME = 'corpus.bin'
+    INDEX_NAME = 'index.jsonl'
+    LOCK_NAME = 'corpus.lock'
+
+    _open_stores = {}
+    _open_lock = threading.Lock()
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.blob_path = self.directory / self.BLOB_NAME
+        self.index_path = self.directory / self.INDEX_NAME
+        self.lock_path = self.directory / self.LOCK_NAME
+        self.blob_path.touch(exist_ok=True)
+
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._map = None
+        self._load_index()
+
+    @classmethod
+    def open(cls, directory):
+        """Return the shared store for ``directory``, opening it on first use"""
+        key = str(Path(directory).resolve())
+        with cls._open_lock:
+            store = cls._open_stores.get(key)
+            if store is None:
+                store = cls._open_stores[key] = cls(directory)
+            return store
+
+    def lookup(self, file_id, version):
+        """Return the stored entry for ``file_id`` if it matches ``version``"""
+        entry = self.entries.get(file_id)
+        if entry is not None and entry['version'] == version:
+            return entry
+        return None
+
+    def append(self, file_id, version, name, mime_type, data):
+        """Append a document's bytes (or an iterable of byte chunks) and index them"""
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = [data]
+
+        # Download outside the lock so other processes can keep appending meanwhile
+        with tempfile.TemporaryFile(dir=self.directory) as spool:
+            for chunk in data:
+                spool.write(chunk)
+            spool.seek(0)
+
+            with self._lock, locked(self.lock_path):
+                with open(self.blob_path, 'ab') as blob:
+                    offset = blob.seek(0, os.SEEK_END)
+                    shutil.copyfileobj(spool, blob)
+                    length = blob.tell() - offset
+                    blob.flush()
+                    os.fsync(blob.fileno())
+
+                entry = {
+                    'id': file_id,
+                    'version': version,
+                    'name': name,
+                    'type': mime_type,
+                    'offset': offset,
+                    'length': length
+                }
+                # The index line is written last, so a crash never indexes missing bytes
+                with open(self.index_path, 'a', encoding='utf-8') as index:
+                    index.write(json.dumps(entry) + '\n')
+                self.entries[file_id] = entry
+                return entry
+
+    def document(self, entry):
+        """Wrap an index entry as a document dict backed by the store"""
+        return StoredDocument(self, entry)
+
+    def view(self, entry):
+        """Zero-copy ``memoryview`` of an entry's bytes"""
+        end = entry['offset'] + entry['length']
+        with self._lock:
+            if self._map is None or len(self._map) < end:
+                # The blob has grown since it was mapped
+                self._remap()
+            return memoryview(self._map)[entry['offset']:end]
+
+    def _load_index(self):
+        """Read the index; later lines supersede earlier ones for the same file"""
+        if not self.index_path.exists():
+            return
+
+        blob_size = self.blob_path.stat().st_size
+        with open(self.index_path, 'r', encoding='utf-8') as index:
+            for line in index:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn final line from an interrupted write
+                    continue
+                if entry['offset'] + entry['length'] <= blob_size:
+                    self.entries[entry['id']] = entry
+
+    def _remap(self):
+        # The previous map is not closed: outstanding views may still point into it
+        self._map = None
+        if self.blob_path.stat().st_size == 0:
+            self._map = b''
+            return
+        with open(self.blob_path, 'rb') as blob:
+            self._map = mmap.mmap(blob.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class StoredDocument(Mapping):
+    """Document dict whose ``content`` is decoded from the corpus store on access"""
+
+    def __init__(self, store, entry):
+        self.store = store
+        self.entry = entry
+
+    def view(self):
+        """Raw bytes of the document without copying them"""
+        return self.store.view(self.entry)
+
+    def __getitem__(self, key):
+        if key == 'content':
+            return str(self.view(), 'utf-8', 'replace')
+        if key == 'name':
+            return self.entry['name']
+        if key == 'type':
+            return self.entry['type']
+        if key == 'id':
+            return self.entry['id']
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(('name', 'content', 'type', 'id'))
+
+    def __len__(self):
+        return 4
+
+    def __repr__(self):
+        return f"StoredDocument({self.entry['name']!r}, {self.entry['length']} bytes)"
+
+    def __reduce__(self):
+        # Pickle as a reference into the store rather than the text itself
+        return _reopen_document, (str(self.store.directory), self.entry)
+
+
+def _reopen_document(directory, entry):
+    return StoredDocument(CorpusStore.open(directory), entry)
@@ -0,0 +1,104 @@
+"""
+Credential Broker Module
+Shares one OAuth token file safely between concurrent processes.
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from src.file_lock import locked
+
+
+class CredentialBroker:
+    """Coordinates token refreshes across processes through a lock file.
+
+    Whoever holds the lock re-reads the shared token file first; if another
+    process already refreshed it, that token is adopted instead of hitting
+    the OAuth endpoint again. Writes go to a temporary file that atomically
+    replaces the token, so readers never see a half-written file.
+    """
+
+    def __init__(self, token_path, scopes, refresh_margin=300):
+        self.token_path = Path(token_path)
+        self.lock_path = self.token_path.with_name(self.token_path.name + '.lock')
+        self.scopes = scopes
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+
+    def load(self):
+        """Read the shared token, or ``None`` if there is none yet"""
+        with self._locked():
+            return self._read()
+
+    def save(self, creds):
+        """Atomically write a token to the shared token file"""
+        with self._locked():
+            self._write(creds)
+
+    def refresh(self, creds):
+        """Make ``creds`` fresh, refreshing at most once across all processes.
+
+        ``creds`` is updated in place so clients already built with it pick
+        up the new token.
+        """
+        from google.auth.transport.requests import Request
+
+        with self._locked():
+            shared = self._read()
+            if shared is not None and shared.token != creds.token and self._is_fresh(shared):
+                # Another process refreshed while we were waiting for the lock
+                creds.token = shared.token
+                creds.expiry = shared.expiry
+                return creds
+
+            creds.refresh(Request())
+            self._write(creds)
+            return creds
+
+    def authorize(self, run_flow):
+        """Run the interactive consent flow once across processes and share its token"""
+        with self._locked():
+            creds = self._read()
+            if creds is None or not creds.valid:
+                creds = run_flow()
+                self._write(creds)
+            return creds
+
+    def _is_fresh(self, creds):
+        if not creds.valid:
+            return False
+        if creds.expiry is None:
+            return True
+        now = datetime.now(timezone.utc).replace(tzinfo=None)  # google-auth uses naive UTC
+        return creds.expiry - now > self.refresh_margin
+
+    def _read(self):
+        from google.oauth2.credentials import Credentials
+
+        if not self.token_path.exists():
+            return None
+        return Credentials.from_authorized_user_file(str(self.token_path), self.scopes)
+
+    def _write(self, creds):
+        self.token_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.token_path.parent, prefix=self.token_path.name + '.')
+        try:
+            with os.fdopen(fd, 'w') as token:
+                token.write(creds.to_json())
+                token.flush()
+                os.fsync(token.fileno())
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.token_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive inter-process lock on the token's lock file"""
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with locked(self.lock_path):
+            yield
@@ -0,0 +1,140 @@
+"""
+Daemon Module
+Long-lived local server that keeps models and API clients warm between CLI runs.
+"""
+
+import json
+import os
+import socket
+import socketserver
+import threading
+import traceback
+
+from src.form_handler import FormHandler
+
+
+class InputRequired(Exception):
+    """Raised by a job that needs answers from the user before it can continue"""
+
+    def __init__(self, questions):
+        super().__init__("additional information required")
+        self.questions = questions
+
+
+class RemoteFormHandler(FormHandler):
+    """Stands in for ``FormHandler`` inside the daemon, which has no terminal"""
+
+    def __init__(self, questions):
+        super().__init__()
+        self.questions = questions
+
+    def request_additional_info(self):
+        raise InputRequired(self.questions)
+
+    def start(self, console=True):
+        # The answers have to come from the client before the job can go on
+        self.request_additional_info()
+
+
+class AgentDaemon:
+    """Serves jobs over a Unix socket using components loaded once at startup.
+
+    Each connection carries one JSON request line, ``{"command": ..., ...}``,
+    and gets one JSON response line back. ``handlers`` maps command names
+    to callables that receive the remaining request fields as keyword
+    arguments and return a JSON-serializable result.
+    """
+
+    def __init__(self, socket_path, handlers):
+        self.socket_path = str(socket_path)
+        self.handlers = dict(handlers)
+        self.handlers.setdefault('ping', lambda: 'pong')
+        self._server = None
+        # Jobs share one set of components, so they run one at a time
+        self._job_lock = threading.Lock()
+
+    def serve_forever(self):
+        """Listen on the socket until a ``shutdown`` request arrives"""
+        if os.path.exists(self.socket_path):
+            if self._is_alive():
+                raise RuntimeError(f"A daemon is already listening on {self.socket_path}")
+            os.unlink(self.socket_path)
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                line = self.rfile.readline()
+                if not line:
+                    return
+                response = daemon.handle_request(line)
+                self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+        self._server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        os.chmod(self.socket_path, 0o600)
+        print(f"Daemon listening on {self.socket_path}")
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def handle_request(self, line):
+        """Decode, dispatch and answer a single request line"""
+        try:
+            request = json.loads(line)
+            command = request.pop('command')
+        except (ValueError, KeyError, AttributeError):
+            return {'status': 'error', 'error': 'malformed request'}
+
+        if command == 'shutdown':
+            # shutdown() blocks until serve_forever returns, so call it from another thread
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+            return {'status': 'ok', 'result': 'shutting down'}
+
+        handler = self.handlers.get(command)
+        if handler is None:
+            return {'status': 'error', 'error': f"unknown command: {command}"}
+
+        try:
+            with self._job_lock:
+                return {'status': 'ok', 'result': handler(**request)}
+        except InputRequired as e:
+            return {'status': 'input_required', 'questions': e.questions}
+        except Exception as e:
+            traceback.print_exc()
+            return {'status': 'error', 'error': f"{type(e).__name__}: {e}"}
+
+    def _is_alive(self):
+        try:
+            DaemonClient(self.socket_path, timeout=1).request('ping')
+            return True
+        except OSError:
+            return False
+
+
+class DaemonClient:
+    """Thin client that sends one job per connection to an ``AgentDaemon``"""
+
+    def __init__(self, socket_path, timeout=None):
+        self.socket_path = str(socket_path)
+        self.timeout = timeout
+
+    def is_running(self):
+        try:
+            return self.request('ping')['status'] == 'ok'
+        except OSError:
+            return False
+
+    def request(self, command, **params):
+        """Send a command and return the decoded response dict"""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            sock.sendall(json.dumps(dict(params, command=command)).encode('utf-8') + b'\n')
+            with sock.makefile('rb') as response:
+                line = response.readline()
+        if not line:
+            raise ConnectionError("daemon closed the connection without answering")
+        return json.loads(line)
@@ -4,83 +4,298 @@ Handles authentication and document retrieval from Google Drive.
 """
 
 import os
-import io
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from fnmatch import fnmatch
 from pathlib import Path
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
+
+from src.corpus_store import CorpusStore
+from src.credential_broker import CredentialBroker
+from src.extractors import DocumentExtractor, ExtractionError
 
 class GoogleDriveAccess:
     """Handles Google Drive API interactions"""
 
     SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
 
+    FOLDER_TYPE = 'application/vnd.google-apps.folder'
+    SHORTCUT_TYPE = 'application/vnd.google-apps.shortcut'
+    FILE_FIELDS = "id, name, mimeType, modifiedTime, md5Checksum, size, shortcutDetails"
+
+    # Parsed once per process and shared by every service built from it
+    _discovery_document = None
+    _discovery_lock = threading.Lock()
+
     def __init__(self, config):
         self.config = config
         self.creds = None
-        self.service = None
-        self.authenticate()
+        self._service = None
+        corpus_dir = config.get('corpus_dir')
+        self.corpus_store = CorpusStore.open(corpus_dir) if corpus_dir else None
+        self.extractor = DocumentExtractor(config.get('extraction'))
+        self._local = threading.local()
+        self._auth_lock = threading.Lock()
+        self._refresh_timer = None
+        self.credential_broker = CredentialBroker(config['token_path'], self.SCOPES,
+                                                  config.get('refresh_margin', 300))
+
+    @property
+    def service(self):
+        """Drive service, authenticated and built on first use"""
+        if self._service is None:
+            with self._auth_lock:
+                if self._service is None:
+                    self.authenticate()
+        return self._service
+
+    @service.setter
+    def service(self, service):
+        self._service = service
 
     def authenticate(self):
         """Authenticate with Google Drive API"""
         creds_path = Path(self.config['credentials_path'])
-        token_path = Path(self.config['token_path'])
+        broker = self.credential_broker
 
-        if token_path.exists():
-            self.creds = Credentials.from_authorized_user_file(str(token_path), self.SCOPES)
+        self.creds = broker.load()
 
         if not self.creds or not self.creds.valid:
             if self.creds and self.creds.expired and self.creds.refresh_token:
-                self.creds.refresh(Request())
+                # Another worker may already have refreshed; the broker reuses its token
+                broker.refresh(self.creds)
             else:
                 if not creds_path.exists():
                     raise FileNotFoundError(f"Credentials file not found: {creds_path}")
 
-                flow = InstalledAppFlow.from_client_secrets_file(str(creds_path), self.SCOPES)
-                self.creds = flow.run_local_server(port=0)
+                def run_flow():
+                    from google_auth_oauthlib.flow import InstalledAppFlow
+
+                    flow = InstalledAppFlow.from_client_secrets_file(str(creds_path), self.SCOPES)
+                    return flow.run_local_server(port=0)
+
+                # Only one process runs the consent flow; the rest pick up its token
+                self.creds = broker.authorize(run_flow)
+
+        self._service = self._build_service()
+        self._schedule_refresh()
+
+    def close(self):
+        """Stop the background token refresh"""
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+            self._refresh_timer = None
+
+    def _build_service(self):
+        """Build a Drive client from the cached discovery document"""
+        from googleapiclient.discovery import build, build_from_document
 
-            # Save the credentials for the next run
-            with open(token_path, 'w') as token:
-                token.write(self.creds.to_json())
+        document = self._load_discovery_document(self.config.get('discovery_path'))
+        if document is None:
+            return build('drive', 'v3', credentials=self.creds)
+        return build_from_document(document, credentials=self.creds)
 
-        self.service = build('drive', 'v3', credentials=self.creds)
+    @classmethod
+    def _load_discovery_document(cls, discovery_path=None):
+        """Return the Drive v3 discovery document without any network round trip.
 
-    def get_documents(self):
-        """Retrieve documents from the specified Google Drive folder"""
+        A local copy at ``discovery_path`` wins; otherwise the copy bundled
+        with google-api-python-client is used.
+        """
+        from googleapiclient.discovery_cache import get_static_doc
+
+        with cls._discovery_lock:
+            if cls._discovery_document is None:
+                if discovery_path and Path(discovery_path).exists():
+                    cls._discovery_document = Path(discovery_path).read_text(encoding='utf-8')
+                else:
+                    cls._discovery_document = get_static_doc('drive', 'v3')
+            return cls._discovery_document
+
+    def _schedule_refresh(self):
+        """Refresh the access token in the background shortly before it expires"""
+        if not self.creds or not self.creds.expiry or not self.creds.refresh_token:
+            return
+
+        margin = self.config.get('refresh_margin', 300)
+        now = datetime.now(timezone.utc).replace(tzinfo=None)  # google-auth uses naive UTC
+        delay = max((self.creds.expiry - now).total_seconds() - margin, 0)
+
+        self.close()
+        self._refresh_timer = threading.Timer(delay, self._background_refresh)
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+    def _background_refresh(self):
+        try:
+            self.credential_broker.refresh(self.creds)
+        except Exception as e:
+            # The next API call will refresh synchronously instead
+            print(f"Background token refresh failed: {e}")
+            return
+        self._schedule_refresh()
+
+    def get_documents(self, budget=None):
+        """Retrieve documents from the specified Google Drive folder.
+
+        With a ``budget``, files are downloaded in a fixed random order until
+        it runs out (always at least one), so a partial download is a sample
+        of the folder; the documents are returned in listing order.
+        """
+        if budget is None or budget.remaining() is None:
+            return list(self.iter_documents())
+
+        items = self.list_files()
+        order = list(range(len(items)))
+        random.Random(len(items)).shuffle(order)
+        downloaded = {}
+        for index in order:
+            if downloaded and budget.expired():
+                budget.degrade(f"downloaded {len(downloaded)} of {len(items)} documents")
+                break
+            for document in self.iter_documents([items[index]]):
+                downloaded[index] = document
+        return [downloaded[index] for index in sorted(downloaded)]
+
+    def list_files(self):
+        """List the supported files in the configured folder without downloading them"""
         folder_id = self.config['folder_id']
-        documents = []
-
-        # Query for files in the folder
-        query = f"'{folder_id}' in parents and mimeType contains 'text/'"
-        results = self.service.files().list(
-            q=query,
-            fields="nextPageToken, files(id, name, mimeType)"
-        ).execute()
-
-        items = results.get('files', [])
-
-        for item in items:
-            print(f"Downloading: {item['name']}")
-            content = self._download_file(item['id'])
-            documents.append({
-                'name': item['name'],
-                'content': content,
-                'type': item['mimeType']
-            })
-
-        return documents
-
-    def _download_file(self, file_id):
-        """Download a file's content"""
-        request = self.service.files().get_media(fileId=file_id)
-        fh = io.BytesIO()
-        downloader = MediaIoBaseDownload(fh, request)
-
-        done = False
-        while done is False:
-            status, done = downloader.next_chunk()
-
-        fh.seek(0)
-        return fh.read().decode('utf-8')
\ No newline at end of file
+
+        if self.config.get('recursive', False):
+            return self._list_tree(folder_id)
+
+        # Query for text files, Google-native documents, PDFs and Word files in the folder
+        query = f"'{folder_id}' in parents and trashed = false and {self.extractor.mime_query()}"
+        return self._list_query(self.service, query)
+
+    def iter_documents(self, items=None, budget=None):
+        """Yield documents from the Drive folder (or just ``items``) as they are downloaded.
+
+        Once ``budget`` runs out no further file is downloaded; at least one
+        document is always yielded.
+        """
+        store = self.corpus_store
+        yielded = 0
+
+        for item in (self.list_files() if items is None else items):
+            if budget is not None and yielded and budget.expired():
+                budget.degrade(f"stopped downloading after {yielded} documents")
+                return
+            try:
+                if store is None:
+                    print(f"Downloading: {item['name']}")
+                    yielded += 1
+                    yield {
+                        'name': item['name'],
+                        'content': ''.join(self.extractor.extract(self.service, item)),
+                        'type': item['mimeType']
+                    }
+                    continue
+
+                # Reuse the stored copy when Drive reports the same version
+                version = item.get('md5Checksum') or item.get('modifiedTime')
+                entry = store.lookup(item['id'], version)
+                if entry is None:
+                    print(f"Downloading: {item['name']}")
+                    chunks = self.extractor.extract(self.service, item)
+                    entry = store.append(item['id'], version, item['name'], item['mimeType'],
+                                         (chunk.encode('utf-8') for chunk in chunks))
+                else:
+                    print(f"Using stored copy: {item['name']}")
+                yielded += 1
+                yield store.document(entry)
+            except ExtractionError as e:
+                print(f"Skipping {item['name']}: {e}")
+
+    def _list_query(self, service, query):
+        """Run a files().list query, following every result page"""
+        items = []
+        page_token = None
+        while True:
+            results = service.files().list(
+                q=query,
+                pageSize=1000,
+                pageToken=page_token,
+                fields=f"nextPageToken, files({self.FILE_FIELDS})"
+            ).execute()
+            items.extend(results.get('files', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return items
+
+    def _list_tree(self, root_id):
+        """List supported files under a folder tree, breadth-first.
+
+        Every folder of one level is listed concurrently, so total listing
+        time grows with the depth of the tree rather than its folder count.
+        Files reachable through several parents or shortcuts are returned once.
+        """
+        max_depth = self.config.get('max_depth', 10)
+        include = self.config.get('include', ['*'])
+        exclude = self.config.get('exclude', [])
+        workers = self.config.get('list_workers', 8)
+
+        # Authenticate here: worker threads build their clients from self.creds
+        self.service
+
+        seen = {root_id}
+        files = []
+        level = [(root_id, '')]
+        depth = 0
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while level:
+                listings = executor.map(lambda folder: self._list_folder(folder[0]), level)
+                next_level = []
+
+                for (folder_id, folder_path), children in zip(level, listings):
+                    for child in children:
+                        if child['id'] in seen:
+                            continue
+                        path = f"{folder_path}{child['name']}"
+                        if any(fnmatch(path, pattern) for pattern in exclude):
+                            continue
+
+                        seen.add(child['id'])
+                        if child['mimeType'] == self.FOLDER_TYPE:
+                            if depth < max_depth:
+                                next_level.append((child['id'], path + '/'))
+                        elif any(fnmatch(path, pattern) for pattern in include):
+                            files.append(dict(child, path=path))
+
+                level = next_level
+                depth += 1
+
+        return files
+
+    def _list_folder(self, folder_id):
+        """List the subfolders, shortcuts and supported files directly inside a folder"""
+        query = (f"'{folder_id}' in parents and trashed = false and "
+                 f"(mimeType = '{self.FOLDER_TYPE}' or mimeType = '{self.SHORTCUT_TYPE}' "
+                 f"or {self.extractor.mime_query()})")
+        children = (self._resolve_shortcut(item) for item in self._list_query(self._thread_service(), query))
+        return [child for child in children if child is not None]
+
+    def _resolve_shortcut(self, item):
+        """Replace a shortcut with the file or folder it points to"""
+        if item['mimeType'] != self.SHORTCUT_TYPE:
+            return item
+
+        target_id = item.get('shortcutDetails', {}).get('targetId')
+        if not target_id:
+            return None
+        target = self._thread_service().files().get(fileId=target_id, fields=self.FILE_FIELDS).execute()
+        if target['mimeType'] != self.FOLDER_TYPE and not self.extractor.is_supported(target['mimeType']):
+            return None
+        # Keep the shortcut's name so include/exclude patterns see the path the user sees
+        return dict(target, name=item['name'])
+
+    def _thread_service(self):
+        """Drive service for the current thread; the client is not thread-safe"""
+        if threading.current_thread() is threading.main_thread():
+            return self.service
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            service = self._local.service = self._build_service()
+        return service
@@ -0,0 +1,161 @@
+"""
+Duplicate Detector Module
+Finds near-duplicate documents with MinHash/LSH so each draft is processed once.
+"""
+
+import random
+import re
+from collections import defaultdict
+from hashlib import blake2b
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+class DuplicateDetector:
+    """Clusters near-identical documents and keeps one representative per cluster"""
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.threshold = config.get('threshold', 0.8)
+        self.num_perm = config.get('num_perm', 128)
+        self.shingle_size = config.get('shingle_size', 5)
+        self.bands, self.rows = self._choose_bands(self.threshold, self.num_perm)
+
+        # Fixed seed so signatures are comparable between runs
+        rng = random.Random(1)
+        self._permutations = [
+            (rng.randint(1, _MERSENNE_PRIME - 1), rng.randint(0, _MERSENNE_PRIME - 1))
+            for _ in range(self.num_perm)
+        ]
+        self.reset()
+
+    def reset(self):
+        """Forget documents seen by ``is_duplicate``"""
+        self._buckets = [{} for _ in range(self.bands)]
+        self._seen = []
+
+    def collapse(self, documents):
+        """Return one representative per near-duplicate cluster and a report of what was dropped"""
+        signatures = [self.signature(doc['content']) for doc in documents]
+        clusters = self._cluster(signatures)
+
+        representatives = []
+        report = []
+        for members in clusters:
+            # Keep the longest draft; it usually carries the most information
+            keep = max(members, key=lambda i: len(documents[i]['content']))
+            representatives.append((keep, documents[keep]))
+
+            dropped = [i for i in members if i != keep]
+            if dropped:
+                report.append({
+                    'kept': documents[keep]['name'],
+                    'collapsed': [documents[i]['name'] for i in dropped],
+                    'similarity': [round(self.similarity(signatures[keep], signatures[i]), 3)
+                                   for i in dropped]
+                })
+
+        # Preserve the original document order
+        representatives.sort(key=lambda item: item[0])
+        return [doc for _, doc in representatives], report
+
+    def is_duplicate(self, document):
+        """Check a streamed document against those already seen.
+
+        Returns the name of the earlier document it duplicates, or ``None``
+        after remembering it as a new representative. Unlike ``collapse``
+        the first copy seen is kept, since later ones have not arrived yet.
+        """
+        sig = self.signature(document['content'])
+        keys = [tuple(sig[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+        checked = set()
+        for bucket, key in zip(self._buckets, keys):
+            for index in bucket.get(key, ()):
+                if index in checked:
+                    continue
+                checked.add(index)
+                name, other = self._seen[index]
+                if self.similarity(sig, other) >= self.threshold:
+                    return name
+
+        index = len(self._seen)
+        self._seen.append((document['name'], sig))
+        for bucket, key in zip(self._buckets, keys):
+            bucket.setdefault(key, []).append(index)
+        return None
+
+    def signature(self, text):
+        """Compute the MinHash signature of a document"""
+        shingles = self._shingles(text)
+        if not shingles:
+            return [_MAX_HASH] * self.num_perm
+
+        return [
+            min((a * shingle + b) % _MERSENNE_PRIME for shingle in shingles) & _MAX_HASH
+            for a, b in self._permutations
+        ]
+
+    def similarity(self, sig1, sig2):
+        """Estimate the Jaccard similarity of two signatures"""
+        return sum(1 for x, y in zip(sig1, sig2) if x == y) / self.num_perm
+
+    def _shingles(self, text):
+        """Hash overlapping word n-grams of the normalized text"""
+        words = re.findall(r'\w+', text.lower())
+        if not words:
+            return set()
+
+        size = min(self.shingle_size, len(words))
+        return {
+            int.from_bytes(blake2b(' '.join(words[i:i + size]).encode('utf-8'),
+                                   digest_size=4).digest(), 'little')
+            for i in range(len(words) - size + 1)
+        }
+
+    def _cluster(self, signatures):
+        """Group documents whose signatures collide in an LSH band and pass the threshold"""
+        parent = list(range(len(signatures)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for band in range(self.bands):
+            start = band * self.rows
+            buckets = defaultdict(list)
+            for i, sig in enumerate(signatures):
+                buckets[tuple(sig[start:start + self.rows])].append(i)
+
+            for members in buckets.values():
+                first = members[0]
+                for other in members[1:]:
+                    root1, root2 = find(first), find(other)
+                    if root1 != root2 and \
+                            self.similarity(signatures[first], signatures[other]) >= self.threshold:
+                        parent[root2] = root1
+
+        clusters = defaultdict(list)
+        for i in range(len(signatures)):
+            clusters[find(i)].append(i)
+        return list(clusters.values())
+
+    @staticmethod
+    def _choose_bands(threshold, num_perm):
+        """Pick the band/row split with the highest LSH threshold at or below the target.
+
+        Candidates are verified against the real threshold afterwards, so
+        erring low only costs a few extra comparisons while erring high
+        would miss duplicates.
+        """
+        best = (num_perm, 1)
+        for rows in range(1, num_perm + 1):
+            if num_perm % rows:
+                continue
+            bands = num_perm // rows
+            if (1 / bands) ** (1 / rows) <= threshold:
+                best = (bands, rows)
+        return best
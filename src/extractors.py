@@ -0,0 +1,167 @@
+"""
+Document Extraction Module
+Streams Drive files to disk and extracts their text with bounded memory.
+"""
+
+import codecs
+import tempfile
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+
+class ExtractionError(Exception):
+    """Raised when a document cannot be downloaded or converted to text"""
+
+
+class DocumentExtractor:
+    """Downloads Drive files in chunks and turns them into text chunks.
+
+    Google Docs, Sheets and Slides are exported by Drive itself, PDFs and
+    Word files are parsed from a spooled temporary file, and plain text is
+    decoded incrementally. Nothing holds a whole file in memory unless it
+    is smaller than ``spool_size``.
+    """
+
+    GOOGLE_EXPORTS = {
+        'application/vnd.google-apps.document': 'text/plain',
+        'application/vnd.google-apps.presentation': 'text/plain',
+        'application/vnd.google-apps.spreadsheet': 'text/csv'
+    }
+    PDF = 'application/pdf'
+    DOCX = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+    _WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.chunk_size = config.get('chunk_size', 1024 * 1024)
+        self.spool_size = config.get('spool_size', 8 * 1024 * 1024)
+        self.max_document_bytes = config.get('max_document_bytes', 50 * 1024 * 1024)
+
+    def mime_query(self):
+        """Drive query clause matching every supported MIME type"""
+        exact = list(self.GOOGLE_EXPORTS) + [self.PDF, self.DOCX]
+        clauses = ["mimeType contains 'text/'"] + [f"mimeType = '{mime}'" for mime in exact]
+        return '(' + ' or '.join(clauses) + ')'
+
+    def is_supported(self, mime_type):
+        """Whether files of ``mime_type`` can be turned into text"""
+        return (mime_type.startswith('text/') or mime_type in self.GOOGLE_EXPORTS or
+                mime_type in (self.PDF, self.DOCX))
+
+    def extract(self, service, item):
+        """Yield the text of a Drive file in chunks"""
+        size = int(item.get('size') or 0)
+        if size > self.max_document_bytes:
+            raise ExtractionError(f"{size} bytes exceeds the {self.max_document_bytes} byte limit")
+
+        mime_type = item['mimeType']
+        with self._download(service, item) as raw:
+            if mime_type == self.PDF:
+                chunks = self._pdf_chunks(raw)
+            elif mime_type == self.DOCX:
+                chunks = self._docx_chunks(raw)
+            else:
+                chunks = self._text_chunks(raw)
+
+            # Extracted text is capped too (as UTF-8 bytes); a small file can expand a lot
+            remaining = self.max_document_bytes
+            for chunk in chunks:
+                encoded = chunk.encode('utf-8')
+                if len(encoded) >= remaining:
+                    # Cut on a character boundary rather than mid-sequence
+                    yield encoded[:remaining].decode('utf-8', errors='ignore')
+                    return
+                remaining -= len(encoded)
+                yield chunk
+
+    def _download(self, service, item):
+        """Download a file (or its export) into a spooled temporary file"""
+        from googleapiclient.errors import HttpError
+        from googleapiclient.http import MediaIoBaseDownload
+
+        export_type = self.GOOGLE_EXPORTS.get(item['mimeType'])
+        if export_type:
+            request = service.files().export_media(fileId=item['id'], mimeType=export_type)
+        else:
+            request = service.files().get_media(fileId=item['id'])
+
+        raw = tempfile.SpooledTemporaryFile(max_size=self.spool_size)
+        try:
+            downloader = MediaIoBaseDownload(raw, request, chunksize=self.chunk_size)
+            done = False
+            while done is False:
+                status, done = downloader.next_chunk()
+                if raw.tell() > self.max_document_bytes:
+                    raise ExtractionError(f"download exceeds the {self.max_document_bytes} byte limit")
+        except HttpError as e:
+            # e.g. exportSizeLimitExceeded: skip this file rather than abort the run
+            raw.close()
+            raise ExtractionError(f"download failed: {e}")
+        except Exception:
+            raw.close()
+            raise
+
+        raw.seek(0)
+        return raw
+
+    def _text_chunks(self, raw):
+        """Decode UTF-8 text incrementally"""
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        while True:
+            data = raw.read(self.chunk_size)
+            if not data:
+                break
+            text = decoder.decode(data)
+            if text:
+                yield text
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+    def _pdf_chunks(self, raw):
+        """Extract PDF text one page at a time"""
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            raise ExtractionError("PDF support requires the 'pypdf' package")
+
+        try:
+            reader = PdfReader(raw)
+            for page in reader.pages:
+                text = page.extract_text() or ''
+                if text:
+                    yield text + '\n'
+        except Exception as e:
+            raise ExtractionError(f"unreadable PDF: {e}")
+
+    def _docx_chunks(self, raw):
+        """Stream paragraphs out of a Word document's XML"""
+        word = self._WORD_NS
+        pieces = []
+        buffered = 0
+
+        try:
+            with zipfile.ZipFile(raw) as archive, archive.open('word/document.xml') as xml:
+                for event, element in iterparse(xml, events=('end',)):
+                    tag = element.tag
+                    if tag == word + 't' and element.text:
+                        pieces.append(element.text)
+                        buffered += len(element.text)
+                    elif tag == word + 'tab':
+                        pieces.append('\t')
+                    elif tag in (word + 'br', word + 'p'):
+                        pieces.append('\n')
+                        if tag == word + 'p':
+                            # Finished paragraphs are no longer needed
+                            element.clear()
+
+                    if buffered >= self.chunk_size:
+                        yield ''.join(pieces)
+                        pieces = []
+                        buffered = 0
+        except (zipfile.BadZipFile, KeyError) as e:
+            raise ExtractionError(f"unreadable Word document: {e}")
+
+        if pieces:
+            yield ''.join(pieces)
@@ -0,0 +1,191 @@
+"""
+Feedback Log Module
+Durable append-only feedback events with incrementally maintained preference weights.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+
+class FeedbackLog:
+    """Append-only JSON-lines log of feedback plus per-client preference scores.
+
+    ``record`` hands events to one background committer that writes
+    everything queued in a single ``write`` and ``fsync`` (group commit),
+    so concurrent requests share the cost of a sync instead of paying one
+    each. After every commit the new tail of the log, including events
+    other processes appended, is folded into per-client scores by format,
+    theme and angle; ``preferences`` reads them without scanning the log.
+    A snapshot of the scores and the log offset is written every
+    ``snapshot_every`` events so startup only replays the tail.
+    """
+
+    DIMENSIONS = ('format', 'theme', 'angle')
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.directory = Path(config.get('dir', '.cache/feedback'))
+        self.client = config.get('client', 'default')
+        self.commit_interval = config.get('commit_interval_ms', 5) / 1000
+        self.max_batch = config.get('max_batch', 1024)
+        self.snapshot_every = config.get('snapshot_every', 10000)
+        self.log_path = self.directory / 'events.jsonl'
+        self.snapshot_path = self.directory / 'preferences.json'
+
+        self.scores = {}  # client -> dimension -> value -> score
+        self.totals = {}  # client -> dimension -> sum of |signal|
+        self._offset = 0
+        self._since_snapshot = 0
+        self._scores_lock = threading.Lock()
+
+        self._pending = []
+        self._enqueued = 0
+        self._committed = 0
+        self._error = None
+        self._closed = False
+        self._commit = threading.Condition()
+        self._writer = None
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.log_path.touch(exist_ok=True)
+        self._load_snapshot()
+        self._catch_up()
+
+    def record(self, event, wait=True):
+        """Append an event; with ``wait``, return only once it is durable on disk"""
+        event = dict(event)
+        event.setdefault('client', self.client)
+        event.setdefault('ts', time.time())
+        line = (json.dumps(event, separators=(',', ':')) + '\n').encode('utf-8')
+
+        with self._commit:
+            if self._closed:
+                raise RuntimeError("feedback log is closed")
+            self._pending.append(line)
+            self._enqueued += 1
+            ticket = self._enqueued
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run_writer, name='feedback-commit', daemon=True)
+                self._writer.start()
+            self._commit.notify_all()
+
+            while wait and self._committed < ticket and self._error is None:
+                self._commit.wait()
+            if wait and self._error is not None:
+                raise self._error
+        return event
+
+    def preferences(self, client=None):
+        """Per-dimension preference of each value between -1 and 1 for ``client``"""
+        if self.log_path.stat().st_size != self._offset:
+            # Another process appended since we last looked
+            self._catch_up()
+        client = client or self.client
+        with self._scores_lock:
+            scores = self.scores.get(client, {})
+            totals = self.totals.get(client, {})
+            return {dimension: {value: score / totals[dimension] for value, score in values.items()}
+                    for dimension, values in scores.items() if totals.get(dimension)}
+
+    def close(self):
+        """Commit anything still queued and stop the writer"""
+        with self._commit:
+            self._closed = True
+            self._commit.notify_all()
+        if self._writer is not None:
+            self._writer.join()
+
+    @classmethod
+    def signal(cls, event):
+        """How strongly an event favours its ideas: +1 for a pick, shifted by a 1-5 rating"""
+        signal = 1.0 if event.get('type', 'select') == 'select' else -1.0
+        try:
+            signal += (float(event['rating']) - 3) / 2
+        except (KeyError, TypeError, ValueError):
+            pass
+        return signal
+
+    def _run_writer(self):
+        with open(self.log_path, 'ab') as log:
+            while True:
+                with self._commit:
+                    while not self._pending and not self._closed:
+                        self._commit.wait()
+                    if not self._pending and self._closed:
+                        return
+
+                # Give concurrent callers a moment to join this batch
+                time.sleep(self.commit_interval)
+
+                with self._commit:
+                    batch = self._pending[:self.max_batch]
+                    del self._pending[:len(batch)]
+
+                try:
+                    log.write(b''.join(batch))
+                    log.flush()
+                    os.fsync(log.fileno())
+                    self._catch_up()
+                except Exception as e:
+                    with self._commit:
+                        self._error = e
+                        self._commit.notify_all()
+                    return
+
+                with self._commit:
+                    self._committed += len(batch)
+                    self._commit.notify_all()
+
+    def _catch_up(self):
+        """Fold complete lines appended since ``_offset`` into the scores"""
+        with self._scores_lock:
+            with open(self.log_path, 'rb') as log:
+                log.seek(self._offset)
+                data = log.read()
+            end = data.rfind(b'\n') + 1  # a torn final line is left for later
+            for line in data[:end].splitlines():
+                try:
+                    self._apply(json.loads(line))
+                except ValueError:
+                    continue
+                self._since_snapshot += 1
+            self._offset += end
+
+            if self._since_snapshot >= self.snapshot_every:
+                self._write_snapshot()
+                self._since_snapshot = 0
+
+    def _apply(self, event):
+        client = event.get('client', self.client)
+        signal = self.signal(event)
+        scores = self.scores.setdefault(client, {})
+        totals = self.totals.setdefault(client, {})
+        for idea in event.get('ideas', []):
+            for dimension in self.DIMENSIONS:
+                value = idea.get(dimension)
+                if value is None:
+                    continue
+                values = scores.setdefault(dimension, {})
+                values[value] = values.get(value, 0.0) + signal
+                totals[dimension] = totals.get(dimension, 0.0) + abs(signal)
+
+    def _load_snapshot(self):
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return
+        if snapshot.get('offset', 0) <= self.log_path.stat().st_size:
+            self.scores = snapshot['scores']
+            self.totals = snapshot['totals']
+            self._offset = snapshot['offset']
+
+    def _write_snapshot(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'offset': self._offset, 'scores': self.scores, 'totals': self.totals}, f)
+        os.replace(tmp_path, self.snapshot_path)
@@ -3,10 +3,26 @@ Form Handler Module
 Manages forms for requesting additional information from users.
 """
 
+import os
+import select
+import sys
+import threading
+from concurrent.futures import Future
+
+
 class FormHandler:
     """Handles user forms for additional information"""
 
+    # Answers that only shape the audience profile; the rest feed the business analysis
+    AUDIENCE_QUESTIONS = (5, 6, 7)
+
     def __init__(self):
+        # Future for a form opened with ``start``, until its answers have been taken
+        self.pending = None
+        # Console thread asking the open form's questions, and the event that stops it
+        self._reader = None
+        self._cancel = None
+
         self.questions = [
             "What is the primary target market for your business?",
             "What are your main competitors?",
@@ -18,8 +34,8 @@ class FormHandler:
             "Are there any specific topics you want to avoid?"
         ]
 
-    def request_additional_info(self):
-        """Present form to user and collect responses"""
+    def request_additional_info(self, cancel=None):
+        """Present form to user and collect responses; stops early once ``cancel`` is set"""
         print("\n" + "="*50)
         print("ADDITIONAL INFORMATION REQUESTED")
         print("="*50)
@@ -28,13 +44,102 @@ class FormHandler:
         responses = {}
         for i, question in enumerate(self.questions, 1):
             print(f"\n{i}. {question}")
-            response = input("> ").strip()
+            response = self._read_answer(cancel)
+            if response is None:
+                return responses
+            response = response.strip()
             if response:
                 responses[f"question_{i}"] = response
 
         print("\nThank you for providing additional information!")
         return responses
 
+    def start(self, console=True):
+        """Open the form without blocking and return a Future for the answers.
+
+        With ``console`` the questions are asked on a background thread;
+        otherwise the form waits for ``submit`` (e.g. from the web interface).
+        """
+        # Only one form is open at a time
+        self.cancel()
+        future = Future()
+        self.pending = future
+
+        if console:
+            cancel = threading.Event()
+
+            def ask():
+                try:
+                    future.set_result(self.request_additional_info(cancel))
+                except BaseException as e:  # EOFError, KeyboardInterrupt, ...
+                    future.set_exception(e)
+
+            self._cancel = cancel
+            self._reader = threading.Thread(target=ask, name='form-input', daemon=True)
+            self._reader.start()
+        return future
+
+    def cancel(self, timeout=1.0):
+        """Close the open form so late answers are refused and the console stops asking.
+
+        Returns False if the console thread is still blocked reading stdin
+        (where that read can't be interrupted); the caller must not read
+        stdin itself until the form is finished.
+        """
+        self.pending = None
+        reader = self._reader
+        if reader is None:
+            return True
+        self._cancel.set()
+        reader.join(timeout)
+        if reader.is_alive():
+            return False
+        self._reader = None
+        return True
+
+    def submit(self, answers):
+        """Answer the open form; returns False if there is none or it was already answered"""
+        future = self.pending
+        if future is None or future.done():
+            return False
+        future.set_result({key: value.strip() for key, value in answers.items()
+                           if isinstance(value, str) and value.strip()})
+        return True
+
+    def _read_answer(self, cancel):
+        """Read one line from stdin, or return ``None`` once ``cancel`` is set.
+
+        Where stdin can be polled the line is read straight from the file
+        descriptor, so a cancelled form leaves unread input for whoever
+        reads stdin next. Elsewhere this falls back to a blocking ``input``.
+        """
+        try:
+            fd = sys.stdin.fileno()
+        except (AttributeError, OSError, ValueError):
+            fd = None
+        if cancel is None or fd is None or os.name != 'posix':
+            return input("> ")
+
+        print("> ", end="", flush=True)
+        line = bytearray()
+        while not cancel.is_set():
+            if not select.select([fd], [], [], 0.1)[0]:
+                continue
+            byte = os.read(fd, 1)
+            if not byte:
+                raise EOFError
+            if byte == b'\n':
+                return line.decode('utf-8', errors='replace')
+            line += byte
+        return None
+
+    def split_answers(self, answers):
+        """Split answers into ``(business_answers, audience_answers)``"""
+        audience_keys = {f"question_{i}" for i in self.AUDIENCE_QUESTIONS}
+        business = {key: value for key, value in answers.items() if key not in audience_keys}
+        audience = {key: value for key, value in answers.items() if key in audience_keys}
+        return business, audience
+
     def get_missing_info_questions(self, analysis_result):
         """Generate specific questions based on analysis gaps"""
         missing_questions = []
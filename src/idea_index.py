@@ -0,0 +1,113 @@
+"""
+Idea Index Module
+Server-held idea sets with precomputed filter indexes and cursor pagination.
+"""
+
+import gzip
+import json
+import uuid
+from array import array
+from bisect import bisect_left
+
+
+class IdeaIndex:
+    """An immutable set of ideas with a posting list per filter value.
+
+    Each filterable field maps every value to the ascending positions of
+    the ideas that have it, so a filtered page is found by leapfrogging
+    through the shortest posting list with binary searches into the
+    others. The cost of a page depends on the page size and the filters,
+    not on how many ideas the set holds.
+    """
+
+    FILTERS = {
+        'format': 'format',
+        'theme': 'theme',
+        'platform': 'target_platforms',
+        'duration': 'estimated_duration'
+    }
+
+    def __init__(self, ideas, set_id=None):
+        self.ideas = ideas
+        # Sets never change, so the id doubles as the ETag version; random so restarts don't reuse it
+        self.set_id = set_id or uuid.uuid4().hex[:12]
+        self.postings = {name: {} for name in self.FILTERS}
+        self.positions = {}
+
+        for position, idea in enumerate(ideas):
+            missing = [field for field in ('id',) + tuple(self.FILTERS.values()) if field not in idea]
+            if missing:
+                raise ValueError(f"idea {position} is missing {', '.join(missing)}")
+            self.positions[idea['id']] = position
+            for name, field in self.FILTERS.items():
+                values = idea[field]
+                for value in (values if isinstance(values, (list, tuple)) else (values,)):
+                    postings = self.postings[name].get(value)
+                    if postings is None:
+                        postings = self.postings[name][value] = array('L')
+                    postings.append(position)
+
+    def __len__(self):
+        return len(self.ideas)
+
+    def by_id(self, idea_id):
+        """The idea with ``idea_id``, or ``None``"""
+        position = self.positions.get(idea_id)
+        return None if position is None else self.ideas[position]
+
+    def facets(self):
+        """Every filter value with the number of ideas that have it"""
+        return {name: {value: len(postings) for value, postings in sorted(values.items())}
+                for name, values in self.postings.items()}
+
+    def page(self, filters=None, cursor=0, limit=50):
+        """Return ``(ideas, next_cursor)`` for the ideas matching every filter from ``cursor`` on"""
+        positions = self._matches(filters or {}, cursor, limit + 1)
+        next_cursor = positions[limit] if len(positions) > limit else None
+        return [dict(self.ideas[position]) for position in positions[:limit]], next_cursor
+
+    def _matches(self, filters, cursor, limit):
+        lists = []
+        for name, value in filters.items():
+            postings = self.postings[name].get(value)
+            if postings is None:
+                return []
+            lists.append(postings)
+
+        if not lists:
+            return list(range(cursor, min(cursor + limit, len(self.ideas))))
+
+        lists.sort(key=len)
+        driver, others = lists[0], lists[1:]
+        matches = []
+        i = bisect_left(driver, cursor)
+        while i < len(driver) and len(matches) < limit:
+            candidate = driver[i]
+            for other in others:
+                j = bisect_left(other, candidate)
+                if j == len(other):
+                    return matches  # one filter has no positions left
+                if other[j] != candidate:
+                    # Skip straight to the next position this filter can match
+                    i = bisect_left(driver, other[j])
+                    break
+            else:
+                matches.append(candidate)
+                i += 1
+        return matches
+
+
+def encode_json(value):
+    """Serialize to compact UTF-8 JSON, using orjson when it is installed"""
+    try:
+        import orjson
+    except ImportError:
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return orjson.dumps(value)
+
+
+def compress(body, accept_encoding, min_size=1024):
+    """Gzip ``body`` when the client accepts it and it is worth it; returns ``(body, encoding)``"""
+    if len(body) < min_size or 'gzip' not in (accept_encoding or ''):
+        return body, None
+    return gzip.compress(body, compresslevel=5), 'gzip'
@@ -0,0 +1,279 @@
+"""
+Idea Store Module
+Keeps script ideas as integer-coded columns and renders dicts only when asked.
+"""
+
+import threading
+from array import array
+from collections.abc import Mapping, Sequence
+
+TITLE_TEMPLATES = [
+    "How {topic} {angle} Changed Everything",
+    "The {angle} Side of {topic}",
+    "{theme_title}: A {topic} Story",
+    "Unlocking {topic} Through {angle}",
+    "{format_title}: {topic} {theme}",
+    "Discover {angle} in {topic}",
+    "{topic} {theme}: What You Need to Know",
+    "From {angle} to Success: {topic}"
+]
+
+DURATIONS = {
+    'short clip': '15-30 seconds',
+    'testimonial': '1-2 minutes',
+    'tutorial': '3-5 minutes',
+    'interview': '5-10 minutes',
+    'webinar': '30-60 minutes',
+    'documentary style': '10-15 minutes',
+    'live stream': '30-90 minutes'
+}
+
+FIELDS = ('id', 'title', 'format', 'theme', 'angle', 'topic', 'description', 'key_elements',
+          'estimated_duration', 'target_platforms')
+
+NO_TEMPLATE = 255
+
+
+def render_title(template, format_type, theme, topic, angle):
+    """Fill in a title template"""
+    return TITLE_TEMPLATES[template].format(topic=topic, angle=angle, theme=theme,
+                                            theme_title=theme.title(), format_title=format_type.title())
+
+
+def render_description(format_type, theme, topic, angle, tone, language, cultural_elements):
+    """Build the detailed description of an idea"""
+    description = f"This {format_type} explores {theme} in {topic}, "
+
+    if angle:
+        description += f"focusing on the {angle} aspect. "
+
+    if tone:
+        description += f"The content uses a {tone} tone "
+
+    if language:
+        description += f"with {language} language "
+
+    if cultural_elements:
+        culture_str = ", ".join(cultural_elements)
+        description += f"incorporating {culture_str} cultural elements. "
+
+    description += "Perfect for engaging your target audience and driving action."
+
+    return description
+
+
+class Recompute:
+    """Change for ``IdeaStore.derive_rows`` computed from other columns of each row"""
+
+    __slots__ = ('sources', 'func')
+
+    def __init__(self, sources, func):
+        self.sources = tuple(sources)
+        self.func = func
+
+
+class Codebook:
+    """Interns values (strings or tuples of strings) as small integer codes.
+
+    Stores derived from one another share codebooks, so new values are
+    assigned under a lock; known values are looked up without one.
+    """
+
+    __slots__ = ('values', 'codes', 'lock')
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+        self.lock = threading.Lock()
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            with self.lock:
+                code = self.codes.get(value)
+                if code is None:
+                    # Append first, so a published code always has its value
+                    self.values.append(value)
+                    code = self.codes[value] = len(self.values) - 1
+        return code
+
+    def __getstate__(self):
+        # Stores are pickled into the pipeline cache; the lock is rebuilt on load
+        return (self.values,)
+
+    def __setstate__(self, state):
+        self.values, = state
+        self.codes = {value: code for code, value in enumerate(self.values)}
+        self.lock = threading.Lock()
+
+    def __getitem__(self, code):
+        return self.values[code]
+
+    def __len__(self):
+        return len(self.values)
+
+
+class IdeaStore(Sequence):
+    """Script ideas stored column-wise as integer codes.
+
+    Every descriptive field (format, theme, angle, topic, tone, language,
+    cultural elements, key element and platform lists) is an integer code
+    into a per-column ``Codebook``, so an idea costs a few dozen bytes
+    however long its rendered text is. Titles, descriptions and durations
+    are rendered from those codes on access. Rows are never modified:
+    ``derive_rows`` builds improved copies in a new store and leaves the
+    originals intact.
+    Indexing yields ``IdeaRecord`` views; ``to_dicts`` converts at the
+    UI/JSON boundary.
+    """
+
+    CODED = ('format', 'theme', 'angle', 'topic', 'tone', 'language', 'cultural_elements',
+             'key_elements', 'target_platforms')
+
+    def __init__(self, codebooks=None):
+        self.ids = array('L')
+        self.templates = array('B')
+        self.codebooks = codebooks or {name: Codebook() for name in self.CODED}
+        # Four-byte codes: feedback keeps adding key element combinations without bound
+        self.columns = {name: array('L') for name in self.CODED}
+        # Text of ideas imported from plain dicts, which may not follow a template
+        self.titles = {}
+        self.descriptions = {}
+
+    def append(self, idea_id, template, **fields):
+        """Add an idea from its components and return its row number"""
+        row = len(self.ids)
+        self.ids.append(idea_id)
+        self.templates.append(template)
+        for name in self.CODED:
+            self.columns[name].append(self.codebooks[name].code(_frozen(fields.get(name, ()))))
+        return row
+
+    def add_dict(self, idea):
+        """Import a plain idea dict (e.g. from a checkpoint) and return its row number"""
+        row = self.append(idea['id'], NO_TEMPLATE,
+                          format=idea['format'], theme=idea['theme'], angle=idea['angle'],
+                          topic=idea['topic'], tone='professional', language='', cultural_elements=(),
+                          key_elements=idea.get('key_elements', ()),
+                          target_platforms=idea.get('target_platforms', ()))
+        self.titles[row] = idea['title']
+        self.descriptions[row] = idea['description']
+        return row
+
+    def derive_rows(self, rows, changes):
+        """Return a new store with changed copies of ``rows``, built in one columnar pass.
+
+        ``changes`` maps a column to a new value for every row or to a
+        ``Recompute``, which runs once per distinct combination of its
+        source codes rather than once per row. Untouched columns are copied
+        code for code. The new store shares this one's codebooks, which
+        only ever grow, so no value is re-interned.
+        """
+        rows = list(rows)
+        derived = IdeaStore(self.codebooks)
+        derived.ids.extend([self.ids[row] for row in rows])
+        derived.templates.extend([self.templates[row] for row in rows])
+
+        for name in self.CODED:
+            column = self.columns[name]
+            codebook = self.codebooks[name]
+            change = changes.get(name)
+            if change is None:
+                codes = [column[row] for row in rows]
+            elif isinstance(change, Recompute):
+                sources = [self.columns[source] for source in change.sources]
+                keys = [tuple(source[row] for source in sources) for row in rows]
+                new_codes = {}
+                for key in set(keys):
+                    values = [self.codebooks[source][code] for source, code in zip(change.sources, key)]
+                    new_codes[key] = codebook.code(_frozen(change.func(*values)))
+                codes = [new_codes[key] for key in keys]
+            else:
+                codes = [codebook.code(_frozen(change))] * len(rows)
+            derived.columns[name].extend(codes)
+
+        for new_row, row in enumerate(rows):
+            if row in self.titles:
+                derived.titles[new_row] = self.titles[row]
+            if row in self.descriptions:
+                # Imported text has no components to re-render from
+                description = self.descriptions[row]
+                if isinstance(changes.get('tone'), str):
+                    description = description.replace(self.field(row, 'tone'), changes['tone'])
+                derived.descriptions[new_row] = description
+
+        return derived
+
+    def field(self, row, name):
+        """Decoded value of one stored column"""
+        return self.codebooks[name][self.columns[name][row]]
+
+    def value(self, row, key):
+        """Value of an idea field, rendering text fields on demand"""
+        if key == 'id':
+            return self.ids[row]
+        if key in ('format', 'theme', 'angle', 'topic'):
+            return self.field(row, key)
+        if key in ('key_elements', 'target_platforms'):
+            return list(self.field(row, key))
+        if key == 'estimated_duration':
+            return DURATIONS.get(self.field(row, 'format'), '2-5 minutes')
+        if key == 'title':
+            if row in self.titles:
+                return self.titles[row]
+            return render_title(self.templates[row], self.field(row, 'format'), self.field(row, 'theme'),
+                                self.field(row, 'topic'), self.field(row, 'angle'))
+        if key == 'description':
+            if row in self.descriptions:
+                return self.descriptions[row]
+            return render_description(self.field(row, 'format'), self.field(row, 'theme'),
+                                      self.field(row, 'topic'), self.field(row, 'angle'),
+                                      self.field(row, 'tone'), self.field(row, 'language'),
+                                      self.field(row, 'cultural_elements'))
+        raise KeyError(key)
+
+    def to_dicts(self):
+        """Plain dicts for every idea"""
+        return [record.to_dict() for record in self]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [IdeaRecord(self, row) for row in range(len(self.ids))[index]]
+        if index < 0:
+            index += len(self.ids)
+        if not 0 <= index < len(self.ids):
+            raise IndexError(index)
+        return IdeaRecord(self, index)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class IdeaRecord(Mapping):
+    """Read-only dict view of one idea in an ``IdeaStore``"""
+
+    __slots__ = ('store', 'row')
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    def __getitem__(self, key):
+        return self.store.value(self.row, key)
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self):
+        return len(FIELDS)
+
+    def to_dict(self):
+        return {key: self.store.value(self.row, key) for key in FIELDS}
+
+    def __repr__(self):
+        return f"IdeaRecord({self.store.ids[self.row]}, {self['title']!r})"
+
+
+def _frozen(value):
+    # Lists are stored as tuples so they can be interned and never mutated
+    return tuple(value) if isinstance(value, list) else value
@@ -0,0 +1,62 @@
+"""
+Language Detection Module
+Guesses a document's language from its most common function words.
+"""
+
+import re
+
+
+class LanguageDetector:
+    """Scores a text sample against small stop-word profiles.
+
+    Function words ("the", "de", "que", ...) make up a large share of any
+    running text, so counting them over the first few thousand characters
+    is enough to tell the supported languages apart without loading a
+    model. Texts with too few hits fall back to ``default``.
+    """
+
+    PROFILES = {
+        'en': {'the', 'and', 'of', 'to', 'in', 'is', 'that', 'for', 'it', 'with', 'as', 'was',
+               'on', 'are', 'be', 'this', 'by', 'or', 'have', 'from', 'not', 'they', 'we',
+               'you', 'which', 'an', 'at', 'our', 'will', 'can', 'has', 'their', 'more'},
+        'es': {'de', 'la', 'que', 'el', 'en', 'y', 'los', 'del', 'se', 'las', 'por', 'un',
+               'para', 'con', 'no', 'una', 'su', 'al', 'es', 'lo', 'como', 'más', 'pero',
+               'sus', 'le', 'ya', 'o', 'este', 'sí', 'porque', 'esta', 'entre', 'cuando',
+               'muy', 'sin', 'sobre', 'también', 'nuestro', 'nuestros', 'son', 'está'},
+        'pt': {'de', 'a', 'o', 'que', 'e', 'do', 'da', 'em', 'um', 'para', 'com', 'não',
+               'uma', 'os', 'no', 'se', 'na', 'por', 'mais', 'as', 'dos', 'como', 'mas',
+               'ao', 'ele', 'das', 'à', 'seu', 'sua', 'ou', 'quando', 'muito', 'nos', 'já',
+               'também', 'só', 'pelo', 'pela', 'até', 'isso', 'são', 'está', 'nossa'},
+        'fr': {'de', 'la', 'le', 'et', 'les', 'des', 'en', 'un', 'du', 'une', 'que', 'est',
+               'pour', 'qui', 'dans', 'par', 'plus', 'pas', 'au', 'sur', 'ne', 'se', 'ce',
+               'il', 'sont', 'avec', 'nous', 'vous', 'leur', 'aux', 'ou', 'mais', 'être'},
+        'de': {'der', 'die', 'und', 'in', 'den', 'von', 'zu', 'das', 'mit', 'sich', 'des',
+               'auf', 'für', 'ist', 'im', 'dem', 'nicht', 'ein', 'eine', 'als', 'auch',
+               'es', 'an', 'werden', 'aus', 'er', 'hat', 'dass', 'sie', 'nach', 'wird',
+               'bei', 'einer', 'um', 'am', 'sind', 'noch', 'wie', 'einem', 'über', 'wir'}
+    }
+
+    _WORD = re.compile(r"[^\W\d_]+")
+
+    def __init__(self, languages=None, default='en', sample_size=4000, min_hits=5):
+        self.languages = [lang for lang in (languages or self.PROFILES) if lang in self.PROFILES]
+        self.default = default
+        self.sample_size = sample_size
+        self.min_hits = min_hits
+
+    def detect(self, text):
+        """Return the ISO 639-1 code of the most likely language of ``text``"""
+        words = self._WORD.findall(text[:self.sample_size].lower())
+
+        scores = dict.fromkeys(self.languages, 0)
+        for word in words:
+            for lang in self.languages:
+                if word in self.PROFILES[lang]:
+                    scores[lang] += 1
+
+        if not scores:
+            return self.default
+        best = max(scores, key=scores.get)
+        if scores[best] < self.min_hits:
+            return self.default
+        return best
@@ -0,0 +1,90 @@
+"""
+Model Pool Module
+Loads spaCy models on demand and evicts the least recently used under a memory budget.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+
+class ModelPool:
+    """Keeps at most ``memory_budget_mb`` worth of language models resident.
+
+    Models are loaded the first time a document in their language shows
+    up. A model's footprint comes from ``model_sizes_mb`` when given;
+    otherwise it is measured as the growth of the process's resident
+    memory while it loads (or ``default_model_mb`` where that cannot be
+    read). When a new model would exceed the budget, the least
+    recently used ones are dropped first; the most recently requested
+    model is always kept, even if it alone is over budget.
+    """
+
+    def __init__(self, models, memory_budget_mb=1024, default_model_mb=100, model_sizes_mb=None,
+                 loader=None):
+        self.models = dict(models)
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.default_model_size = default_model_mb * 1024 * 1024
+        self.model_sizes = {language: mb * 1024 * 1024 for language, mb in (model_sizes_mb or {}).items()}
+        self.loader = loader or load_spacy_model
+
+        self._loaded = OrderedDict()  # language -> (model, size in bytes)
+        self._lock = threading.Lock()
+
+    @property
+    def resident_bytes(self):
+        """Estimated memory held by the loaded models"""
+        return sum(size for _, size in self._loaded.values())
+
+    def loaded_languages(self):
+        """Languages whose models are resident, least recently used first"""
+        return list(self._loaded)
+
+    def get(self, language):
+        """Return the model for ``language``, loading it (and evicting others) if needed"""
+        with self._lock:
+            if language in self._loaded:
+                self._loaded.move_to_end(language)
+                return self._loaded[language][0]
+
+            # Loading under the lock keeps the memory measurement to one model at a time
+            before = _resident_memory()
+            model = self.loader(self.models[language])
+            after = _resident_memory()
+            if language in self.model_sizes:
+                size = self.model_sizes[language]
+            elif before is not None and after is not None and after > before:
+                size = after - before
+            else:
+                size = self.default_model_size
+
+            self._loaded[language] = (model, size)
+            self._evict()
+            return model
+
+    def _evict(self):
+        while len(self._loaded) > 1 and self.resident_bytes > self.memory_budget:
+            language, _ = self._loaded.popitem(last=False)
+            print(f"Unloading '{self.models[language]}' model to stay within the memory budget")
+
+
+def load_spacy_model(name):
+    """Load a spaCy model, downloading it first if it is not installed"""
+    import spacy  # Heavy; only paid by commands that actually parse text
+
+    try:
+        return spacy.load(name)
+    except OSError:
+        # Download model if not available
+        import subprocess
+        subprocess.run(['python', '-m', 'spacy', 'download', name])
+        return spacy.load(name)
+
+
+def _resident_memory():
+    """Current resident set size in bytes, or ``None`` where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm', 'r') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
@@ -0,0 +1,160 @@
+"""
+Page Fetch Module
+Downloads search result pages concurrently and extracts their main text.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlsplit
+
+
+class PageFetcher:
+    """Fetches result pages over a shared session with per-host limits.
+
+    Every download is bounded by ``timeout`` and ``max_bytes`` and at most
+    ``per_host`` requests run against the same host at once. Extracted
+    text is cached on disk by URL together with the page's ``ETag`` and
+    ``Last-Modified`` headers: entries younger than ``max_age`` are reused
+    as-is and older ones are revalidated with a conditional request, so
+    unchanged pages are never downloaded twice.
+    """
+
+    TEXT_TYPES = ('text/html', 'application/xhtml+xml', 'text/plain')
+    NOISE_TAGS = ['script', 'style', 'noscript', 'nav', 'header', 'footer', 'aside', 'form',
+                  'svg', 'iframe']
+
+    def __init__(self, config, get_session):
+        self.get_session = get_session
+        self.workers = config.get('workers', 8)
+        self.per_host = config.get('per_host', 2)
+        self.timeout = config.get('timeout', 10)
+        self.max_bytes = config.get('max_bytes', 2 * 1024 * 1024)
+        self.max_text_chars = config.get('max_text_chars', 20000)
+        self.max_age = config.get('max_age', 7 * 24 * 3600)
+        self.cache_dir = Path(config.get('cache_dir', '.cache/pages'))
+
+        self._host_limits = {}
+        self._host_lock = threading.Lock()
+
+    def fetch_all(self, results):
+        """Add the extracted page text as ``content`` to each search result in place"""
+        pending = [result for result in results if result.get('url') and 'content' not in result]
+        if not pending:
+            return results
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(pending))) as executor:
+            for result, text in zip(pending, executor.map(self.fetch, [r['url'] for r in pending])):
+                if text:
+                    result['content'] = text
+        return results
+
+    def fetch(self, url):
+        """Return the main text of ``url`` (from cache when still valid), or ``None``"""
+        import requests
+
+        cached = self._read_cache(url)
+        if cached and time.time() - cached['fetched_at'] < self.max_age:
+            return cached['text']
+
+        headers = {}
+        if cached and cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached and cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+
+        try:
+            with self._host_limit(url):
+                with self.get_session().get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+                    if response.status_code == 304 and cached:
+                        self._write_cache(url, dict(cached, fetched_at=time.time()))
+                        return cached['text']
+                    response.raise_for_status()
+
+                    content_type = response.headers.get('Content-Type', '').split(';')[0].strip()
+                    if content_type not in self.TEXT_TYPES:
+                        return None
+                    body = self._read_capped(response)
+                    # Without a declared charset, let the parser read it from the page itself
+                    encoding = response.encoding if 'charset' in response.headers.get('Content-Type', '') else None
+                    etag = response.headers.get('ETag')
+                    last_modified = response.headers.get('Last-Modified')
+        except requests.RequestException as e:
+            print(f"Page fetch failed for {url}: {e}")
+            return cached['text'] if cached else None
+
+        if content_type == 'text/plain':
+            text = body.decode(encoding or 'utf-8', 'replace')
+        else:
+            text = self.extract_text(body, encoding)
+        text = ' '.join(text.split())[:self.max_text_chars]
+
+        self._write_cache(url, {'url': url, 'etag': etag, 'last_modified': last_modified,
+                                'fetched_at': time.time(), 'text': text})
+        return text
+
+    def extract_text(self, html, encoding=None):
+        """Extract the readable main text of an HTML page"""
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(html, self._parser(), from_encoding=encoding)
+        for tag in soup(self.NOISE_TAGS):
+            tag.decompose()
+
+        # Prefer the page's declared main content over the whole body
+        root = soup.find('article') or soup.find('main') or soup.body or soup
+        blocks = [block.get_text(' ', strip=True)
+                  for block in root.find_all(['h1', 'h2', 'h3', 'p', 'li', 'blockquote'])]
+        blocks = [block for block in blocks if block]
+        return '\n'.join(blocks) if blocks else root.get_text(' ', strip=True)
+
+    def _read_capped(self, response):
+        """Read at most ``max_bytes`` of the body; anything beyond is not downloaded"""
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= self.max_bytes:
+                break
+        return b''.join(chunks)[:self.max_bytes]
+
+    def _host_limit(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self._host_lock:
+            limit = self._host_limits.get(host)
+            if limit is None:
+                limit = self._host_limits[host] = threading.BoundedSemaphore(self.per_host)
+        return limit
+
+    def _cache_path(self, url):
+        return self.cache_dir / (hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json')
+
+    def _read_cache(self, url):
+        try:
+            with open(self._cache_path(url), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get('url') == url else None
+
+    def _write_cache(self, url, entry):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, self._cache_path(url))
+
+    @staticmethod
+    def _parser():
+        # lxml is several times faster than the pure-Python parser when installed
+        try:
+            import lxml  # noqa: F401
+            return 'lxml'
+        except ImportError:
+            return 'html.parser'
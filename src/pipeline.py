@@ -0,0 +1,267 @@
+"""
+Pipeline Module
+Small stage DAG engine with on-disk memoization so runs can resume.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import threading
+from collections.abc import Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+
+
+def content_digest(value):
+    """Hash of a value's content, independent of how it is held in memory.
+
+    Objects with a ``content_digest`` method (``Vocabulary``, checkpoint
+    ``LazyTable``) supply their own, so a value loaded from a checkpoint
+    hashes like the one that was saved, without reading it in full.
+    Mappings and sequences hash by their items, scalars by their JSON
+    form and anything else by its pickle.
+    """
+    own = getattr(value, 'content_digest', None)
+    if callable(own):
+        return own()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        data = b'j' + json.dumps(value).encode('utf-8')
+    elif isinstance(value, Mapping):
+        items = sorted(content_digest(key) + content_digest(item) for key, item in value.items())
+        data = b'm' + ''.join(items).encode('ascii')
+    elif isinstance(value, Sequence) and not isinstance(value, (bytes, bytearray)):
+        data = b's' + ''.join(content_digest(item) for item in value).encode('ascii')
+    else:
+        data = b'p' + pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    return hashlib.sha256(data).hexdigest()
+
+
+class Stage:
+    """A pipeline step that turns named inputs into named outputs.
+
+    ``config`` is the part of the configuration the stage's result depends
+    on (model names, thresholds, limits, ...). It is part of the stage's
+    version, so changing it invalidates the stage's memoized outputs.
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=(), memoize=True, depends_on=(), config=None):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.memoize = memoize
+        self.version = self._code_version(func, depends_on, config)
+
+    def run(self, values):
+        """Call the stage function and map its result onto the declared outputs"""
+        result = self.func(**{name: values[name] for name in self.inputs})
+        if len(self.outputs) == 1:
+            return {self.outputs[0]: result}
+        return dict(zip(self.outputs, result))
+
+    @staticmethod
+    def _code_version(func, depends_on, config=None):
+        """Fingerprint the stage function, the source files of the components it uses and its config"""
+        digest = hashlib.sha256()
+        digest.update(json.dumps(config, sort_keys=True, default=str).encode('utf-8'))
+        try:
+            digest.update(inspect.getsource(func).encode('utf-8'))
+        except (OSError, TypeError):
+            digest.update(getattr(func, '__qualname__', repr(func)).encode('utf-8'))
+
+        # Bound methods also depend on the code of the class they belong to
+        owner = getattr(func, '__self__', None)
+        components = list(depends_on) + ([owner] if owner is not None else [])
+        for component in components:
+            if not (inspect.isclass(component) or inspect.ismodule(component)):
+                component = type(component)
+            try:
+                digest.update(Path(inspect.getsourcefile(component)).read_bytes())
+            except (OSError, TypeError):
+                pass
+
+        return digest.hexdigest()[:16]
+
+
+class Components(dict):
+    """Pipeline components by name; those given as factories are built on first use.
+
+    Expensive components (the Drive client, the spaCy-backed text
+    processor) are only created once a stage that uses them runs, so a
+    run resumed from checkpoints never loads them.
+    """
+
+    def __init__(self, ready=None, factories=None):
+        super().__init__(ready or {})
+        self._factories = dict(factories or {})
+        self._lock = threading.RLock()
+
+    def __missing__(self, name):
+        if name not in self._factories:
+            raise KeyError(name)
+        with self._lock:
+            # Stages run on several threads; build each component once
+            if not dict.__contains__(self, name):
+                self[name] = self._factories[name]()
+            return dict.__getitem__(self, name)
+
+    def __contains__(self, name):
+        return dict.__contains__(self, name) or name in self._factories
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    def built(self, name):
+        """Whether the component ``name`` exists yet"""
+        return dict.__contains__(self, name)
+
+
+class Pipeline:
+    """Runs stages in dependency order, concurrently where possible.
+
+    Each memoized stage's outputs are stored in ``cache_dir`` under a key
+    derived from the stage name, its code version and the digests of its
+    inputs. A rerun after a crash reloads every stage whose key still
+    matches and only executes the rest. ``memoize_if``, if given, is
+    asked after each run of a memoized stage whether to store that run's
+    outputs (e.g. not when a deadline cut them short).
+    """
+
+    def __init__(self, stages, cache_dir='.cache/pipeline', max_workers=4, memoize_if=None):
+        self.stages = list(stages)
+        self.cache_dir = Path(cache_dir)
+        self.max_workers = max_workers
+        self.memoize_if = memoize_if
+        self._check_graph()
+
+    def run(self, initial=None, targets=None):
+        """Run the pipeline and return every produced value by name.
+
+        With ``targets``, only the stages those values depend on run;
+        otherwise every stage does. Either way, stages whose outputs were
+        supplied up front (e.g. from a checkpoint) are skipped.
+        """
+        values = dict(initial or {})
+        digests = {name: self._digest(value) for name, value in values.items()}
+        pending = self._needed(values, targets)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                ready = [s for s in pending if all(name in values for name in s.inputs)]
+                for stage in ready:
+                    pending.remove(stage)
+                    key = self._stage_key(stage, digests)
+                    cached = self._load(stage, key)
+                    if cached is not None:
+                        print(f"Reusing cached stage: {stage.name}")
+                        values.update(cached['outputs'])
+                        digests.update(cached['digests'])
+                        continue
+                    inputs = {name: values[name] for name in stage.inputs}
+                    running[executor.submit(stage.run, inputs)] = (stage, key)
+
+                if not running:
+                    if ready:
+                        # Cached stages may have unlocked others
+                        continue
+                    missing = sorted({name for s in pending for name in s.inputs if name not in values})
+                    raise ValueError(f"Pipeline inputs never produced: {', '.join(missing)}")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, key = running.pop(future)
+                    outputs = future.result()
+                    stage_digests = {name: self._digest(value) for name, value in outputs.items()}
+                    values.update(outputs)
+                    digests.update(stage_digests)
+                    if stage.memoize and (self.memoize_if is None or self.memoize_if(stage)):
+                        self._store(stage, key, outputs, stage_digests)
+
+        return values
+
+    def update(self, values, changes, targets=None):
+        """Apply ``changes`` to the results of an earlier ``run`` and rerun what they affect.
+
+        Every stage downstream of a changed value is scheduled again, but
+        stage keys are input digests, so a stage whose inputs come out
+        unchanged is reloaded from the cache instead of recomputed.
+        """
+        stale = set(changes)
+        grew = True
+        while grew:
+            grew = False
+            for stage in self.stages:
+                if stale.intersection(stage.inputs) and not stale.issuperset(stage.outputs):
+                    stale.update(stage.outputs)
+                    grew = True
+
+        kept = {name: value for name, value in values.items() if name not in stale}
+        kept.update(changes)
+        return self.run(kept, targets)
+
+    def _needed(self, values, targets):
+        """Stages that must run to produce ``targets`` (all outputs if ``None``) on top of ``values``"""
+        if targets is None:
+            return [stage for stage in self.stages
+                    if not all(name in values for name in stage.outputs)]
+
+        producers = {name: stage for stage in self.stages for name in stage.outputs}
+        needed = set()
+        # Work back from the targets; anything already in ``values`` ends the walk
+        wanted = [name for name in targets if name not in values]
+        while wanted:
+            name = wanted.pop()
+            stage = producers.get(name)
+            if stage is None:
+                raise ValueError(f"No stage produces '{name}'")
+            if stage.name not in needed:
+                needed.add(stage.name)
+                wanted.extend(item for item in stage.inputs if item not in values)
+        return [stage for stage in self.stages if stage.name in needed]
+
+    def _check_graph(self):
+        """Make sure no output is produced by more than one stage"""
+        produced = {}
+        for stage in self.stages:
+            for name in stage.outputs:
+                if name in produced:
+                    raise ValueError(f"Output '{name}' produced by both {produced[name]} and {stage.name}")
+                produced[name] = stage.name
+
+    def _stage_key(self, stage, digests):
+        """Key a stage by its code version and the digests of its inputs"""
+        parts = [stage.name, stage.version] + [f"{name}={digests[name]}" for name in stage.inputs]
+        return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()[:32]
+
+    def _digest(self, value):
+        """Content hash of a stage input or output"""
+        return content_digest(value)
+
+    def _cache_path(self, stage, key):
+        return self.cache_dir / f"{stage.name}-{key}.pkl"
+
+    def _load(self, stage, key):
+        """Load memoized outputs for a stage, if present"""
+        if not stage.memoize:
+            return None
+        path = self._cache_path(stage, key)
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError) as e:
+            print(f"Ignoring unreadable cache for stage {stage.name}: {e}")
+            return None
+
+    def _store(self, stage, key, outputs, digests):
+        """Atomically write a stage's outputs to the cache"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._cache_path(stage, key)
+        tmp_path = path.with_suffix(f'.tmp{os.getpid()}')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'outputs': outputs, 'digests': digests}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
@@ -0,0 +1,154 @@
+"""
+Pipelined Ingest Module
+Overlaps Drive downloads, NLP parsing and web search using bounded queues.
+"""
+
+import queue
+import threading
+
+_DONE = object()
+
+
+class PipelinedIngest:
+    """Runs download, parse and search as concurrent stages.
+
+    Documents flow from ``GoogleDriveAccess.iter_documents`` through a
+    bounded queue to ``TextProcessor`` workers. Key ideas are handed to
+    ``WebSearch`` as soon as they are first seen, so searching starts
+    while later documents are still downloading or being parsed.
+    """
+
+    def __init__(self, drive_access, text_processor, web_search, config=None, duplicate_detector=None):
+        config = config or {}
+        self.drive_access = drive_access
+        self.text_processor = text_processor
+        self.web_search = web_search
+        self.duplicate_detector = duplicate_detector
+        self.queue_size = config.get('queue_size', 8)
+        self.nlp_workers = config.get('nlp_workers', 1)
+
+    def run(self, budget=None):
+        """Run all stages and return ``(processed_data, additional_info, duplicates)``.
+
+        Once ``budget`` runs out, no further documents are downloaded,
+        documents already queued are counted but not parsed, and ideas not
+        yet searched are dropped. At least one document is always parsed.
+        """
+        if self.duplicate_detector is not None:
+            # The detector outlives a run in the daemon; only this run's documents count
+            self.duplicate_detector.reset()
+        documents = queue.Queue(maxsize=self.queue_size)
+        ideas = queue.Queue(maxsize=self.web_search.max_queries or 1)
+        corpus = self.text_processor.new_corpus()
+        corpus_lock = threading.Lock()
+        additional_info = []
+        duplicates = {}
+        errors = []
+        stop = threading.Event()
+        submitted = []
+        skipped = {'documents': 0, 'searches': 0}
+        # Streaming ideas can't be ranked up front, but near-synonyms can still be skipped
+        planner = getattr(self.web_search, 'planner', None)
+
+        def put(target, item):
+            # Give up on full queues once another stage has failed
+            while not stop.is_set():
+                try:
+                    target.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def guarded(stage):
+            def run_stage():
+                try:
+                    stage()
+                except Exception as e:
+                    errors.append(e)
+                    stop.set()
+            return run_stage
+
+        def produce():
+            try:
+                # The budget is checked before each download, not after it
+                for document in self.drive_access.iter_documents(budget=budget):
+                    if self.duplicate_detector is not None:
+                        original = self.duplicate_detector.is_duplicate(document)
+                        if original is not None:
+                            print(f"Skipping near-duplicate of {original}: {document['name']}")
+                            duplicates.setdefault(original, []).append(document['name'])
+                            continue
+                    if not put(documents, document):
+                        return
+            finally:
+                for _ in range(self.nlp_workers):
+                    put(documents, _DONE)
+
+        def parse():
+            while not stop.is_set():
+                try:
+                    document = documents.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if document is _DONE:
+                    return
+                if budget is not None and budget.expired():
+                    with corpus_lock:
+                        if corpus.texts:
+                            skipped['documents'] += 1
+                            continue
+
+                processed = self.text_processor.process_document(document)
+                with corpus_lock:
+                    new_ideas = corpus.add(processed)
+                    # Only the first ideas seen are searched, matching the sequential order
+                    queries_left = max(0, self.web_search.max_queries - len(submitted))
+                    if planner is not None:
+                        new_ideas = planner.select_new(new_ideas, submitted, queries_left)
+                    else:
+                        new_ideas = new_ideas[:queries_left]
+                    submitted.extend(new_ideas)
+                for idea in new_ideas:
+                    put(ideas, idea)
+
+        def search():
+            searched = 0
+            while searched < self.web_search.max_queries and not stop.is_set():
+                try:
+                    idea = ideas.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if idea is _DONE:
+                    return
+                if budget is not None and budget.expired():
+                    skipped['searches'] += 1
+                    continue
+                additional_info.extend(self.web_search.search_idea(idea))
+                searched += 1
+
+        producer = threading.Thread(target=guarded(produce), name='drive-download')
+        parsers = [threading.Thread(target=guarded(parse), name=f'nlp-{i}')
+                   for i in range(self.nlp_workers)]
+        searcher = threading.Thread(target=guarded(search), name='web-search')
+
+        for thread in [producer, searcher] + parsers:
+            thread.start()
+
+        producer.join()
+        for thread in parsers:
+            thread.join()
+        # Let the searcher finish whatever it was handed, then stop it
+        put(ideas, _DONE)
+        searcher.join()
+
+        if errors:
+            raise errors[0]
+        if skipped['documents']:
+            budget.degrade(f"parsed {len(corpus.texts)} of {len(corpus.texts) + skipped['documents']} "
+                           f"documents")
+        if skipped['searches']:
+            budget.degrade(f"skipped {skipped['searches']} of {len(submitted)} searches")
+
+        duplicates = [{'kept': kept, 'collapsed': collapsed} for kept, collapsed in duplicates.items()]
+        return corpus.result(), additional_info, duplicates
@@ -0,0 +1,125 @@
+"""
+Query Planner Module
+Picks the most distinct, most important key ideas to spend search quota on.
+"""
+
+import re
+
+
+class QueryPlanner:
+    """Normalizes candidate queries and drops near-synonyms before searching.
+
+    Candidates are compared on their normalized content words (determiners
+    and possessives removed, simple plurals folded) and on character
+    trigrams of that form, so "our customers", "the customers" and
+    "customer" all collapse to one query. Planning is greedy: the heaviest
+    candidate goes first and each further pick must be less similar than
+    ``threshold`` to everything already chosen.
+    """
+
+    STOP_WORDS = {
+        'a', 'an', 'the', 'our', 'your', 'their', 'my', 'his', 'her', 'its', 'this', 'that',
+        'these', 'those', 'some', 'any', 'all', 'each', 'every', 'of', 'and', 'or', 'for',
+        'to', 'in', 'on', 'with', 'we', 'us', 'you', 'they', 'it',
+        'el', 'la', 'los', 'las', 'un', 'una', 'unos', 'unas', 'nuestro', 'nuestra',
+        'nuestros', 'nuestras', 'su', 'sus', 'de', 'del', 'y', 'o', 'para', 'con', 'en'
+    }
+
+    _WORD = re.compile(r"[^\W_]+(?:'[^\W_]+)?")
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.threshold = config.get('similarity_threshold', 0.6)
+        self.shingle_size = config.get('shingle_size', 3)
+
+    def plan(self, candidates, budget, weights=None):
+        """Return up to ``budget`` distinct queries, heaviest first"""
+        weights = weights or {}
+        groups = {}
+        for position, candidate in enumerate(candidates):
+            key = self.normalize(candidate)
+            if not key:
+                continue
+            weight = weights.get(candidate, 1)
+            group = groups.get(key)
+            if group is None:
+                groups[key] = [weight, position, candidate, weight]
+            else:
+                # Exact normalized duplicates pool their weight; the heaviest spelling is kept
+                group[0] += weight
+                if weight > group[3]:
+                    group[2], group[3] = candidate, weight
+
+        # Heaviest first; earlier candidates win ties so the plan is stable across runs
+        ranked = sorted(groups.items(), key=lambda item: (-item[1][0], item[1][1]))
+        chosen, signatures = [], []
+        for key, (_, _, candidate, _) in ranked:
+            if len(chosen) >= budget:
+                break
+            signature = self._signature(key)
+            if self._is_novel(signature, signatures):
+                chosen.append(self.query_text(candidate))
+                signatures.append(signature)
+        return chosen
+
+    def select_new(self, candidates, chosen, budget):
+        """Filter streaming candidates against queries already chosen, up to ``budget`` more"""
+        signatures = [self._signature(self.normalize(query)) for query in chosen]
+        selected = []
+        for candidate in candidates:
+            if len(selected) >= budget:
+                break
+            key = self.normalize(candidate)
+            if not key:
+                continue
+            signature = self._signature(key)
+            if self._is_novel(signature, signatures):
+                selected.append(self.query_text(candidate))
+                signatures.append(signature)
+        return selected
+
+    def normalize(self, text):
+        """Comparison key: lowercase content words with simple plurals folded"""
+        words = [word for word in self._WORD.findall(text.lower()) if word not in self.STOP_WORDS]
+        return ' '.join(self._singular(word) for word in words)
+
+    def query_text(self, text):
+        """Search text for a candidate: leading determiners and possessives dropped"""
+        words = text.split()
+        while words and words[0].lower() in self.STOP_WORDS:
+            words = words[1:]
+        return ' '.join(words) if words else text
+
+    def similarity(self, first, second):
+        """Similarity of two candidates between 0 and 1"""
+        return self._signature_similarity(self._signature(self.normalize(first)),
+                                          self._signature(self.normalize(second)))
+
+    def _is_novel(self, signature, chosen):
+        return all(self._signature_similarity(signature, other) < self.threshold for other in chosen)
+
+    def _signature(self, key):
+        tokens = frozenset(key.split())
+        padded = f" {key} "
+        size = self.shingle_size
+        shingles = frozenset(padded[i:i + size] for i in range(max(1, len(padded) - size + 1)))
+        return tokens, shingles
+
+    @staticmethod
+    def _signature_similarity(first, second):
+        # Shared words catch reordering; trigrams catch spelling variants
+        return max(_jaccard(first[0], second[0]), _jaccard(first[1], second[1]))
+
+    @staticmethod
+    def _singular(word):
+        if len(word) > 4 and word.endswith('ies'):
+            return word[:-3] + 'y'
+        if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+            return word[:-1]
+        return word
+
+
+def _jaccard(first, second):
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
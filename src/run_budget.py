@@ -0,0 +1,94 @@
+"""
+Run Budget Module
+Global deadline and per-stage time budgets, with a record of what was cut to meet them.
+"""
+
+import threading
+import time
+
+
+class RunBudget:
+    """Time limits for one run and the report of every degradation they forced.
+
+    ``deadline_s`` bounds the whole run; ``stages`` maps a stage name to
+    its own budget in seconds. A stage gets whichever ends first: its own
+    budget or the global deadline less ``reserve_s``, which is kept for the
+    cheap stages that come after the expensive ones. Stages that run out
+    of time return partial results and say so through ``StageBudget.degrade``.
+    """
+
+    def __init__(self, config=None, clock=time.monotonic):
+        config = config or {}
+        self.clock = clock
+        self.started = clock()
+        deadline = config.get('deadline_s')
+        self.deadline = self.started + deadline if deadline else None
+        self.reserve = config.get('reserve_s', 2)
+        self.stage_budgets = config.get('stages', {})
+        self.max_relationship_entities = config.get('max_relationship_entities', 200)
+        self.degradations = []
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        """Whether any time limit applies to this run"""
+        return self.deadline is not None or bool(self.stage_budgets)
+
+    def remaining(self):
+        """Seconds left before the run's deadline, or ``None`` without one"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - self.clock())
+
+    def stage(self, name):
+        """Start the clock for a stage and return its ``StageBudget``"""
+        now = self.clock()
+        ends = []
+        if name in self.stage_budgets:
+            ends.append(now + self.stage_budgets[name])
+        if self.deadline is not None:
+            ends.append(max(now, self.deadline - self.reserve))
+        return StageBudget(self, name, min(ends) if ends else None)
+
+    def degrade(self, stage, detail):
+        """Record that ``stage`` returned a reduced result"""
+        with self._lock:
+            self.degradations.append({'stage': stage, 'detail': detail,
+                                      'at': round(self.clock() - self.started, 3)})
+        print(f"Over budget in {stage}: {detail}")
+
+    def degraded(self, stage):
+        """Whether ``stage`` has been degraded in this run"""
+        with self._lock:
+            return any(entry['stage'] == stage for entry in self.degradations)
+
+    def report(self):
+        """Summary of the run's timing and everything that was degraded"""
+        elapsed = self.clock() - self.started
+        return {
+            'elapsed_s': round(elapsed, 3),
+            'deadline_s': round(self.deadline - self.started, 3) if self.deadline is not None else None,
+            'on_time': self.deadline is None or self.clock() <= self.deadline,
+            'degradations': list(self.degradations)
+        }
+
+
+class StageBudget:
+    """The time one stage may use, as handed to the component doing the work"""
+
+    def __init__(self, run_budget, name, expires_at):
+        self.run_budget = run_budget
+        self.name = name
+        self.expires_at = expires_at
+
+    def remaining(self):
+        """Seconds left, or ``None`` when the stage is unlimited"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - self.run_budget.clock())
+
+    def expired(self):
+        return self.expires_at is not None and self.run_budget.clock() >= self.expires_at
+
+    def degrade(self, detail):
+        self.run_budget.degrade(self.name, detail)
@@ -4,11 +4,17 @@ Generates audiovisual content script ideas based on business analysis and audien
 """
 
 import random
-from typing import List, Dict
+from itertools import accumulate
+from typing import List, Dict, Optional
+
+from src.idea_store import TITLE_TEMPLATES, IdeaRecord, IdeaStore, Recompute
 
 class ScriptGenerator:
     """Generates script ideas for audiovisual content"""
 
+    # How far a fully preferred value's sampling weight rises above an unrated one's
+    PREFERENCE_STRENGTH = 1.0
+
     def __init__(self):
         self.content_formats = [
             'educational video', 'testimonial', 'product demo', 'behind-the-scenes',
@@ -30,63 +36,54 @@ class ScriptGenerator:
             'authority', 'exclusivity', 'simplicity', 'innovation', 'tradition'
         ]
 
-    def generate_ideas(self, business_analysis: Dict, audience_profile: Dict, count: int = 40) -> List[Dict]:
-        """Generate script ideas for audiovisual content"""
-        ideas = []
+    def generate_ideas(self, business_analysis: Dict, audience_profile: Dict, count: int = 40,
+                       preferences: Optional[Dict] = None) -> IdeaStore:
+        """Generate script ideas, biased towards ``preferences`` from the feedback log if given"""
+        ideas = IdeaStore()
+        preferences = preferences or {}
+        pick_format = self._sampler(self.content_formats, preferences.get('format'))
+        pick_theme = self._sampler(self.themes, preferences.get('theme'))
+        pick_angle = self._sampler(self.angles, preferences.get('angle'))
 
         # Extract key elements from analysis
         key_topics = self._extract_key_topics(business_analysis)
         target_tone = audience_profile.get('tone', 'professional')
         target_language = audience_profile.get('language', 'simple')
-        cultural_elements = audience_profile.get('cultural_elements', [])
+        cultural_elements = tuple(audience_profile.get('cultural_elements', []))
         comm_prefs = audience_profile.get('communication_preferences', [])
 
+        # Element and platform lists depend only on the format, so each is built once
+        key_elements = {}
+        platforms = {}
+
         for i in range(count):
-            idea = self._generate_single_idea(
-                i + 1,
-                key_topics,
-                target_tone,
-                target_language,
-                cultural_elements,
-                comm_prefs
-            )
-            ideas.append(idea)
+            # Randomly select components
+            format_type = pick_format()
+            theme = pick_theme()
+            angle = pick_angle()
+            topic = random.choice(key_topics) if key_topics else "business topic"
+            template = random.randrange(len(TITLE_TEMPLATES))
+
+            if format_type not in key_elements:
+                key_elements[format_type] = tuple(self._generate_key_elements(format_type, comm_prefs))
+                platforms[format_type] = tuple(self._suggest_platforms(format_type, comm_prefs))
+
+            ideas.append(i + 1, template, format=format_type, theme=theme, angle=angle, topic=topic,
+                         tone=target_tone, language=target_language, cultural_elements=cultural_elements,
+                         key_elements=key_elements[format_type], target_platforms=platforms[format_type])
 
         return ideas
 
-    def _generate_single_idea(self, idea_number: int, key_topics: List[str],
-                            tone: str, language: str, cultural_elements: List[str],
-                            comm_prefs: List[str]) -> Dict:
-        """Generate a single script idea"""
-        # Randomly select components
-        format_type = random.choice(self.content_formats)
-        theme = random.choice(self.themes)
-        angle = random.choice(self.angles)
-        topic = random.choice(key_topics) if key_topics else "business topic"
-
-        # Generate title
-        title = self._generate_title(format_type, theme, topic, angle)
-
-        # Generate description
-        description = self._generate_description(
-            format_type, theme, topic, angle, tone, language, cultural_elements
-        )
-
-        # Generate key elements
-        key_elements = self._generate_key_elements(format_type, comm_prefs)
-
-        return {
-            'id': idea_number,
-            'title': title,
-            'format': format_type,
-            'theme': theme,
-            'angle': angle,
-            'topic': topic,
-            'description': description,
-            'key_elements': key_elements,
-            'estimated_duration': self._estimate_duration(format_type),
-            'target_platforms': self._suggest_platforms(format_type, comm_prefs)
-        }
+    def _sampler(self, population: List[str], preference: Optional[Dict]):
+        """Return a function that draws from ``population``, weighted by preference if any"""
+        if not preference:
+            return lambda: random.choice(population)
+
+        # Preferences lie in [-1, 1]; disliked values keep a small chance of showing up
+        scale = self.PREFERENCE_STRENGTH * len(population)
+        cum_weights = list(accumulate(max(0.1, 1.0 + scale * preference.get(value, 0.0))
+                                      for value in population))
+        return lambda: random.choices(population, cum_weights=cum_weights)[0]
 
     def _extract_key_topics(self, business_analysis: Dict) -> List[str]:
         """Extract key topics from business analysis"""
@@ -109,44 +106,6 @@ class ScriptGenerator:
 
         return topics if topics else ['business growth', 'customer success', 'innovation']
 
-    def _generate_title(self, format_type: str, theme: str, topic: str, angle: str) -> str:
-        """Generate an engaging title"""
-        title_templates = [
-            f"How {topic} {angle} Changed Everything",
-            f"The {angle} Side of {topic}",
-            f"{theme.title()}: A {topic} Story",
-            f"Unlocking {topic} Through {angle}",
-            f"{format_type.title()}: {topic} {theme}",
-            f"Discover {angle} in {topic}",
-            f"{topic} {theme}: What You Need to Know",
-            f"From {angle} to Success: {topic}"
-        ]
-
-        return random.choice(title_templates)
-
-    def _generate_description(self, format_type: str, theme: str, topic: str,
-                            angle: str, tone: str, language: str,
-                            cultural_elements: List[str]) -> str:
-        """Generate detailed description"""
-        description = f"This {format_type} explores {theme} in {topic}, "
-
-        if angle:
-            description += f"focusing on the {angle} aspect. "
-
-        if tone:
-            description += f"The content uses a {tone} tone "
-
-        if language:
-            description += f"with {language} language "
-
-        if cultural_elements:
-            culture_str = ", ".join(cultural_elements)
-            description += f"incorporating {culture_str} cultural elements. "
-
-        description += "Perfect for engaging your target audience and driving action."
-
-        return description
-
     def _generate_key_elements(self, format_type: str, comm_prefs: List[str]) -> List[str]:
         """Generate key elements for the script"""
         elements = []
@@ -170,20 +129,6 @@ class ScriptGenerator:
 
         return list(set(elements))  # Remove duplicates
 
-    def _estimate_duration(self, format_type: str) -> str:
-        """Estimate content duration"""
-        duration_map = {
-            'short clip': '15-30 seconds',
-            'testimonial': '1-2 minutes',
-            'tutorial': '3-5 minutes',
-            'interview': '5-10 minutes',
-            'webinar': '30-60 minutes',
-            'documentary style': '10-15 minutes',
-            'live stream': '30-90 minutes'
-        }
-
-        return duration_map.get(format_type, '2-5 minutes')
-
     def _suggest_platforms(self, format_type: str, comm_prefs: List[str]) -> List[str]:
         """Suggest appropriate platforms"""
         platforms = []
@@ -200,28 +145,48 @@ class ScriptGenerator:
 
         return list(set(platforms)) if platforms else ['YouTube', 'Website']
 
-    def improve_ideas(self, selected_ideas: List[Dict], feedback: Dict) -> List[Dict]:
+    def improve_ideas(self, selected_ideas: List[Dict], feedback: Dict) -> List[IdeaRecord]:
         """Improve ideas based on user feedback"""
-        improved_ideas = []
-
-        for idea in selected_ideas:
-            improved_idea = idea.copy()
-
-            # Apply feedback improvements
-            if feedback.get('tone_change'):
-                improved_idea['description'] = improved_idea['description'].replace(
-                    idea.get('tone', 'professional'), feedback['tone_change']
-                )
-
-            if feedback.get('format_change'):
-                improved_idea['format'] = feedback['format_change']
-                improved_idea['key_elements'] = self._generate_key_elements(
-                    feedback['format_change'], idea.get('target_platforms', [])
-                )
-
-            if feedback.get('additional_elements'):
-                improved_idea['key_elements'].extend(feedback['additional_elements'])
-
-            improved_ideas.append(improved_idea)
+        changes = self._feedback_changes(feedback)
+        improved_ideas = [None] * len(selected_ideas)
+        batches = {}
+        imported = None
+
+        for position, idea in enumerate(selected_ideas):
+            if isinstance(idea, IdeaRecord):
+                store, row = idea.store, idea.row
+            else:
+                # Plain dicts (e.g. from a checkpoint) are brought into a store first
+                if imported is None:
+                    imported = IdeaStore()
+                store, row = imported, imported.add_dict(idea)
+            batches.setdefault(id(store), (store, []))[1].append((position, row))
+
+        # One columnar pass per store; the selected ideas themselves stay as they were
+        for store, items in batches.values():
+            derived = store.derive_rows([row for _, row in items], changes)
+            for (position, _), record in zip(items, derived):
+                improved_ideas[position] = record
+
+        return improved_ideas
+
+    def _feedback_changes(self, feedback: Dict) -> Dict:
+        """Translate feedback into the idea columns it changes"""
+        changes = {}
+        additional = tuple(feedback.get('additional_elements') or ())
+
+        # Descriptions are rendered from the tone column, so changing it is enough
+        if feedback.get('tone_change'):
+            changes['tone'] = feedback['tone_change']
+
+        if feedback.get('format_change'):
+            new_format = feedback['format_change']
+            changes['format'] = new_format
+            changes['key_elements'] = Recompute(
+                ['target_platforms'],
+                lambda platforms: tuple(self._generate_key_elements(new_format, list(platforms))) + additional
+            )
+        elif additional:
+            changes['key_elements'] = Recompute(['key_elements'], lambda elements: elements + additional)
 
-        return improved_ideas
\ No newline at end of file
+        return changes
@@ -0,0 +1,203 @@
+"""
+Search Quota Module
+Shares the Custom Search rate limit and daily budget between processes through SQLite.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+class QuotaExceeded(Exception):
+    """Raised when the daily search budget is used up"""
+
+
+class RateLimited(Exception):
+    """Raised by a query function when the API answered 429"""
+
+    def __init__(self, retry_after=None):
+        super().__init__("rate limited by the search API")
+        self.retry_after = retry_after
+
+
+class QuotaScheduler:
+    """Grants search slots to every process that shares ``db_path``.
+
+    Each query first waits for a ticket: tickets are served in priority
+    order (lower first, then oldest), no faster than ``queries_per_second``
+    across all processes and no more than ``daily_limit`` per day (Pacific
+    time, when Google resets the quota). Identical queries are coalesced:
+    while one process runs a query the others wait for its result, and
+    results are kept for ``result_ttl`` seconds so repeats cost nothing.
+    A 429 pushes the next slot back for every process, not just the one
+    that hit it.
+    """
+
+    POLL_INTERVAL = 0.05
+    STALE_AFTER = 300
+    TICKET_TIMEOUT = 10
+
+    def __init__(self, config):
+        self.db_path = Path(config.get('db_path', '.cache/search_quota.sqlite'))
+        self.interval = 1.0 / config.get('queries_per_second', 1)
+        self.daily_limit = config.get('daily_limit', 100)
+        self.result_ttl = config.get('result_ttl', 24 * 3600)
+        self.max_retries = config.get('max_retries', 3)
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        db = self._connect()
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS usage (day TEXT PRIMARY KEY, count INTEGER NOT NULL);
+                CREATE TABLE IF NOT EXISTS pacing (id INTEGER PRIMARY KEY CHECK (id = 1), next_slot REAL NOT NULL);
+                CREATE TABLE IF NOT EXISTS tickets (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    priority INTEGER NOT NULL, pid INTEGER NOT NULL, seen REAL NOT NULL);
+                CREATE TABLE IF NOT EXISTS queries (query TEXT PRIMARY KEY, status TEXT NOT NULL,
+                    pid INTEGER NOT NULL, updated REAL NOT NULL, result TEXT);
+                INSERT OR IGNORE INTO pacing (id, next_slot) VALUES (1, 0);
+            """)
+        finally:
+            db.close()
+
+    def run(self, query, fetch, priority=0):
+        """Return ``fetch()`` for ``query``, sharing quota and results with other processes"""
+        while True:
+            state = self._claim(query)
+            if state == 'claimed':
+                break
+            if state is not None:
+                return state  # cached or coalesced result
+            time.sleep(self.POLL_INTERVAL)
+
+        try:
+            for attempt in range(self.max_retries + 1):
+                self.acquire(priority)
+                try:
+                    result = fetch()
+                    break
+                except RateLimited as e:
+                    if attempt == self.max_retries:
+                        raise
+                    self.back_off(e.retry_after or 2 ** attempt * self.interval * 5)
+        except BaseException:
+            with self._transaction() as db:
+                db.execute("DELETE FROM queries WHERE query = ? AND pid = ?", (query, os.getpid()))
+            raise
+
+        with self._transaction() as db:
+            db.execute("UPDATE queries SET status = 'done', updated = ?, result = ? WHERE query = ?",
+                       (time.time(), json.dumps(result), query))
+        return result
+
+    def acquire(self, priority=0):
+        """Block until this process may send one query; raises ``QuotaExceeded``"""
+        with self._transaction() as db:
+            ticket = db.execute("INSERT INTO tickets (priority, pid, seen) VALUES (?, ?, ?)",
+                                (priority, os.getpid(), time.time())).lastrowid
+
+        try:
+            while True:
+                with self._transaction() as db:
+                    # Waiting tickets check in on every poll; silent ones belong to dead processes
+                    db.execute("UPDATE tickets SET seen = ? WHERE id = ?", (time.time(), ticket))
+                    db.execute("DELETE FROM tickets WHERE seen < ?", (time.time() - self.TICKET_TIMEOUT,))
+                    first = db.execute("SELECT id FROM tickets ORDER BY priority, id LIMIT 1").fetchone()
+                    wait = self.POLL_INTERVAL
+                    if first and first[0] == ticket:
+                        day = self._today()
+                        row = db.execute("SELECT count FROM usage WHERE day = ?", (day,)).fetchone()
+                        used = row[0] if row else 0
+                        if used >= self.daily_limit:
+                            raise QuotaExceeded(f"daily search budget of {self.daily_limit} queries used up")
+
+                        now = time.time()
+                        next_slot = db.execute("SELECT next_slot FROM pacing WHERE id = 1").fetchone()[0]
+                        if now >= next_slot:
+                            db.execute("INSERT INTO usage (day, count) VALUES (?, 1) "
+                                       "ON CONFLICT(day) DO UPDATE SET count = count + 1", (day,))
+                            db.execute("UPDATE pacing SET next_slot = ? WHERE id = 1", (now + self.interval,))
+                            return
+                        wait = next_slot - now
+                time.sleep(min(wait, 1.0))
+        finally:
+            with self._transaction() as db:
+                db.execute("DELETE FROM tickets WHERE id = ?", (ticket,))
+
+    def back_off(self, seconds):
+        """Delay the next slot of every process by ``seconds``"""
+        with self._transaction() as db:
+            db.execute("UPDATE pacing SET next_slot = MAX(next_slot, ?) WHERE id = 1",
+                       (time.time() + seconds,))
+
+    def remaining(self):
+        """Queries left in today's budget"""
+        db = self._connect()
+        try:
+            row = db.execute("SELECT count FROM usage WHERE day = ?", (self._today(),)).fetchone()
+        finally:
+            db.close()
+        return self.daily_limit - (row[0] if row else 0)
+
+    def _claim(self, query):
+        """Return a finished result, ``'claimed'`` if this process should run it, or ``None`` to wait"""
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute("SELECT status, pid, updated, result FROM queries WHERE query = ?",
+                             (query,)).fetchone()
+            if row is not None:
+                status, pid, updated, result = row
+                if status == 'done' and now - updated < self.result_ttl:
+                    return json.loads(result)
+                if status == 'pending' and now - updated < self.STALE_AFTER and \
+                        (pid == os.getpid() or _alive(pid)):
+                    return None  # someone is running it right now; wait for their result
+            db.execute("INSERT OR REPLACE INTO queries (query, status, pid, updated, result) "
+                       "VALUES (?, 'pending', ?, ?, NULL)", (query, os.getpid(), now))
+            return 'claimed'
+
+    def _today(self):
+        try:
+            from zoneinfo import ZoneInfo
+            return datetime.now(ZoneInfo('America/Los_Angeles')).date().isoformat()
+        except Exception:  # no tz database available
+            return datetime.now(timezone.utc).date().isoformat()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def _transaction(self):
+        return _Transaction(self._connect())
+
+
+class _Transaction:
+    """``BEGIN IMMEDIATE`` ... ``COMMIT`` on a fresh connection, so threads never share one"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.db.close()
+        return False
+
+
+def _alive(pid):
+    if os.name == 'nt':
+        return True  # os.kill would terminate the process; rely on STALE_AFTER instead
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
@@ -0,0 +1,291 @@
+"""
+Sharding Module
+Map/reduce document processing: shards of the Drive folder become mergeable partial corpora.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from src.topic_counter import TopicCounter
+from src.vocabulary import Vocabulary
+
+
+def shard_of(file_id, shard_count):
+    """Stable shard number of a Drive file, the same on every node"""
+    return zlib.crc32(file_id.encode('utf-8')) % shard_count
+
+
+def partition(items, shard_count):
+    """Split a folder listing into ``shard_count`` lists of ``(position, item)``"""
+    shards = [[] for _ in range(shard_count)]
+    for position, item in enumerate(items):
+        shards[shard_of(item['id'], shard_count)].append((position, item))
+    return shards
+
+
+def fingerprint(shard):
+    """Identify a shard's files, versions and their order, so stale partials are not reused.
+
+    Positions in the full listing are left out: files added or removed in
+    other shards shift them, but ``ShardedIngest.load`` moves a saved
+    partial to the current positions instead.
+    """
+    digest = hashlib.sha256()
+    for _, item in shard:
+        version = item.get('md5Checksum') or item.get('modifiedTime') or ''
+        digest.update(f"{item['id']}:{version}\n".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+class CorpusPartial:
+    """Mergeable summary of the documents in one or more shards.
+
+    Holds what ``CorpusBuilder`` accumulates, keyed by each document's
+    position in the full folder listing instead of by arrival order, so
+    partials can be merged in any order and grouping. Every term keeps
+    its counts, where it was first seen and where it was first located
+    in a document. The reducer rebuilds the vocabulary in first-seen order
+    and moves located offsets into the merged text, so ``result`` matches
+    what one machine processing the whole folder would produce, including
+    the entity co-occurrences the business analysis relies on.
+    """
+
+    def __init__(self, topic_capacity=10000):
+        self.texts = {}      # position -> cleaned text
+        self.terms = {}      # term -> [kinds, count, doc_count, first_seen, first_located]
+        self.topics = TopicCounter(topic_capacity)
+        self.languages = {}
+
+    def add(self, position, processed):
+        """Add one processed document found at ``position`` in the listing"""
+        self.texts[position] = processed['text']
+        occurrences = [(phrase, Vocabulary.KEY_IDEA, None) for phrase in processed['key_phrases']]
+        occurrences += [(entity, Vocabulary.ENTITY, start) for entity, start in processed['entities']]
+
+        in_document = set()
+        for sequence, (term, kind, start) in enumerate(occurrences):
+            seen = (position, sequence)
+            located = (position, start) if start is not None else None
+            entry = self.terms.get(term)
+            if entry is None:
+                self.terms[term] = [kind, 1, 1, seen, located]
+                in_document.add(term)
+                continue
+            entry[0] |= kind
+            entry[1] += 1
+            if term not in in_document:
+                in_document.add(term)
+                entry[2] += 1
+            entry[3] = min(entry[3], seen)
+            entry[4] = _earliest(entry[4], located)
+
+        self.topics.update(processed['topics'])
+        language = processed.get('language')
+        if language:
+            self.languages[language] = self.languages.get(language, 0) + 1
+
+    def merge(self, other):
+        """Fold in a partial built from other documents"""
+        self.texts.update(other.texts)
+        for term, (kinds, count, doc_count, seen, located) in other.terms.items():
+            entry = self.terms.get(term)
+            if entry is None:
+                self.terms[term] = [kinds, count, doc_count, seen, located]
+                continue
+            entry[0] |= kinds
+            entry[1] += count
+            entry[2] += doc_count
+            entry[3] = min(entry[3], seen)
+            entry[4] = _earliest(entry[4], located)
+        self.topics.merge(other.topics)
+        for language, count in other.languages.items():
+            self.languages[language] = self.languages.get(language, 0) + count
+        return self
+
+    def reposition(self, positions):
+        """Move documents to new listing positions, given as ``{old: new}``.
+
+        The mapping must keep the documents' relative order, which holds
+        for a partial whose fingerprint still matches its shard.
+        """
+        def move(location):
+            return (positions[location[0]], location[1]) if location else None
+
+        self.texts = {positions[position]: text for position, text in self.texts.items()}
+        for entry in self.terms.values():
+            entry[3] = move(entry[3])
+            entry[4] = move(entry[4])
+        return self
+
+    def result(self):
+        """Return the merged ``processed_data`` dict, shaped like ``CorpusBuilder.result``"""
+        positions = sorted(self.texts)
+        starts = {}
+        offset = 0
+        for position in positions:
+            starts[position] = offset
+            offset += len(self.texts[position]) + 1
+
+        vocabulary = Vocabulary()
+        for term, (kinds, count, doc_count, _, located) in sorted(self.terms.items(),
+                                                                   key=lambda item: item[1][3]):
+            first_offset = starts[located[0]] + located[1] if located else Vocabulary.NO_OFFSET
+            vocabulary.append_term(term, kinds, count, doc_count, first_offset)
+
+        texts = [self.texts[position] for position in positions]
+        return {
+            'full_text': "\n".join(texts) + "\n" if texts else "",
+            'topics': self.topics.most_common(50),
+            'document_count': len(texts),
+            'languages': dict(self.languages),
+            'vocabulary': vocabulary
+        }
+
+    def to_dict(self):
+        """Serialize the partial so it can be shipped between processes or nodes"""
+        return {
+            'texts': [[position, text] for position, text in self.texts.items()],
+            'terms': [[term, kinds, count, doc_count, list(seen), list(located) if located else None]
+                      for term, (kinds, count, doc_count, seen, located) in self.terms.items()],
+            'topics': self.topics.to_dict(),
+            'languages': dict(self.languages)
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a partial produced by ``to_dict``"""
+        partial = cls(data['topics']['capacity'])
+        partial.texts = {position: text for position, text in data['texts']}
+        partial.terms = {term: [kinds, count, doc_count, tuple(seen), tuple(located) if located else None]
+                         for term, kinds, count, doc_count, seen, located in data['terms']}
+        partial.topics = TopicCounter.from_dict(data['topics'])
+        partial.languages = dict(data['languages'])
+        return partial
+
+
+def map_shard(shard, drive_access, text_processor):
+    """Download and process one shard's documents into a ``CorpusPartial``"""
+    partial = CorpusPartial(text_processor.config.get('topic_capacity', 10000))
+    for position, item in shard:
+        for document in drive_access.iter_documents([item]):
+            partial.add(position, text_processor.process_document(document))
+    return partial
+
+
+def shard_components(config):
+    """Drive access and text processor for a worker process"""
+    from src.drive_access import GoogleDriveAccess
+    from src.text_processor import TextProcessor
+
+    return GoogleDriveAccess(config['google_drive']), TextProcessor(config['nlp'])
+
+
+def _run_shard(config, make_components, shard):
+    # Runs in a worker process, which loads its own components
+    drive_access, text_processor = make_components(config)
+    return map_shard(shard, drive_access, text_processor).to_dict()
+
+
+class ShardedIngest:
+    """Processes a Drive folder as shards and reduces them into one ``processed_data``.
+
+    Files are assigned to ``shards`` shards by a hash of their id, so every
+    node computes the same split from its own listing. Partials that other
+    nodes saved in ``dir`` (see ``save``) are reused when their shard's
+    files and versions are unchanged. The remaining shards are mapped
+    here by ``workers`` local processes, each standing in for a node.
+    Shards always run to completion: the run budget and near-duplicate
+    detection do not apply in this mode.
+    """
+
+    def __init__(self, app_config, drive_access, make_components=shard_components):
+        config = app_config.get('sharding', {})
+        self.app_config = app_config
+        self.drive_access = drive_access
+        self.make_components = make_components
+        self.shards = config.get('shards', 4)
+        self.workers = config.get('workers', 4)
+        self.directory = Path(config.get('dir', '.cache/shards'))
+        self.topic_capacity = app_config.get('nlp', {}).get('topic_capacity', 10000)
+
+    def run(self):
+        """Map every shard, reusing saved partials, and return the reduced ``processed_data``"""
+        shards = partition(self.drive_access.list_files(), self.shards)
+        partials = {}
+        for index, shard in enumerate(shards):
+            partial = self.load(index, shard)
+            if partial is not None:
+                print(f"Using saved partial for shard {index + 1}/{self.shards}")
+                partials[index] = partial
+
+        missing = [index for index in range(self.shards) if index not in partials]
+        if missing:
+            print(f"Mapping {len(missing)} shards in {min(self.workers, len(missing))} processes...")
+            # Spawned, not forked: this runs on a pipeline thread, and a fork could inherit locks
+            # held by other threads. Workers build their own components via make_components.
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(missing)),
+                                     mp_context=multiprocessing.get_context('spawn')) as executor:
+                futures = {executor.submit(_run_shard, self.app_config, self.make_components,
+                                           shards[index]): index
+                           for index in missing}
+                for future in as_completed(futures):
+                    index = futures[future]
+                    partials[index] = CorpusPartial.from_dict(future.result())
+                    self.save(index, shards[index], partials[index])
+
+        print("Reducing shard partials...")
+        reduced = CorpusPartial(self.topic_capacity)
+        for index in range(self.shards):
+            reduced.merge(partials[index])
+        return reduced.result()
+
+    def map(self, index):
+        """Map a single shard in this process and save its partial (one node's share)"""
+        if not 0 <= index < self.shards:
+            raise ValueError(f"shard must be between 0 and {self.shards - 1}, got {index}")
+        shard = partition(self.drive_access.list_files(), self.shards)[index]
+        drive_access, text_processor = self.make_components(self.app_config)
+        partial = map_shard(shard, drive_access, text_processor)
+        return self.save(index, shard, partial)
+
+    def path(self, index):
+        return self.directory / f"partial-{index}-of-{self.shards}.json"
+
+    def save(self, index, shard, partial):
+        """Atomically write a shard's partial where other nodes can pick it up"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path(index)
+        tmp_path = path.with_suffix(f'.tmp{os.getpid()}')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'fingerprint': fingerprint(shard), 'positions': [position for position, _ in shard],
+                       'partial': partial.to_dict()}, f)
+        os.replace(tmp_path, path)
+        return path
+
+    def load(self, index, shard):
+        """A saved partial for ``shard``, or ``None`` if missing, stale or built with another topic capacity"""
+        try:
+            with open(self.path(index), 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if saved.get('fingerprint') != fingerprint(shard):
+            return None
+        if saved['partial']['topics']['capacity'] != self.topic_capacity:
+            return None
+        # Other shards may have gained or lost files since; move to today's positions
+        positions = dict(zip(saved['positions'], [position for position, _ in shard]))
+        return CorpusPartial.from_dict(saved['partial']).reposition(positions)
+
+
+def _earliest(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a, b)
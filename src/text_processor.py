@@ -3,59 +3,88 @@ Text Processing Module
 Uses NLP to extract context, key ideas, and insights from documents.
 """
 
-import spacy
-from collections import Counter
+import random
 import re
 
+from src.language_detector import LanguageDetector
+from src.model_pool import ModelPool
+from src.topic_counter import TopicCounter
+from src.vocabulary import Vocabulary
+
 class TextProcessor:
     """Processes text documents using NLP techniques"""
 
     def __init__(self, config):
         self.config = config
-        try:
-            self.nlp = spacy.load(config['model'])
-        except OSError:
-            # Download model if not available
-            import subprocess
-            subprocess.run(['python', '-m', 'spacy', 'download', config['model']])
-            self.nlp = spacy.load(config['model'])
-
-    def process_documents(self, documents):
-        """Process multiple documents and extract key information"""
-        all_text = ""
-        key_ideas = []
-        entities = []
-        topics = []
-
-        for doc in documents:
-            processed = self._process_single_document(doc['content'])
-            all_text += processed['text'] + "\n"
-            key_ideas.extend(processed['key_phrases'])
-            entities.extend(processed['entities'])
-            topics.extend(processed['topics'])
+        self.default_language = config.get('default_language', 'en')
+        # Older configs name a single model; treat it as the default language's model
+        models = config.get('models') or {self.default_language: config['model']}
+        if self.default_language not in models:
+            raise ValueError(f"nlp.default_language '{self.default_language}' has no model in nlp.models "
+                             f"({', '.join(models)})")
 
-        return {
-            'full_text': all_text,
-            'key_ideas': list(set(key_ideas)),  # Remove duplicates
-            'entities': list(set(entities)),
-            'topics': self._consolidate_topics(topics),
-            'document_count': len(documents)
-        }
+        self.detector = LanguageDetector(list(models), default=self.default_language)
+        self.models = ModelPool(models,
+                                memory_budget_mb=config.get('model_memory_mb', 1024),
+                                default_model_mb=config.get('default_model_mb', 100),
+                                model_sizes_mb=config.get('model_sizes_mb'))
+        # Load the default model up front so startup errors surface immediately. Only the
+        # pool holds it, so it can still be evicted when other languages need the memory.
+        self.models.get(self.default_language)
+
+    def process_documents(self, documents, budget=None):
+        """Process multiple documents and extract key information.
+
+        With a ``budget`` the documents are parsed in a fixed random order
+        and parsing stops when time runs out, so a partial run is a uniform
+        sample of the folder rather than its first files. At least one
+        document is always parsed, so later stages never get an empty corpus.
+        """
+        corpus = self.new_corpus()
+
+        if budget is None or budget.remaining() is None:
+            for doc in documents:
+                corpus.add(self.process_document(doc))
+            return corpus.result()
+
+        order = list(range(len(documents)))
+        random.Random(len(documents)).shuffle(order)
+        processed = {}
+        for index in order:
+            if processed and budget.expired():
+                budget.degrade(f"sampled {len(processed)} of {len(documents)} documents")
+                break
+            processed[index] = self.process_document(documents[index])
+
+        # Sampled documents keep their folder order in the corpus
+        for index in sorted(processed):
+            corpus.add(processed[index])
+        return corpus.result()
+
+    def new_corpus(self):
+        """Create an empty corpus that documents can be added to incrementally"""
+        return CorpusBuilder(self.new_topic_counter())
+
+    def process_document(self, document):
+        """Process a single downloaded document"""
+        # Documents from the corpus store are decoded straight from their mmap slice
+        return self._process_single_document(document['content'])
 
     def _process_single_document(self, text):
         """Process a single document"""
         # Clean text
         text = self._clean_text(text)
 
-        # Process with spaCy
-        doc = self.nlp(text)
+        # Process with the spaCy model for the document's language
+        language = self.detector.detect(text)
+        doc = self.models.get(language)(text)
 
         # Extract key phrases (noun chunks)
         key_phrases = [chunk.text.lower() for chunk in doc.noun_chunks
                       if len(chunk.text.split()) > 1]
 
-        # Extract entities
-        entities = [ent.text for ent in doc.ents]
+        # Extract entities with their position in the cleaned text
+        entities = [(ent.text, ent.start_char) for ent in doc.ents]
 
         # Extract topics (common nouns and proper nouns)
         topics = [token.lemma_.lower() for token in doc
@@ -65,7 +94,8 @@ class TextProcessor:
             'text': text,
             'key_phrases': key_phrases[:20],  # Top 20 key phrases
             'entities': entities,
-            'topics': topics
+            'topics': topics,
+            'language': language
         }
 
     def _clean_text(self, text):
@@ -76,7 +106,61 @@ class TextProcessor:
         text = re.sub(r'[^\w\s.,!?-]', '', text)
         return text.strip()
 
-    def _consolidate_topics(self, all_topics):
+    def new_topic_counter(self):
+        """Create an empty topic counter sized by the configured memory budget"""
+        return TopicCounter(self.config.get('topic_capacity', 10000))
+
+
+class CorpusBuilder:
+    """Accumulates processed documents into the ``processed_data`` structure.
+
+    Key ideas and entities are only kept in the interned ``vocabulary``;
+    callers read them with ``vocabulary.terms_of`` or work on term ids.
+    """
+
+    def __init__(self, topic_counter):
+        self.texts = []
+        self.offset = 0
+        self.vocabulary = Vocabulary()
+        self.topics = topic_counter
+        self.languages = {}
+
+    def add(self, processed):
+        """Add one processed document and return the key ideas it introduced"""
+        doc_index = len(self.texts)
+        vocabulary = self.vocabulary
+        self.texts.append(processed['text'])
+
+        new_ideas = []
+        for phrase in processed['key_phrases']:
+            term_id = vocabulary.id_of(phrase)
+            if term_id is None or not vocabulary.kinds[term_id] & Vocabulary.KEY_IDEA:
+                new_ideas.append(phrase)
+            vocabulary.add(phrase, Vocabulary.KEY_IDEA, doc_index)
+        for entity, start in processed['entities']:
+            vocabulary.add(entity, Vocabulary.ENTITY, doc_index, self.offset + start)
+        # Fold each document into the bounded counter as we go
+        self.topics.update(processed['topics'])
+        language = processed.get('language')
+        if language:
+            self.languages[language] = self.languages.get(language, 0) + 1
+
+        self.offset += len(processed['text']) + 1
+        return new_ideas
+
+    def result(self):
+        """Return the consolidated ``processed_data`` dict"""
+        texts = self.texts
+        vocabulary = self.vocabulary
+
+        return {
+            'full_text': "\n".join(texts) + "\n" if texts else "",
+            'topics': self._consolidate_topics(),
+            'document_count': len(texts),
+            'languages': dict(self.languages),
+            'vocabulary': vocabulary
+        }
+
+    def _consolidate_topics(self):
         """Consolidate and rank topics by frequency"""
-        topic_counts = Counter(all_topics)
-        return topic_counts.most_common(50)  # Top 50 topics
\ No newline at end of file
+        return self.topics.most_common(50)  # Top 50 topics
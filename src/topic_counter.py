@@ -0,0 +1,109 @@
+"""
+Topic Counter Module
+Bounded-memory streaming heavy-hitter counting for document topics.
+"""
+
+import heapq
+from collections import Counter
+
+
+class TopicCounter:
+    """Space-Saving heavy-hitter counter with a fixed memory budget.
+
+    At most ``2 * capacity`` topics are tracked at any time. Once the
+    counter has been pruned, ``floor`` is an upper bound on the count of
+    any topic that is no longer tracked, so reported counts are never
+    underestimates and ``errors`` bounds how far each one may be over.
+    While nothing has been evicted the counts are exact.
+    """
+
+    def __init__(self, capacity=10000):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.floor = 0
+
+    def __len__(self):
+        return len(self.counts)
+
+    def update(self, topics):
+        """Add a document's topics (an iterable of lemmas or a mapping of counts)"""
+        if not isinstance(topics, Counter):
+            topics = Counter(topics)
+
+        counts = self.counts
+        errors = self.errors
+        floor = self.floor
+
+        for topic, count in topics.items():
+            if topic in counts:
+                counts[topic] += count
+            else:
+                # Untracked topics may already have been seen up to `floor` times
+                counts[topic] = floor + count
+                if floor:
+                    errors[topic] = floor
+
+        if len(counts) > 2 * self.capacity:
+            self._prune()
+
+    def merge(self, other):
+        """Merge another counter (e.g. from a parallel worker) into this one"""
+        counts = {}
+        errors = {}
+
+        for topic in self.counts.keys() | other.counts.keys():
+            counts[topic] = (self.counts.get(topic, self.floor) +
+                             other.counts.get(topic, other.floor))
+            error = (self.errors.get(topic, 0 if topic in self.counts else self.floor) +
+                     other.errors.get(topic, 0 if topic in other.counts else other.floor))
+            if error:
+                errors[topic] = error
+
+        self.counts = counts
+        self.errors = errors
+        self.floor += other.floor
+        self.capacity = max(self.capacity, other.capacity)
+
+        if len(self.counts) > 2 * self.capacity:
+            self._prune()
+
+        return self
+
+    def most_common(self, n=None):
+        """Return the top ``n`` topics as ``(topic, count)`` pairs, like ``Counter``"""
+        if n is None:
+            return sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+        return heapq.nlargest(n, self.counts.items(), key=lambda item: item[1])
+
+    def to_dict(self):
+        """Serialize the counter so it can be shipped between processes"""
+        return {
+            'capacity': self.capacity,
+            'floor': self.floor,
+            'counts': dict(self.counts),
+            'errors': dict(self.errors)
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a counter produced by ``to_dict``"""
+        counter = cls(data['capacity'])
+        counter.floor = data['floor']
+        counter.counts = dict(data['counts'])
+        counter.errors = dict(data['errors'])
+        return counter
+
+    def _prune(self):
+        """Keep only the ``capacity`` heaviest topics"""
+        keep = heapq.nlargest(self.capacity + 1, self.counts.items(), key=lambda item: item[1])
+
+        # The heaviest evicted count bounds every topic we stop tracking
+        if len(keep) > self.capacity:
+            self.floor = max(self.floor, keep.pop()[1])
+
+        self.counts = dict(keep)
+        self.errors = {topic: error for topic, error in self.errors.items()
+                       if topic in self.counts}
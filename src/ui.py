@@ -3,47 +3,253 @@ User Interface Module
 Provides web interface for presenting ideas and collecting feedback.
 """
 
-from flask import Flask, render_template_string, request, jsonify
+import hashlib
 import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
 from typing import List, Dict, Tuple
 
+from src.idea_index import IdeaIndex, compress, encode_json
+from src.web_server import WebServer
+
 class UserInterface:
     """Web-based user interface for the agent"""
 
-    def __init__(self, config):
+    def __init__(self, config, feedback_log=None, form_handler=None):
         self.config = config
-        self.app = Flask(__name__)
-        self.setup_routes()
+        self.feedback_log = feedback_log
+        self.form_handler = form_handler
+        self._app = None
+        self.page_size = config.get('page_size', 50)
+        self.max_page_size = config.get('max_page_size', 500)
+        self.max_idea_sets = config.get('max_idea_sets', 8)
+        self.idea_sets = OrderedDict()
+        self._sets_lock = threading.Lock()
+        # Prefork workers don't share memory, so published sets also go to disk for the others
+        shared = config.get('mode') == 'production' and config.get('workers', 4) > 1
+        self.sets_dir = Path(config.get('sets_dir', '.cache/idea_sets')) if shared else None
+
+    @property
+    def app(self):
+        """Flask app, created on first use so console-only runs never import Flask"""
+        if self._app is None:
+            from flask import Flask
+
+            self._app = Flask(__name__)
+            self.setup_routes()
+        return self._app
 
     def setup_routes(self):
         """Set up Flask routes"""
+        from flask import render_template_string, request, jsonify
 
         @self.app.route('/')
         def index():
             return render_template_string(self._get_main_template())
 
         @self.app.route('/api/ideas', methods=['POST'])
+        def publish_ideas():
+            ideas = self._json_body().get('ideas', [])
+            if not isinstance(ideas, list) or not all(isinstance(idea, dict) for idea in ideas):
+                return jsonify({'error': 'ideas must be a list of objects'}), 400
+            try:
+                idea_set = self.publish_ideas(ideas)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            return jsonify({'set': idea_set.set_id, 'total': len(idea_set)})
+
+        @self.app.route('/api/ideas', methods=['GET'])
         def get_ideas():
-            ideas = request.json.get('ideas', [])
-            return jsonify({'ideas': ideas})
+            idea_set = self.get_idea_set(request.args.get('set'))
+            if idea_set is None:
+                return jsonify({'error': 'unknown idea set'}), 404
+
+            filters = {name: request.args[name] for name in IdeaIndex.FILTERS if request.args.get(name)}
+            try:
+                cursor = max(0, int(request.args.get('cursor', 0)))
+                limit = min(max(1, int(request.args.get('limit', self.page_size))), self.max_page_size)
+            except ValueError:
+                return jsonify({'error': 'cursor and limit must be integers'}), 400
+
+            # Sets are immutable, so the set id and the query fully determine the page
+            query = json.dumps([idea_set.set_id, sorted(filters.items()), cursor, limit])
+            etag = hashlib.sha1(query.encode('utf-8')).hexdigest()[:20]
+            if request.if_none_match.contains_weak(etag):
+                return self._json_response(None, etag, status=304)
+
+            ideas, next_cursor = idea_set.page(filters, cursor, limit)
+            return self._json_response({'set': idea_set.set_id, 'total': len(idea_set),
+                                        'ideas': ideas, 'next_cursor': next_cursor}, etag)
+
+        @self.app.route('/api/ideas/facets', methods=['GET'])
+        def get_facets():
+            idea_set = self.get_idea_set(request.args.get('set'))
+            if idea_set is None:
+                return jsonify({'error': 'unknown idea set'}), 404
+            return self._json_response({'set': idea_set.set_id, 'total': len(idea_set),
+                                        'facets': idea_set.facets()}, idea_set.set_id)
 
         @self.app.route('/api/feedback', methods=['POST'])
         def collect_feedback():
-            feedback = request.json
+            feedback = self._json_body()
+            selected = feedback.get('selected_ideas', [])
+            if not isinstance(selected, list) or \
+                    not all(isinstance(feedback.get(name) or '', str) for name in ('set', 'client')):
+                return jsonify({'error': 'selected_ideas must be a list; set and client strings'}), 400
+            if self.feedback_log is not None:
+                idea_set = self.get_idea_set(feedback.get('set'))
+                ideas = [idea_set.by_id(idea_id) for idea_id in selected if isinstance(idea_id, (int, str))] \
+                    if idea_set is not None else []
+                # Returns once the event is durable; concurrent requests share one fsync.
+                # Without an explicit client it counts for feedback.client, which the next run reads.
+                self.record_feedback([idea for idea in ideas if idea is not None], feedback,
+                                     client=feedback.get('client'))
             return jsonify({'status': 'feedback_received', 'feedback': feedback})
 
+        @self.app.route('/form')
+        def form_page():
+            return render_template_string(self._get_form_template())
+
+        @self.app.route('/api/form', methods=['GET'])
+        def get_form():
+            pending = self.form_handler.pending if self.form_handler is not None else None
+            questions = self.form_handler.questions if self.form_handler is not None else []
+            return jsonify({'open': pending is not None and not pending.done(), 'questions': questions})
+
+        @self.app.route('/api/form', methods=['POST'])
+        def submit_form():
+            answers = self._json_body().get('answers', {})
+            if not isinstance(answers, dict):
+                return jsonify({'error': 'answers must be an object'}), 400
+            if self.form_handler is None or not self.form_handler.submit(answers):
+                return jsonify({'error': 'no form is waiting for answers'}), 409
+            return jsonify({'status': 'answers_received'})
+
+    def publish_ideas(self, ideas: List[Dict]) -> IdeaIndex:
+        """Index an idea set so the web interface can page through it"""
+        idea_set = IdeaIndex(ideas)
+        self._remember(idea_set)
+        if self.sets_dir is not None:
+            self._save_set(idea_set)
+        return idea_set
+
+    def get_idea_set(self, set_id=None):
+        """Look up a published idea set; the most recent one when no id is given"""
+        if not set_id and self.sets_dir is not None:
+            # Another worker may have published a newer set
+            set_id = self._read_text(self.sets_dir / 'latest')
+        with self._sets_lock:
+            if not set_id:
+                return next(reversed(self.idea_sets.values()), None)
+            idea_set = self.idea_sets.get(set_id)
+        if idea_set is None and self.sets_dir is not None:
+            idea_set = self._load_set(set_id)
+        return idea_set
+
+    def _remember(self, idea_set):
+        with self._sets_lock:
+            self.idea_sets[idea_set.set_id] = idea_set
+            while len(self.idea_sets) > self.max_idea_sets:
+                self.idea_sets.popitem(last=False)
+
+    def _save_set(self, idea_set):
+        """Write a set where the other workers can load it, then mark it as the latest"""
+        self.sets_dir.mkdir(parents=True, exist_ok=True)
+        ideas = [dict(idea) for idea in idea_set.ideas]
+        self._write_atomic(self.sets_dir / f"{idea_set.set_id}.json", json.dumps({'ideas': ideas}))
+        self._write_atomic(self.sets_dir / 'latest', idea_set.set_id)
+        older = []
+        for path in self.sets_dir.glob('*.json'):
+            try:
+                if path.stem != idea_set.set_id:
+                    older.append((path.stat().st_mtime_ns, path))
+            except OSError:
+                pass  # Another worker evicted it first
+        older.sort()
+        for _, path in older[:max(0, len(older) - self.max_idea_sets + 1)]:
+            path.unlink(missing_ok=True)
+
+    def _load_set(self, set_id):
+        """A set another worker published, or ``None`` if it is unknown or evicted"""
+        # Ids come from requests, so only ever open names publish_ideas could have written
+        if not set_id.isalnum():
+            return None
+        data = self._read_text(self.sets_dir / f"{set_id}.json")
+        if data is None:
+            return None
+        idea_set = IdeaIndex(json.loads(data)['ideas'], set_id=set_id)
+        self._remember(idea_set)
+        return idea_set
+
+    @staticmethod
+    def _write_atomic(path, text):
+        tmp_path = path.with_suffix(f'.tmp{os.getpid()}-{threading.get_ident()}')
+        tmp_path.write_text(text, encoding='utf-8')
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_text(path):
+        try:
+            return path.read_text(encoding='utf-8')
+        except OSError:
+            return None
+
+    @staticmethod
+    def _json_body():
+        """The request's JSON object, or an empty dict if the body is missing or not an object"""
+        from flask import request
+
+        body = request.get_json(silent=True)
+        return body if isinstance(body, dict) else {}
+
+    def _json_response(self, payload, etag, status=200):
+        """Compact JSON, gzipped when the client accepts it, tagged for conditional GETs"""
+        from flask import Response, request
+
+        if status == 304:
+            response = Response(status=304)
+        else:
+            body, encoding = compress(encode_json(payload), request.headers.get('Accept-Encoding'))
+            response = Response(body, status=status, mimetype='application/json')
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        # Weak, because the same tag covers the gzipped and plain bodies
+        response.set_etag(etag, weak=True)
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
     def present_ideas_and_get_feedback(self, ideas: List[Dict]) -> Tuple[List[Dict], Dict]:
         """Present ideas to user and collect feedback"""
         print(f"\nGenerated {len(ideas)} script ideas!")
         print("Starting web interface for idea selection and feedback...")
+        self.publish_ideas(ideas)
 
         # For this implementation, we'll use a simple console-based selection
         # In a full implementation, this would launch the Flask app
         selected_ideas = self._console_selection(ideas)
         feedback = self._collect_console_feedback(selected_ideas)
+        if self.feedback_log is not None and selected_ideas:
+            self.record_feedback(selected_ideas, feedback)
 
         return selected_ideas, feedback
 
+    def record_feedback(self, selected_ideas: List[Dict], feedback: Dict, client=None):
+        """Append the selection and its feedback to the feedback log"""
+        event = {
+            'type': 'select',
+            'ideas': [{field: idea[field] for field in ('id', 'format', 'theme', 'angle')}
+                      for idea in selected_ideas],
+            'rating': feedback.get('rating'),
+            'improve': bool(feedback.get('improve')),
+            'text': feedback.get('feedback') or feedback.get('improvements')
+        }
+        if client:
+            event['client'] = client
+        return self.feedback_log.record(event)
+
     def _console_selection(self, ideas: List[Dict]) -> List[Dict]:
         """Console-based idea selection"""
         print("\n" + "="*80)
@@ -89,6 +295,73 @@ class UserInterface:
 
         return feedback
 
+    def _get_form_template(self) -> str:
+        """Get HTML template for the additional information form"""
+        return """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Business Content Agent - Additional Information</title>
+    <style>
+        body { font-family: Arial, sans-serif; margin: 20px; }
+        label { display: block; margin-top: 15px; font-weight: bold; }
+        input { width: 500px; padding: 5px; }
+        button { padding: 10px 15px; margin-top: 15px; cursor: pointer; }
+    </style>
+</head>
+<body>
+    <h1>Additional Information</h1>
+    <p id="status">Loading...</p>
+    <form id="form" style="display: none" onsubmit="submitAnswers(event)">
+        <div id="questions"></div>
+        <button type="submit">Send answers</button>
+    </form>
+
+    <script>
+        function submitAnswers(event) {
+            event.preventDefault();
+            const answers = {};
+            document.querySelectorAll('#questions input').forEach(input => {
+                answers[input.name] = input.value;
+            });
+            fetch('/api/form', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ answers: answers })
+            })
+            .then(response => {
+                document.getElementById('form').style.display = 'none';
+                document.getElementById('status').textContent = response.ok
+                    ? 'Thank you! The analysis is being updated with your answers.'
+                    : 'The form is no longer waiting for answers.';
+            });
+        }
+
+        fetch('/api/form')
+            .then(response => response.json())
+            .then(form => {
+                if (!form.open) {
+                    document.getElementById('status').textContent = 'No additional information is needed right now.';
+                    return;
+                }
+                document.getElementById('status').textContent =
+                    'Analysis is already running. Your answers will refine it.';
+                const container = document.getElementById('questions');
+                form.questions.forEach((question, i) => {
+                    const label = document.createElement('label');
+                    label.textContent = (i + 1) + '. ' + question;
+                    const input = document.createElement('input');
+                    input.name = 'question_' + (i + 1);
+                    container.appendChild(label);
+                    container.appendChild(input);
+                });
+                document.getElementById('form').style.display = 'block';
+            });
+    </script>
+</body>
+</html>
+        """
+
     def _get_main_template(self) -> str:
         """Get HTML template for web interface"""
         return """
@@ -101,12 +374,21 @@ class UserInterface:
         .idea { border: 1px solid #ddd; padding: 15px; margin: 10px 0; border-radius: 5px; }
         .selected { background-color: #e8f5e8; }
         button { padding: 10px 15px; margin: 5px; cursor: pointer; }
+        .filters select { padding: 5px; margin: 0 5px 10px 0; }
         .feedback { background-color: #f9f9f9; padding: 15px; border-radius: 5px; }
     </style>
 </head>
 <body>
     <h1>Business Content Agent - Script Ideas</h1>
+    <div class="filters">
+        <select id="filter-format" data-filter="format"><option value="">All formats</option></select>
+        <select id="filter-theme" data-filter="theme"><option value="">All themes</option></select>
+        <select id="filter-platform" data-filter="platform"><option value="">All platforms</option></select>
+        <select id="filter-duration" data-filter="duration"><option value="">All durations</option></select>
+        <span id="ideas-total"></span>
+    </div>
     <div id="ideas-container"></div>
+    <button id="load-more" onclick="loadPage()" style="display: none">Load more</button>
     <div class="feedback">
         <h3>Provide Feedback</h3>
         <textarea id="feedback-text" rows="4" cols="50" placeholder="Enter your feedback..."></textarea><br>
@@ -115,25 +397,86 @@ class UserInterface:
 
     <script>
         let selectedIdeas = [];
+        let ideaSet = null;
+        let nextCursor = 0;
+
+        function field(label, value) {
+            const p = document.createElement('p');
+            if (label) {
+                const strong = document.createElement('strong');
+                strong.textContent = label + ': ';
+                p.appendChild(strong);
+            }
+            p.appendChild(document.createTextNode(value));
+            return p;
+        }
 
         function displayIdeas(ideas) {
             const container = document.getElementById('ideas-container');
-            container.innerHTML = '';
 
             ideas.forEach(idea => {
                 const div = document.createElement('div');
                 div.className = 'idea';
-                div.innerHTML = `
-                    <h3>${idea.title}</h3>
-                    <p><strong>Format:</strong> ${idea.format}</p>
-                    <p><strong>Theme:</strong> ${idea.theme}</p>
-                    <p>${idea.description}</p>
-                    <p><strong>Duration:</strong> ${idea.estimated_duration}</p>
-                    <p><strong>Platforms:</strong> ${idea.target_platforms.join(', ')}</p>
-                    <button onclick="selectIdea(${idea.id})">Select</button>
-                `;
+                div.dataset.id = idea.id;
+                const title = document.createElement('h3');
+                title.textContent = idea.title;
+                div.appendChild(title);
+                div.appendChild(field('Format', idea.format));
+                div.appendChild(field('Theme', idea.theme));
+                div.appendChild(field('', idea.description));
+                div.appendChild(field('Duration', idea.estimated_duration));
+                div.appendChild(field('Platforms', idea.target_platforms.join(', ')));
+                const button = document.createElement('button');
+                button.onclick = () => selectIdea(idea.id);
+                div.appendChild(button);
                 container.appendChild(div);
             });
+            updateSelections();
+        }
+
+        function filterParams() {
+            const params = new URLSearchParams();
+            document.querySelectorAll('[data-filter]').forEach(select => {
+                if (select.value) params.set(select.dataset.filter, select.value);
+            });
+            return params;
+        }
+
+        function loadPage() {
+            if (nextCursor === null) return;
+            const params = filterParams();
+            if (ideaSet) params.set('set', ideaSet);
+            params.set('cursor', nextCursor);
+            fetch('/api/ideas?' + params)
+                .then(response => response.json())
+                .then(page => {
+                    ideaSet = page.set;
+                    nextCursor = page.next_cursor;
+                    document.getElementById('ideas-total').textContent = page.total + ' ideas';
+                    document.getElementById('load-more').style.display = nextCursor === null ? 'none' : '';
+                    displayIdeas(page.ideas);
+                });
+        }
+
+        function reload() {
+            document.getElementById('ideas-container').replaceChildren();
+            nextCursor = 0;
+            loadPage();
+        }
+
+        function loadFacets() {
+            return fetch('/api/ideas/facets')
+                .then(response => response.ok ? response.json() : null)
+                .then(data => {
+                    if (!data) return;
+                    ideaSet = data.set;
+                    document.querySelectorAll('[data-filter]').forEach(select => {
+                        Object.entries(data.facets[select.dataset.filter]).forEach(([value, count]) => {
+                            select.appendChild(new Option(value + ' (' + count + ')', value));
+                        });
+                        select.onchange = reload;
+                    });
+                });
         }
 
         function selectIdea(id) {
@@ -148,8 +491,7 @@ class UserInterface:
         function updateSelections() {
             document.querySelectorAll('.idea').forEach(div => {
                 const button = div.querySelector('button');
-                const id = parseInt(button.onclick.toString().match(/\\d+/)[0]);
-                if (selectedIdeas.includes(id)) {
+                if (selectedIdeas.includes(parseInt(div.dataset.id))) {
                     div.classList.add('selected');
                     button.textContent = 'Selected';
                 } else {
@@ -165,6 +507,7 @@ class UserInterface:
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
+                    set: ideaSet,
                     selected_ideas: selectedIdeas,
                     feedback: feedback,
                     improve: true
@@ -173,16 +516,19 @@ class UserInterface:
             alert('Feedback submitted!');
         }
 
-        // Load ideas on page load
+        // Load the filters and the first page of the latest idea set
         window.onload = function() {
-            // This would be populated with actual ideas
-            displayIdeas([]);
+            loadFacets().then(reload);
         };
     </script>
 </body>
 </html>
         """
 
-    def run_web_app(self):
-        """Run the Flask web application"""
-        self.app.run(debug=True, port=self.config['port'])
\ No newline at end of file
+    def run_web_app(self, preload=None):
+        """Run the web application in the mode set by ``ui.mode``"""
+        WebServer(self, self.config, preload).run()
+
+    def serve_in_background(self):
+        """Serve the web application from a daemon thread while the caller keeps working"""
+        return WebServer(self, self.config).run_in_background()
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""
+Vocabulary Module
+Compact corpus vocabulary mapping interned terms to integer ids.
+"""
+
+import hashlib
+import sys
+from array import array
+
+
+class Vocabulary:
+    """Interned term table with array-backed frequency and occurrence columns.
+
+    Every distinct key idea or entity is stored once and referred
+    to by its integer id. Per-term data lives in parallel arrays indexed
+    by id instead of one dict or list entry per occurrence.
+    """
+
+    KEY_IDEA = 1
+    ENTITY = 2
+
+    NO_OFFSET = -1
+
+    def __init__(self):
+        self._ids = {}
+        self.terms = []
+        self.kinds = array('B')         # bitmask of KEY_IDEA / ENTITY
+        self.counts = array('L')        # total occurrences in the corpus
+        self.doc_counts = array('L')    # number of documents containing the term
+        self.first_offsets = array('q') # first character offset in the full text
+        self._last_doc = array('l')
+
+    def __len__(self):
+        return len(self.terms)
+
+    def __contains__(self, term):
+        return term in self._ids
+
+    def add(self, term, kind, doc_index=0, offset=NO_OFFSET):
+        """Record one occurrence of ``term`` and return its id"""
+        term_id = self._ids.get(term)
+        if term_id is None:
+            term = sys.intern(term)
+            term_id = len(self.terms)
+            self._ids[term] = term_id
+            self.terms.append(term)
+            self.kinds.append(kind)
+            self.counts.append(1)
+            self.doc_counts.append(1)
+            self.first_offsets.append(offset)
+            self._last_doc.append(doc_index)
+            return term_id
+
+        self.kinds[term_id] |= kind
+        self.counts[term_id] += 1
+        if self._last_doc[term_id] != doc_index:
+            self._last_doc[term_id] = doc_index
+            self.doc_counts[term_id] += 1
+        if self.first_offsets[term_id] == self.NO_OFFSET:
+            self.first_offsets[term_id] = offset
+        return term_id
+
+    def append_term(self, term, kind, count, doc_count, first_offset=NO_OFFSET):
+        """Add a new term with already aggregated statistics (e.g. merged from shards)"""
+        term = sys.intern(term)
+        term_id = len(self.terms)
+        self._ids[term] = term_id
+        self.terms.append(term)
+        self.kinds.append(kind)
+        self.counts.append(count)
+        self.doc_counts.append(doc_count)
+        self.first_offsets.append(first_offset)
+        self._last_doc.append(-1)
+        return term_id
+
+    def id_of(self, term):
+        """Return the id of ``term`` or ``None`` if it was never seen"""
+        return self._ids.get(term)
+
+    def ids(self, kind):
+        """Return the ids of every term recorded with ``kind``"""
+        return array('L', (term_id for term_id, kinds in enumerate(self.kinds) if kinds & kind))
+
+    def lookup(self, ids):
+        """Map ids back to their (shared, interned) strings"""
+        terms = self.terms
+        return [terms[term_id] for term_id in ids]
+
+    def terms_of(self, kind):
+        """Terms recorded with ``kind``, in first-seen order"""
+        return self.lookup(self.ids(kind))
+
+    def content_digest(self):
+        """Hash of the terms and their statistics (see ``pipeline.content_digest``)"""
+        digest = hashlib.sha256()
+        for term in self.terms:
+            digest.update(term.encode('utf-8') + b'\0')
+        for column in (self.kinds, self.counts, self.doc_counts, self.first_offsets):
+            digest.update(column.tobytes())
+        return digest.hexdigest()
+
+    def cooccurring(self, ids, window):
+        """Yield id pairs whose first occurrences are within ``window`` characters"""
+        offsets = self.first_offsets
+        located = sorted((offsets[term_id], term_id) for term_id in ids
+                         if offsets[term_id] != self.NO_OFFSET)
+
+        start = 0
+        for end, (offset, term_id) in enumerate(located):
+            while offset - located[start][0] >= window:
+                start += 1
+            for _, other_id in located[start:end]:
+                yield other_id, term_id
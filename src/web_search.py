@@ -3,9 +3,12 @@ Web Search Module
 Searches for additional relevant information from the web.
 """
 
-import requests
-from bs4 import BeautifulSoup
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.page_fetcher import PageFetcher
+from src.query_planner import QueryPlanner
+from src.search_quota import QuotaExceeded, QuotaScheduler, RateLimited
 
 class WebSearch:
     """Handles web searches for additional information"""
@@ -14,21 +17,102 @@ class WebSearch:
         self.api_key = config['api_key']
         self.search_engine_id = config['search_engine_id']
         self.base_url = "https://www.googleapis.com/customsearch/v1"
+        self.max_queries = config.get('max_queries', 5)
+        self.pool_size = config.get('pool_size', 10)
+        self._session = None
+
+        self.workers = config.get('workers', 1)
+        self.planner = QueryPlanner(config.get('planner'))
+
+        # A shared scheduler paces queries across every running process
+        quota_config = config.get('quota', {})
+        self.quota = QuotaScheduler(quota_config) if quota_config.get('enabled') else None
+
+        fetch_config = config.get('fetch_pages', {})
+        self.page_fetcher = PageFetcher(fetch_config, lambda: self.session) if fetch_config.get('enabled') else None
+
+    @property
+    def session(self):
+        """Pooled HTTP session, reused so connections stay open between queries"""
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            self._session.mount('https://', adapter)
+            self._session.mount('http://', adapter)
+        return self._session
 
-    def search_related_info(self, key_ideas):
-        """Search for additional information related to key ideas"""
+    def search_related_info(self, key_ideas, vocabulary=None, budget=None):
+        """Search for additional information related to key ideas.
+
+        Ideas are searched most important first; with a ``budget``, queries
+        not started when it runs out are skipped.
+        """
         additional_info = []
+        # Spend the limited queries on the most frequent, mutually distinct ideas
+        ideas = self.planner.plan(key_ideas, self.max_queries, self._idea_weights(key_ideas, vocabulary))
+        skipped = []
 
-        for idea in key_ideas[:5]:  # Limit to top 5 ideas to avoid rate limits
-            print(f"Searching for: {idea}")
-            results = self._google_search(idea)
-            additional_info.extend(results)
-            time.sleep(1)  # Rate limiting
+        def search(idea, priority):
+            if budget is not None and budget.expired():
+                skipped.append(idea)
+                return []
+            return self.search_idea(idea, priority)
+
+        if self.quota and self.workers > 1:
+            # The scheduler does the pacing, so queries can be in flight together
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for results in executor.map(search, ideas, range(len(ideas))):
+                    additional_info.extend(results)
+        else:
+            for priority, idea in enumerate(ideas):
+                additional_info.extend(search(idea, priority))
 
+        if skipped:
+            budget.degrade(f"ran {len(ideas) - len(skipped)} of {len(ideas)} searches, "
+                           f"skipped: {', '.join(skipped)}")
         return additional_info
 
-    def _google_search(self, query):
+    def _idea_weights(self, key_ideas, vocabulary):
+        """Weight ideas by how often and in how many documents they occur"""
+        if vocabulary is None:
+            return None
+        weights = {}
+        for idea in key_ideas:
+            term_id = vocabulary.id_of(idea)
+            if term_id is not None:
+                weights[idea] = vocabulary.counts[term_id] * vocabulary.doc_counts[term_id]
+        return weights
+
+    def search_idea(self, idea, priority=0):
+        """Search for a single key idea; lower ``priority`` values are served first"""
+        print(f"Searching for: {idea}")
+        results = self._google_search(idea, priority)
+        if not self.quota:
+            time.sleep(1)  # Rate limiting
+        if self.page_fetcher:
+            self.page_fetcher.fetch_all(results)
+        return results
+
+    def _google_search(self, query, priority=0):
         """Perform Google Custom Search"""
+        import requests
+
+        try:
+            if self.quota:
+                return self.quota.run(query, lambda: self._request(query), priority)
+            return self._request(query)
+        except QuotaExceeded as e:
+            print(f"Search deferred for query '{query}': {e}")
+            return []
+        except (requests.RequestException, RateLimited) as e:
+            print(f"Search failed for query '{query}': {e}")
+            return []
+
+    def _request(self, query):
+        """Send one Custom Search request"""
         params = {
             'key': self.api_key,
             'cx': self.search_engine_id,
@@ -36,25 +120,23 @@ class WebSearch:
             'num': 5  # Get top 5 results
         }
 
-        try:
-            response = requests.get(self.base_url, params=params)
-            response.raise_for_status()
-            data = response.json()
-
-            results = []
-            for item in data.get('items', []):
-                results.append({
-                    'title': item['title'],
-                    'snippet': item['snippet'],
-                    'url': item['link'],
-                    'query': query
-                })
-
-            return results
-
-        except requests.RequestException as e:
-            print(f"Search failed for query '{query}': {e}")
-            return []
+        response = self.session.get(self.base_url, params=params, timeout=30)
+        if response.status_code == 429:
+            retry_after = response.headers.get('Retry-After')
+            raise RateLimited(float(retry_after) if retry_after and retry_after.isdigit() else None)
+        response.raise_for_status()
+        data = response.json()
+
+        results = []
+        for item in data.get('items', []):
+            results.append({
+                'title': item['title'],
+                'snippet': item['snippet'],
+                'url': item['link'],
+                'query': query
+            })
+
+        return results
 
     def search_specialized_documents(self, topics):
         """Search for specialized documents and books"""
@@ -62,7 +144,8 @@ class WebSearch:
 
         for topic in topics[:3]:  # Limit to top 3 topics
             query = f"{topic[0]} business book OR document OR research"
-            results = self._google_search(query)
+            # Background reading; key idea searches go first
+            results = self._google_search(query, priority=100)
             specialized_info.extend(results)
 
         return specialized_info
\ No newline at end of file
@@ -0,0 +1,103 @@
+"""
+Web Server Module
+Runs the web interface under a prefork WSGI server with preloaded components.
+"""
+
+import gc
+import os
+import signal
+import threading
+
+
+class WebServer:
+    """Serves a ``UserInterface`` in development or production mode.
+
+    Development mode is Flask's single-process reloading server. Production
+    mode runs gunicorn with ``workers`` processes of ``threads`` threads
+    each. ``preload`` (published idea sets and anything else the routes
+    read) runs once in the master before it forks, so every worker shares those pages
+    copy-on-write instead of loading its own copy. ``SIGHUP`` to the
+    master (see ``reload``) replaces the workers gracefully: new ones start
+    before old ones finish their in-flight requests.
+    """
+
+    def __init__(self, ui, config, preload=None):
+        self.ui = ui
+        self.preload = preload
+        self.mode = config.get('mode', 'development')
+        self.host = config.get('host', '127.0.0.1')
+        self.port = config['port']
+        self.workers = config.get('workers', 4)
+        self.threads = config.get('threads', 4)
+        self.timeout = config.get('timeout', 30)
+        self.graceful_timeout = config.get('graceful_timeout', 30)
+        self.max_requests = config.get('max_requests', 0)
+        self.pidfile = config.get('pidfile', '.cache/ui.pid')
+
+    def run(self):
+        """Serve until interrupted"""
+        if self.mode == 'production':
+            self._run_prefork()
+            return
+
+        if self.preload:
+            self.preload()
+        self.ui.app.run(debug=True, host=self.host, port=self.port)
+
+    def run_in_background(self):
+        """Serve from a daemon thread (single process, no reloader) and return the server"""
+        from werkzeug.serving import make_server
+
+        server = make_server(self.host, self.port, self.ui.app, threaded=True)
+        threading.Thread(target=server.serve_forever, name='web-ui', daemon=True).start()
+        return server
+
+    def options(self):
+        """gunicorn settings for production mode"""
+        return {
+            'bind': f"{self.host}:{self.port}",
+            'workers': self.workers,
+            'threads': self.threads,
+            'worker_class': 'gthread',
+            'preload_app': True,
+            'timeout': self.timeout,
+            'graceful_timeout': self.graceful_timeout,
+            'max_requests': self.max_requests,
+            # Spread recycling out so workers don't all restart at once
+            'max_requests_jitter': self.max_requests // 10,
+            'pidfile': self.pidfile
+        }
+
+    def reload(self):
+        """Ask a running production server to replace its workers gracefully"""
+        with open(self.pidfile, 'r') as f:
+            pid = int(f.read().strip())
+        os.kill(pid, signal.SIGHUP)
+        return pid
+
+    def _run_prefork(self):
+        try:
+            from gunicorn.app.base import BaseApplication
+        except ImportError:
+            raise RuntimeError("Production mode requires the 'gunicorn' package (Linux/macOS)")
+
+        server = self
+        os.makedirs(os.path.dirname(self.pidfile) or '.', exist_ok=True)
+
+        class Application(BaseApplication):
+            def load_config(self):
+                for key, value in server.options().items():
+                    self.cfg.set(key, value)
+
+            def load(self):
+                # With preload_app this runs once in the master, before any fork
+                if server.preload:
+                    server.preload()
+                app = server.ui.app
+                # Keep the collector from touching (and so copying) the preloaded objects
+                gc.freeze()
+                return app
+
+        print(f"Serving on http://{self.host}:{self.port} with {self.workers} workers "
+              f"x {self.threads} threads")
+        Application().run()
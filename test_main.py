@@ -5,6 +5,7 @@ Test script to check if main.py can start without errors.
 
 import sys
 import os
+import time
 
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
@@ -72,6 +73,1581 @@ def test_basic_functionality():
         print(f"✗ Functionality test error: {e}")
         return False
 
+def test_topic_counter():
+    """Test bounded topic counting and merging"""
+    try:
+        from src.topic_counter import TopicCounter
+
+        counter = TopicCounter(capacity=2)
+        counter.update(['sales'] * 5 + ['product'] * 3 + ['team'])
+        counter.update(['sales', 'market', 'brand'])
+        assert len(counter) <= 4
+        assert counter.most_common(1) == [('sales', 6)]
+
+        other = TopicCounter(capacity=2)
+        other.update(['product'] * 4)
+        counter.merge(other)
+        top = dict(counter.most_common(2))
+        assert top['sales'] >= 6 and top['product'] >= 7
+        print("✓ Topic counter works")
+
+        return True
+    except Exception as e:
+        print(f"✗ Topic counter test error: {e}")
+        return False
+
+def test_duplicate_detector():
+    """Test near-duplicate collapsing"""
+    try:
+        from src.duplicate_detector import DuplicateDetector
+
+        base = "our company sells handmade furniture to families in the region " * 20
+        documents = [
+            {'name': 'plan.txt', 'content': base},
+            {'name': 'plan_final.txt', 'content': base + "final edits"},
+            {'name': 'menu.txt', 'content': "seasonal menu with local ingredients and fresh bread " * 20}
+        ]
+        kept, report = DuplicateDetector({'threshold': 0.8}).collapse(documents)
+        assert [doc['name'] for doc in kept] == ['plan_final.txt', 'menu.txt']
+        assert report[0]['collapsed'] == ['plan.txt']
+        print("✓ Duplicate detector works")
+
+        return True
+    except Exception as e:
+        print(f"✗ Duplicate detector test error: {e}")
+        return False
+
+def test_vocabulary_relationships():
+    """Test that id-based relationships match the text-scanning fallback"""
+    try:
+        from src.business_analyzer import BusinessAnalyzer
+        from src.vocabulary import Vocabulary
+
+        full_text = "Acme works with Globex in Madrid. " + "filler " * 100 + "Initech opened."
+        vocabulary = Vocabulary()
+        for entity in ['Acme', 'Globex', 'Madrid', 'Initech', 'Acme']:
+            vocabulary.add(entity, Vocabulary.ENTITY, 0, full_text.find(entity))
+        entities = vocabulary.lookup(vocabulary.ids(Vocabulary.ENTITY))
+        assert entities == ['Acme', 'Globex', 'Madrid', 'Initech']
+        assert vocabulary.counts[vocabulary.id_of('Acme')] == 2
+
+        analyzer = BusinessAnalyzer()
+        data = {'full_text': full_text, 'entities': entities}
+        expected = analyzer._analyze_relationships(data)
+        data['vocabulary'] = vocabulary
+        actual = analyzer._analyze_relationships(data)
+        assert {k: sorted(v) for k, v in actual.items()} == {k: sorted(v) for k, v in expected.items()}
+
+        # The corpus keeps terms only in its vocabulary, and the analyzers read them from there
+        from src.audience_analyzer import AudienceAnalyzer
+        from src.text_processor import CorpusBuilder
+        from src.topic_counter import TopicCounter
+
+        corpus = CorpusBuilder(TopicCounter())
+        corpus.add({'text': "Acme sells on Instagram with a friendly voice", 'topics': ['instagram'],
+                    'key_phrases': ['friendly voice'], 'entities': [('Acme', 0), ('Instagram', 14)]})
+        processed = corpus.result()
+        assert 'key_ideas' not in processed and 'entities' not in processed
+        analysis = analyzer.analyze_business(processed, [])
+        assert analysis['value_network']['stakeholders'] == ['Acme', 'Instagram']
+        assert analysis['market_position']['unique_selling_points'] == ['friendly voice']
+        profile = AudienceAnalyzer().analyze_audience(analysis)
+        assert profile['tone'] == 'casual' and profile['communication_preferences'] == ['visual content']
+        print("✓ Vocabulary relationships work")
+
+        return True
+    except Exception as e:
+        print(f"✗ Vocabulary test error: {e}")
+        return False
+
+def test_pipelined_ingest():
+    """Test the concurrent download/parse/search stages with stand-in components"""
+    try:
+        from src.pipelined_ingest import PipelinedIngest
+
+        class FakeDrive:
+            def iter_documents(self, items=None, budget=None):
+                for i in range(6):
+                    yield {'name': f'doc{i}.txt', 'content': f'idea {i % 3}'}
+
+        class FakeCorpus:
+            def __init__(self):
+                self.texts = []
+
+            def add(self, processed):
+                new_ideas = [text for text in processed if text not in self.texts]
+                self.texts.append(processed[0])
+                return new_ideas
+
+            def result(self):
+                return {'key_ideas': sorted(set(self.texts)), 'document_count': len(self.texts)}
+
+        class FakeProcessor:
+            def new_corpus(self):
+                return FakeCorpus()
+
+            def process_document(self, document):
+                return [document['content']]
+
+        class FakeSearch:
+            max_queries = 2
+
+            def search_idea(self, idea):
+                return [{'title': idea, 'snippet': idea, 'url': '', 'query': idea}]
+
+        processed, info, _ = PipelinedIngest(FakeDrive(), FakeProcessor(), FakeSearch(),
+                                             {'queue_size': 2, 'nlp_workers': 2}).run()
+        assert processed['document_count'] == 6
+        assert processed['key_ideas'] == ['idea 0', 'idea 1', 'idea 2']
+        assert len(info) == 2
+
+        # A reused detector (as in the daemon) must not carry documents between runs
+        from src.duplicate_detector import DuplicateDetector
+
+        class RepeatDrive:
+            def iter_documents(self, items=None, budget=None):
+                yield {'name': 'a.txt', 'content': 'family bakery selling sourdough bread ' * 20}
+                yield {'name': 'b.txt', 'content': 'family bakery selling sourdough bread ' * 20}
+
+        ingest = PipelinedIngest(RepeatDrive(), FakeProcessor(), FakeSearch(),
+                                 duplicate_detector=DuplicateDetector())
+        for _ in range(2):
+            processed, _, duplicates = ingest.run()
+            assert processed['document_count'] == 1
+            assert duplicates == [{'kept': 'a.txt', 'collapsed': ['b.txt']}]
+        print("✓ Pipelined ingest works")
+
+        return True
+    except Exception as e:
+        print(f"✗ Pipelined ingest test error: {e}")
+        return False
+
+def test_pipeline_resume():
+    """Test that the stage graph memoizes stages and resumes after a failure"""
+    try:
+        import tempfile
+        from src.pipeline import Pipeline, Stage
+
+        calls = []
+        fail = [True]
+
+        def double(number):
+            calls.append('double')
+            return number * 2
+
+        def square(number):
+            calls.append('square')
+            return number ** 2
+
+        def total(doubled, squared):
+            calls.append('total')
+            if fail[0]:
+                raise RuntimeError("simulated crash")
+            return doubled + squared
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            def make_pipeline():
+                return Pipeline([
+                    Stage('double', double, ['number'], ['doubled']),
+                    Stage('square', square, ['number'], ['squared']),
+                    Stage('total', total, ['doubled', 'squared'], ['total'])
+                ], cache_dir=cache_dir)
+
+            try:
+                make_pipeline().run({'number': 3})
+            except RuntimeError:
+                pass
+
+            fail[0] = False
+            calls.clear()
+            assert make_pipeline().run({'number': 3})['total'] == 15
+            assert calls == ['total']
+
+            # A stage's config is part of its key; unchanged outputs still spare the stages after it
+            calls.clear()
+            Pipeline([
+                Stage('double', double, ['number'], ['doubled']),
+                Stage('square', square, ['number'], ['squared'], config={'threshold': 0.5}),
+                Stage('total', total, ['doubled', 'squared'], ['total'])
+            ], cache_dir=cache_dir).run({'number': 3})
+            assert calls == ['square']
+
+        from main import build_stages
+        components = {name: object() for name in ['drive_access', 'text_processor', 'duplicate_detector',
+                                                   'web_search', 'form_handler', 'business_analyzer',
+                                                   'audience_analyzer', 'script_generator']}
+
+        def versions(config):
+            return {stage.name: stage.version for stage in build_stages(config, components)}
+
+        base = versions({'nlp': {'model': 'en_core_web_sm'}, 'web_search': {'max_queries': 10}})
+        changed = versions({'nlp': {'model': 'en_core_web_lg'}, 'web_search': {'max_queries': 10}})
+        assert [name for name in base if base[name] != changed[name]] == ['nlp']
+        # Random idea sampling must not be replayed from the cache
+        assert not {stage.name: stage for stage in build_stages({}, components)}['scripts'].memoize
+        print("✓ Pipeline resume works")
+
+        return True
+    except Exception as e:
+        print(f"✗ Pipeline test error: {e}")
+        return False
+
+def test_checkpoint_resume():
+    """Test that resuming from checkpoints never builds or calls Drive and NLP components"""
+    try:
+        import tempfile
+        import main
+        from src.checkpoint import CheckpointStore
+        from src.text_processor import CorpusBuilder
+        from src.topic_counter import TopicCounter
+
+        built = []
+
+        class NoDrive:
+            def __init__(self, config):
+                built.append('drive')
+
+            def get_documents(self, budget=None):
+                raise AssertionError("Drive was used during a resume")
+
+        class NoProcessor:
+            def __init__(self, config):
+                built.append('nlp')
+
+            def process_documents(self, documents, budget=None):
+                raise AssertionError("spaCy was used during a resume")
+
+        corpus = CorpusBuilder(TopicCounter())
+        corpus.add({'text': "Acme bakery sells sourdough bread to local families", 'topics': ['bakery'],
+                    'key_phrases': ['sourdough bread', 'local families'], 'entities': [('Acme', 0)]})
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config = {'google_drive': {}, 'nlp': {}, 'ui': {'port': 5000},
+                      'web_search': {'api_key': 'test', 'search_engine_id': 'test'},
+                      'pipeline': {'cache_dir': f"{tmp_dir}/cache"},
+                      'checkpoint': {'enabled': True, 'dir': f"{tmp_dir}/checkpoints",
+                                     'resume': ['processed_data', 'additional_info']}}
+            checkpoints = CheckpointStore(config['checkpoint'])
+            checkpoints.save('processed_data', corpus.result())
+            checkpoints.save('additional_info', [])
+
+            originals = main.GoogleDriveAccess, main.TextProcessor
+            main.GoogleDriveAccess, main.TextProcessor = NoDrive, NoProcessor
+            try:
+                components = main.create_components(config)
+                results = main.generate_script_ideas(config, components, form_answers={})
+            finally:
+                main.GoogleDriveAccess, main.TextProcessor = originals
+
+            assert built == [] and len(results['script_ideas']) == 40
+            # Stages nothing asked for are not run either
+            assert 'documents' not in results
+            assert not components.built('drive_access') and not components.built('text_processor')
+        print("✓ Checkpoint resume skips Drive and NLP")
+
+        return True
+    except Exception as e:
+        print(f"✗ Checkpoint resume test error: {e}")
+        return False
+
+def test_checkpoint_roundtrip():
+    """Test saving and lazily reloading an artifact checkpoint"""
+    try:
+        import tempfile
+        from src.checkpoint import CheckpointStore
+
+        ideas = [{'id': i, 'title': f'Idea {i}', 'target_platforms': ['YouTube']} for i in range(20)]
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            store = CheckpointStore({'dir': checkpoint_dir})
+            store.save('script_ideas', ideas)
+            assert list(store.load('script_ideas')) == ideas
+            assert list(store.table('script_ideas', 'root', columns=['title']).columns) == ['title']
+
+            # Keys missing from some rows stay missing, and ints stay ints
+            records = [{'id': i, 'content': f'Text {i}'} if i % 2 else {'id': i, 'rating': i}
+                       for i in range(20)]
+            records[3]['rating'] = None
+            store.save('feedback', records)
+            loaded = list(store.load('feedback'))
+            assert loaded == records
+            assert all(type(row['rating']) is int for row in loaded if row.get('rating') is not None)
+
+            # Loaded artifacts digest like the originals, without reading their tables,
+            # so stage caches still hit after a resume
+            from src.checkpoint import LazyTable
+            from src.pipeline import content_digest
+            from src.text_processor import CorpusBuilder
+            from src.topic_counter import TopicCounter
+
+            corpus = CorpusBuilder(TopicCounter())
+            for i in range(40):
+                words = [f"topic{i % 25}", f"theme{i % 7}"]
+                corpus.add({'text': f"Acme {' '.join(words)} " * 40, 'topics': words,
+                            'key_phrases': [' '.join(words)], 'entities': [('Acme', 0), (f"Brand{i % 5}", 5)],
+                            'language': 'en'})
+            processed = corpus.result()
+            store.save('processed_data', processed)
+            loaded = store.load('processed_data')
+            assert isinstance(loaded['topics'], LazyTable)
+            assert content_digest(loaded) == content_digest(processed)
+            assert loaded['topics']._rows is None
+            assert content_digest(store.load('script_ideas')) == content_digest(ideas)
+        print("✓ Checkpoint round trip works")
+
+        return True
+    except Exception as e:
+        print(f"✗ Checkpoint test error: {e}")
+        return False
+
+def test_docx_extraction():
+    """Test streaming text extraction from a Word document"""
+    try:
+        import io
+        import zipfile
+        from src.extractors import DocumentExtractor
+
+        raw = io.BytesIO()
+        with zipfile.ZipFile(raw, 'w') as archive:
+            archive.writestr('word/document.xml',
+                             '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                             '<w:body><w:p><w:r><w:t>Our mission</w:t></w:r></w:p>'
+                             '<w:p><w:r><w:t>Local</w:t><w:tab/><w:t>bakery</w:t></w:r></w:p></w:body></w:document>')
+        raw.seek(0)
+
+        text = ''.join(DocumentExtractor({'chunk_size': 4})._docx_chunks(raw))
+        assert text == "Our mission\nLocal\tbakery\n"
+
+        # A Drive error for one file (here the export size limit) skips it instead of aborting
+        from googleapiclient.http import HttpMockSequence, HttpRequest
+        from src.extractors import ExtractionError
+
+        class Files:
+            def export_media(self, fileId, mimeType):
+                error = b'{"error": {"code": 403, "message": "This file is too large to be exported."}}'
+                return HttpRequest(HttpMockSequence([({'status': '403'}, error)]), None,
+                                   f'https://www.googleapis.com/drive/v3/files/{fileId}/export')
+
+        class Service:
+            def files(self):
+                return Files()
+
+        try:
+            list(DocumentExtractor().extract(Service(), {'id': 'big', 'mimeType': 'application/vnd.google-apps.document'}))
+            assert False, "expected an ExtractionError"
+        except ExtractionError as e:
+            assert 'too large' in str(e)
+
+        # The size cap counts UTF-8 bytes, not characters, and never splits a character
+        class LocalExtractor(DocumentExtractor):
+            def _download(self, service, item):
+                return io.BytesIO('ñañaña'.encode('utf-8'))
+
+        extractor = LocalExtractor({'chunk_size': 4, 'max_document_bytes': 5})
+        assert ''.join(extractor.extract(None, {'id': 'es', 'mimeType': 'text/plain'})) == 'ñañ'
+        print("✓ DOCX extraction works")
+
+        return True
+    except Exception as e:
+        print(f"✗ DOCX extraction test error: {e}")
+        return False
+
+def test_import_time():
+    """Test that importing main stays within the startup budget"""
+    try:
+        import subprocess
+
+        budget_ms = 500
+        heavy_modules = ['spacy', 'googleapiclient', 'flask', 'bs4', 'requests', 'pandas']
+
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'],
+                                cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True)
+
+        imported = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or '|' not in line:
+                continue
+            _, cumulative, name = line.split('|')
+            if cumulative.strip().isdigit():
+                imported[name.strip()] = int(cumulative)
+
+        loaded_heavy = [name for name in heavy_modules if name in imported]
+        assert not loaded_heavy, f"heavy modules imported at startup: {loaded_heavy}"
+        assert imported['main'] / 1000 < budget_ms, f"import main took {imported['main'] / 1000:.0f} ms"
+        print(f"✓ main imports in {imported['main'] / 1000:.0f} ms")
+
+        return True
+    except Exception as e:
+        print(f"✗ Import time test error: {e}")
+        return False
+
+def test_daemon_roundtrip():
+    """Test that jobs sent to the daemon run on its warm components"""
+    try:
+        import tempfile
+        import threading
+        from src.daemon import AgentDaemon, DaemonClient, RemoteFormHandler
+
+        loads = []
+        form_handler = RemoteFormHandler(["What is your target market?"])
+
+        def analyze(form_answers=None):
+            if form_answers is None:
+                form_answers = form_handler.request_additional_info()
+            return {'ideas': len(loads), 'market': form_answers['market']}
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            socket_path = os.path.join(tmp_dir, 'agent.sock')
+            loads.append('model')  # components are loaded once, before serving
+            daemon = AgentDaemon(socket_path, {'analyze': analyze})
+            server = threading.Thread(target=daemon.serve_forever, daemon=True)
+            server.start()
+
+            client = DaemonClient(socket_path, timeout=5)
+            for _ in range(50):
+                if client.is_running():
+                    break
+                time.sleep(0.05)
+
+            response = client.request('analyze')
+            assert response['status'] == 'input_required'
+            assert response['questions'] == ["What is your target market?"]
+
+            response = client.request('analyze', form_answers={'market': 'SMB'})
+            assert response == {'status': 'ok', 'result': {'ideas': 1, 'market': 'SMB'}}
+            assert client.request('missing')['status'] == 'error'
+
+            client.request('shutdown')
+            server.join(timeout=5)
+            assert not server.is_alive() and not os.path.exists(socket_path)
+
+        print("✓ Daemon serves jobs and asks for form answers")
+        return True
+    except Exception as e:
+        print(f"✗ Daemon test error: {e}")
+        return False
+
+def test_language_model_pool():
+    """Test language routing and LRU eviction of language models"""
+    try:
+        from src.language_detector import LanguageDetector
+        from src.model_pool import ModelPool
+
+        detector = LanguageDetector(['en', 'es'])
+        assert detector.detect("The company sells software to small businesses and it is growing "
+                               "fast in the market with a lot of new customers.") == 'en'
+        assert detector.detect("La empresa vende software a las pequeñas empresas y su mercado "
+                               "crece muy rápido con muchos clientes nuevos para el equipo.") == 'es'
+        assert detector.detect("Q3 KPIs") == 'en'  # too little text falls back to the default
+
+        loads = []
+
+        def loader(name):
+            loads.append(name)
+            return name
+
+        # Sizes are pinned so the test does not depend on real memory growth
+        pool = ModelPool({'en': 'en_model', 'es': 'es_model', 'pt': 'pt_model'},
+                         memory_budget_mb=250, model_sizes_mb={'en': 100, 'es': 100, 'pt': 100},
+                         loader=loader)
+        assert pool.get('en') == 'en_model'
+        assert pool.get('es') == 'es_model'
+        assert pool.get('en') == 'en_model'  # cached, now most recently used
+        pool.get('pt')                       # over budget: evicts 'es'
+        assert pool.loaded_languages() == ['en', 'pt']
+        pool.get('es')                       # reloads 'es', evicts 'en'
+
+        assert loads == ['en_model', 'es_model', 'pt_model', 'es_model']
+        assert pool.loaded_languages() == ['pt', 'es']
+
+        # The processor warms its default model but leaves it to the pool, so eviction frees it
+        import gc
+        import weakref
+        import src.model_pool as model_pool
+        from src.text_processor import TextProcessor
+
+        class Model:
+            def __init__(self, name):
+                self.name = name
+
+        original_loader = model_pool.load_spacy_model
+        model_pool.load_spacy_model = Model
+        try:
+            processor = TextProcessor({'models': {'en': 'en_model', 'es': 'es_model'}, 'model_memory_mb': 150,
+                                       'model_sizes_mb': {'en': 100, 'es': 100}})
+        finally:
+            model_pool.load_spacy_model = original_loader
+        default_model = weakref.ref(processor.models.get('en'))
+        processor.models.get('es')
+        gc.collect()
+        assert processor.models.loaded_languages() == ['es'] and default_model() is None
+
+        # A default language without a model is a configuration error, caught up front
+        from main import check_config
+        config = {'models': {'es': 'es_model'}, 'default_language': 'en'}
+        try:
+            TextProcessor(config)
+            assert False, "expected a ValueError"
+        except ValueError as e:
+            assert 'default_language' in str(e)
+        import contextlib
+        import io
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            check_config({'nlp': config})
+        assert "nlp.default_language 'en' has no model" in output.getvalue()
+
+        print("✓ Documents route to per-language models within the memory budget")
+        return True
+    except Exception as e:
+        print(f"✗ Language model pool test error: {e}")
+        return False
+
+def test_page_fetch_cache():
+    """Test page text extraction and ETag revalidation of cached pages"""
+    try:
+        import tempfile
+        from src.page_fetcher import PageFetcher
+
+        html = (b"<html><head><style>p {}</style></head><body><nav>Menu</nav>"
+                b"<article><h1>Market report</h1><p>The main problem is slow onboarding.</p>"
+                b"<script>track()</script></article><footer>Contact</footer></body></html>")
+
+        class FakeResponse:
+            def __init__(self, status_code, body=b''):
+                self.status_code = status_code
+                self.body = body
+                self.headers = {'Content-Type': 'text/html; charset=utf-8', 'ETag': '"v1"'}
+                self.encoding = 'utf-8'
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def raise_for_status(self):
+                pass
+
+            def iter_content(self, chunk_size):
+                for start in range(0, len(self.body), chunk_size):
+                    yield self.body[start:start + chunk_size]
+
+        class FakeSession:
+            def __init__(self):
+                self.requests = []
+
+            def get(self, url, headers=None, **kwargs):
+                self.requests.append(dict(headers or {}))
+                if (headers or {}).get('If-None-Match') == '"v1"':
+                    return FakeResponse(304)
+                return FakeResponse(200, html)
+
+        session = FakeSession()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            fetcher = PageFetcher({'cache_dir': tmp_dir, 'max_age': 0}, lambda: session)
+            results = [{'url': 'https://example.com/report', 'snippet': '...'}]
+            fetcher.fetch_all(results)
+            assert results[0]['content'] == "Market report The main problem is slow onboarding."
+
+            # A stale cache entry is revalidated, and a 304 reuses the cached text
+            assert fetcher.fetch('https://example.com/report') == results[0]['content']
+            assert session.requests == [{}, {'If-None-Match': '"v1"'}]
+
+        print("✓ Result pages are extracted and revalidated by ETag")
+        return True
+    except Exception as e:
+        print(f"✗ Page fetch test error: {e}")
+        return False
+
+def test_search_quota():
+    """Test that the quota scheduler coalesces queries and enforces the daily budget"""
+    try:
+        import tempfile
+        import threading
+        from src.search_quota import QuotaExceeded, QuotaScheduler
+
+        calls = []
+
+        def fetch(query):
+            def run():
+                calls.append(query)
+                time.sleep(0.2)
+                return [{'title': query}]
+            return run
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config = {'db_path': os.path.join(tmp_dir, 'quota.sqlite'),
+                      'queries_per_second': 20, 'daily_limit': 3}
+            # Two schedulers on one database behave like two processes
+            first, second = QuotaScheduler(config), QuotaScheduler(config)
+
+            results = []
+            threads = [threading.Thread(target=lambda s=s: results.append(s.run('crm', fetch('crm'))))
+                       for s in (first, second)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert calls == ['crm'] and results == [[{'title': 'crm'}]] * 2
+
+            first.run('seo', fetch('seo'))
+            second.run('ads', fetch('ads'))
+            assert first.remaining() == 0
+            try:
+                second.run('email', fetch('email'))
+                raise AssertionError("daily budget was not enforced")
+            except QuotaExceeded:
+                pass
+            assert calls == ['crm', 'seo', 'ads']
+
+        print("✓ Searches are coalesced and stay within the shared budget")
+        return True
+    except Exception as e:
+        print(f"✗ Search quota test error: {e}")
+        return False
+
+def test_query_planner():
+    """Test that near-synonym key ideas are planned as one query"""
+    try:
+        from src.query_planner import QueryPlanner
+
+        planner = QueryPlanner({'similarity_threshold': 0.6})
+        candidates = ["our customers", "social media", "the customers", "customer support",
+                      "social media marketing", "pricing plans", "the pricing plan", "new markets"]
+        weights = {"our customers": 3, "the customers": 2, "social media": 4, "pricing plans": 1,
+                   "the pricing plan": 1, "new markets": 1, "customer support": 2}
+
+        plan = planner.plan(candidates, 4, weights)
+        # "our customers" + "the customers" pool to 5 and outrank "social media"
+        assert plan == ["customers", "social media", "customer support", "pricing plans"], plan
+        assert "new markets" in planner.plan(candidates, 8, weights)
+
+        assert planner.select_new(["the customers", "brand voice"], ["customers"], 5) == ["brand voice"]
+
+        print("✓ Query planner drops near-synonyms and keeps the heaviest ideas")
+        return True
+    except Exception as e:
+        print(f"✗ Query planner test error: {e}")
+        return False
+
+def test_idea_store():
+    """Test compact idea records and copy-on-write improvements"""
+    try:
+        import json
+        from src.script_generator import ScriptGenerator
+
+        generator = ScriptGenerator()
+        profile = {'tone': 'professional', 'language': 'simple', 'cultural_elements': ['local'],
+                   'communication_preferences': ['visual content']}
+        ideas = generator.generate_ideas({}, profile, 1000)
+        assert len(ideas) == 1000 and ideas[-1]['id'] == 1000
+
+        first = ideas[0].to_dict()
+        assert set(first) == {'id', 'title', 'format', 'theme', 'angle', 'topic', 'description',
+                              'key_elements', 'estimated_duration', 'target_platforms'}
+        assert 'compelling visuals' in first['key_elements'] and 'professional tone' in first['description']
+        json.dumps(ideas.to_dicts())
+
+        improved = generator.improve_ideas([ideas[0]], {'tone_change': 'casual',
+                                                        'additional_elements': ['cliffhanger']})[0]
+        assert improved['id'] == first['id'] and 'casual tone' in improved['description']
+        assert improved['key_elements'][-1] == 'cliffhanger'
+        assert ideas[0].to_dict() == first  # the original is never mutated
+
+        # Plain dicts (e.g. from a checkpoint) improve the same way
+        from_dict = generator.improve_ideas([first], {'format_change': 'tutorial'})[0]
+        assert from_dict['format'] == 'tutorial' and from_dict['title'] == first['title']
+        assert from_dict['estimated_duration'] == '3-5 minutes'
+
+        # A whole selection is improved in one pass; key elements are rebuilt per platform set
+        calls = []
+        original_elements = generator._generate_key_elements
+        generator._generate_key_elements = lambda *args: calls.append(args) or original_elements(*args)
+        batch = generator.improve_ideas(list(ideas), {'format_change': 'webinar', 'tone_change': 'bold'})
+        assert len(batch) == 1000 and all(idea['format'] == 'webinar' for idea in batch)
+        assert len(calls) == len({tuple(idea['target_platforms']) for idea in ideas})
+        assert batch[500]['description'].startswith("This webinar") and 'bold tone' in batch[500]['description']
+
+        # Concurrent first sightings of values get one code each, and codebooks survive pickling
+        import pickle
+        import threading
+        from src.idea_store import Codebook
+
+        codebook = Codebook()
+        barrier = threading.Barrier(8)
+
+        def intern():
+            barrier.wait()
+            for i in range(2000):
+                codebook.code(f"value-{i}")
+
+        threads = [threading.Thread(target=intern) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(codebook) == 2000 and all(codebook[codebook.code(f"value-{i}")] == f"value-{i}"
+                                             for i in range(2000))
+        restored = pickle.loads(pickle.dumps(codebook))
+        assert restored.code('value-7') == codebook.code('value-7') and restored.code('new') == 2000
+        assert pickle.loads(pickle.dumps(Codebook())).code('first') == 0
+
+        # Columns hold more distinct values than a two-byte code could
+        from src.idea_store import IdeaStore
+        store = IdeaStore()
+        for value in range(70000):
+            store.codebooks['key_elements'].code((f"element-{value}",))
+        row = store.append(1, 0, key_elements=['element-69999'])
+        assert store.field(row, 'key_elements') == ('element-69999',)
+
+        print("✓ Idea store renders records lazily and improves copies")
+        return True
+    except Exception as e:
+        print(f"✗ Idea store test error: {e}")
+        return False
+
+def test_ideas_api():
+    """Test paginated, filtered and conditional /api/ideas responses"""
+    try:
+        import gzip
+        import json
+        from src.script_generator import ScriptGenerator
+        from src.ui import UserInterface
+
+        ideas = ScriptGenerator().generate_ideas({}, {'communication_preferences': []}, 2000)
+        ui = UserInterface({'port': 5000, 'page_size': 25})
+        idea_set = ui.publish_ideas(ideas)
+        client = ui.app.test_client()
+
+        response = client.get('/api/ideas', headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        page = json.loads(gzip.decompress(response.data))
+        assert page['set'] == idea_set.set_id and page['total'] == 2000
+        assert [idea['id'] for idea in page['ideas']] == list(range(1, 26)) and page['next_cursor'] == 25
+
+        etag = response.headers['ETag']
+        assert client.get('/api/ideas', headers={'If-None-Match': etag}).status_code == 304
+
+        # Walking a filtered set page by page yields exactly the matching ideas
+        expected = [idea['id'] for idea in ideas
+                    if idea['format'] == 'tutorial' and 'YouTube' in idea['target_platforms']]
+        seen, cursor = [], 0
+        while cursor is not None:
+            page = client.get(f'/api/ideas?format=tutorial&platform=YouTube&limit=7&cursor={cursor}').json
+            seen.extend(idea['id'] for idea in page['ideas'])
+            cursor = page['next_cursor']
+        assert seen == expected
+
+        facets = client.get('/api/ideas/facets').json['facets']
+        assert sum(facets['format'].values()) == 2000
+        assert client.get('/api/ideas?set=missing').status_code == 404
+
+        # Missing or malformed bodies are rejected instead of raising
+        assert client.post('/api/ideas').json['total'] == 0
+        assert client.post('/api/ideas', data='not json').json['total'] == 0
+        assert client.post('/api/ideas', json={'ideas': [{'id': 1, 'title': 'No fields'}]}).status_code == 400
+        assert client.post('/api/ideas', json={'ideas': 'nope'}).status_code == 400
+        assert client.post('/api/feedback').status_code == 200
+        assert client.post('/api/feedback', json={'selected_ideas': 3}).status_code == 400
+        assert client.post('/api/form', json=[1, 2]).status_code == 409
+        assert client.post('/api/form', json={'answers': 'yes'}).status_code == 400
+
+        print("✓ Ideas API pages, filters and revalidates")
+        return True
+    except Exception as e:
+        print(f"✗ Ideas API test error: {e}")
+        return False
+
+def test_web_server():
+    """Test prefork options, graceful reload and idea sets shared between workers"""
+    try:
+        import os
+        import signal
+        import tempfile
+        from pathlib import Path
+        from src.script_generator import ScriptGenerator
+        from src.ui import UserInterface
+        from src.web_server import WebServer
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config = {'port': 5000, 'mode': 'production', 'workers': 2, 'threads': 3,
+                      'max_requests': 1000, 'max_idea_sets': 2,
+                      'pidfile': os.path.join(tmp_dir, 'ui.pid'), 'sets_dir': os.path.join(tmp_dir, 'sets')}
+            options = WebServer(UserInterface(config), config).options()
+            assert options['bind'] == '127.0.0.1:5000' and options['workers'] == 2
+            assert options['threads'] == 3 and options['preload_app'] is True
+            assert options['max_requests_jitter'] == 100 and options['pidfile'] == config['pidfile']
+
+            # reload() signals whichever process the pidfile names; here, this one
+            if hasattr(signal, 'SIGHUP'):
+                received = []
+                previous = signal.signal(signal.SIGHUP, lambda signum, frame: received.append(signum))
+                try:
+                    Path(config['pidfile']).write_text(str(os.getpid()))
+                    assert WebServer(UserInterface(config), config).reload() == os.getpid()
+                    assert received == [signal.SIGHUP]
+                finally:
+                    signal.signal(signal.SIGHUP, previous)
+
+            # Two interfaces stand in for two workers: a set posted to one is served by the other
+            ideas = [dict(idea) for idea in
+                     ScriptGenerator().generate_ideas({}, {'communication_preferences': []}, 60)]
+            first, second = UserInterface(config).app.test_client(), UserInterface(config).app.test_client()
+            set_id = first.post('/api/ideas', json={'ideas': ideas}).json['set']
+            page = second.get(f'/api/ideas?set={set_id}&limit=5').json
+            assert page['total'] == 60 and [idea['id'] for idea in page['ideas']] == [1, 2, 3, 4, 5]
+            assert second.get('/api/ideas/facets').json['set'] == set_id
+            assert second.get('/api/ideas?set=..%2Fui').status_code == 404
+
+            # Only the newest max_idea_sets sets are kept on disk
+            for _ in range(2):
+                first.post('/api/ideas', json={'ideas': ideas[:5]})
+            assert len(list(Path(config['sets_dir']).glob('*.json'))) == 2
+            assert UserInterface(config).get_idea_set(set_id) is None
+
+        print("✓ Web server options, reload and shared idea sets work")
+        return True
+    except Exception as e:
+        print(f"✗ Web server test error: {e}")
+        return False
+
+def test_feedback_log():
+    """Test group-committed feedback events and preference-biased sampling"""
+    try:
+        import tempfile
+        import threading
+        from collections import Counter
+        from src.feedback_log import FeedbackLog
+        from src.script_generator import ScriptGenerator
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config = {'dir': tmp_dir, 'commit_interval_ms': 20, 'snapshot_every': 50}
+            log = FeedbackLog(config)
+            liked = {'format': 'tutorial', 'theme': 'innovation', 'angle': 'practical'}
+            disliked = {'format': 'webinar', 'theme': 'growth', 'angle': 'emotional'}
+
+            def record(i):
+                log.record({'ideas': [liked], 'rating': 5})
+                if i % 4 == 0:
+                    log.record({'ideas': [disliked], 'rating': 1})
+
+            threads = [threading.Thread(target=record, args=(i,)) for i in range(40)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            # Concurrent events share commits instead of syncing one by one
+            assert log._committed == 50
+            log.close()
+
+            preferences = log.preferences()
+            assert preferences['format']['tutorial'] > 0.9 and preferences['format']['webinar'] == 0.0
+            assert log.preferences('someone-else') == {}
+
+            # A new process resumes from the snapshot plus the log tail and agrees
+            reopened = FeedbackLog(config)
+            assert reopened.preferences() == preferences and reopened._offset == log._offset
+
+            ideas = ScriptGenerator().generate_ideas({}, {'communication_preferences': []}, 2000, preferences)
+            formats = Counter(idea['format'] for idea in ideas)
+            assert formats['tutorial'] > 4 * formats['interview']
+
+            # Web feedback counts for the configured client, which the next run reads
+            from src.ui import UserInterface
+            web_log = FeedbackLog(dict(config, dir=f"{tmp_dir}/web", client='team'))
+            ui = UserInterface({'port': 5000}, web_log)
+            idea_set = ui.publish_ideas(ideas[:50])
+            chosen = next(idea for idea in ideas[:50] if idea['format'] == 'tutorial')
+            client = ui.app.test_client()
+            client.post('/api/feedback', json={'set': idea_set.set_id, 'selected_ideas': [chosen['id']], 'rating': 5})
+            client.post('/api/feedback', json={'set': idea_set.set_id, 'selected_ideas': [chosen['id']],
+                                               'rating': 5, 'client': 'guest'})
+            web_log.close()
+            assert web_log.preferences()['format']['tutorial'] > 0
+            assert web_log.preferences('guest')['format']['tutorial'] > 0
+            assert web_log.preferences('127.0.0.1') == {}
+
+        print("✓ Feedback log commits, aggregates and biases ideas")
+        return True
+    except Exception as e:
+        print(f"✗ Feedback log test error: {e}")
+        return False
+
+def test_speculative_form():
+    """Test that late form answers only rerun the stages they affect"""
+    try:
+        import tempfile
+        from src.form_handler import FormHandler
+        from src.pipeline import Pipeline, Stage
+        from src.ui import UserInterface
+
+        form_handler = FormHandler()
+        calls = []
+
+        def request_form(facts):
+            form_handler.start(console=False)
+            return {}
+
+        def split_answers(form_answers):
+            return form_handler.split_answers(form_answers)
+
+        def business(facts, business_answers):
+            calls.append('business')
+            return sorted(facts + list(business_answers.values()))
+
+        def audience(analysis, audience_answers):
+            calls.append('audience')
+            return 'casual' if 'casual' in audience_answers.values() else 'professional'
+
+        def ideas(analysis, profile):
+            calls.append('ideas')
+            return [f"{profile} {fact}" for fact in analysis]
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            pipeline = Pipeline([
+                Stage('form', request_form, ['facts'], ['form_answers'], memoize=False),
+                Stage('answers', split_answers, ['form_answers'],
+                      ['business_answers', 'audience_answers'], memoize=False),
+                Stage('business', business, ['facts', 'business_answers'], ['analysis']),
+                Stage('audience', audience, ['analysis', 'audience_answers'], ['profile']),
+                Stage('ideas', ideas, ['analysis', 'profile'], ['ideas'])
+            ], cache_dir=cache_dir)
+
+            results = pipeline.run({'facts': ['bakery']})
+            assert results['ideas'] == ['professional bakery'] and form_handler.pending is not None
+
+            # The answers come in through the web form after the speculative run
+            client = UserInterface({'port': 5000}, form_handler=form_handler).app.test_client()
+            assert client.get('/api/form').json['open']
+            response = client.post('/api/form', json={'answers': {'question_7': 'casual ', 'question_8': ''}})
+            assert response.status_code == 200
+            assert client.post('/api/form', json={'answers': {}}).status_code == 409
+
+            calls.clear()
+            results = pipeline.update(results, {'form_answers': form_handler.pending.result()})
+            assert results['ideas'] == ['casual bakery']
+            # Only the audience answer changed, so the business analysis came from the cache
+            assert calls == ['audience', 'ideas']
+
+        # Unanswered or failed forms fall back to the speculative results
+        from main import wait_for_form
+        from src.run_budget import RunBudget
+
+        budget = RunBudget({'deadline_s': 0.05, 'reserve_s': 0})
+        form_handler.start(console=False)
+        assert wait_for_form(form_handler, budget, 300) == {} and budget.degraded('form')
+        assert form_handler.pending is None and not form_handler.submit({'question_1': 'late'})
+
+        form_handler.start(console=False).set_exception(EOFError())
+        assert wait_for_form(form_handler, RunBudget(), 300) == {}
+
+        # A timed-out console form stops reading, leaving stdin to the next prompt
+        import os
+        import sys
+        read_fd, write_fd = os.pipe()
+        stdin = sys.stdin
+        sys.stdin = os.fdopen(read_fd, 'r')
+        try:
+            form_handler.start(console=True)
+            budget = RunBudget({'deadline_s': 0.2, 'reserve_s': 0})
+            assert wait_for_form(form_handler, budget, 300) == {} and budget.degraded('form')
+            assert form_handler._reader is None
+            os.write(write_fd, b'y\n')
+            assert input() == 'y'
+        finally:
+            sys.stdin.close()
+            sys.stdin = stdin
+            os.close(write_fd)
+
+        print("✓ Speculative form reruns only affected stages")
+        return True
+    except Exception as e:
+        print(f"✗ Speculative form test error: {e}")
+        return False
+
+def test_run_budget():
+    """Test that stages degrade to meet their budgets and report it"""
+    try:
+        from src.business_analyzer import BusinessAnalyzer
+        from src.drive_access import GoogleDriveAccess
+        from src.run_budget import RunBudget
+        from src.text_processor import TextProcessor
+        from src.web_search import WebSearch
+
+        now = [0.0]
+        budget = RunBudget({'deadline_s': 20, 'reserve_s': 2, 'stages': {'nlp': 5},
+                            'max_relationship_entities': 3}, clock=lambda: now[0])
+
+        class SlowProcessor(TextProcessor):
+            def __init__(self):
+                self.config = {}
+
+            def process_document(self, document):
+                now[0] += 1  # each document takes a second
+                return {'text': document['content'], 'key_phrases': [], 'entities': [],
+                        'topics': [document['content']], 'language': 'en'}
+
+        documents = [{'content': f"doc{i}"} for i in range(20)]
+        processed = SlowProcessor().process_documents(documents, budget.stage('nlp'))
+        assert processed['document_count'] == 5 and budget.degraded('nlp')
+        # A sample from across the folder, kept in folder order
+        sampled = [int(text[3:]) for text in processed['full_text'].split()]
+        assert sampled == sorted(sampled) and sampled != list(range(5))
+
+        search = WebSearch({'api_key': 'test', 'search_engine_id': 'test', 'max_queries': 6})
+
+        def search_idea(idea, priority=0):
+            now[0] += 3
+            return [{'title': idea}]
+
+        search.search_idea = search_idea
+        results = search.search_related_info(['alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot'],
+                                             budget=budget.stage('search'))
+        # 13s are left before the 2s reserve, so the sixth query never starts
+        assert len(results) == 5 and budget.degraded('search')
+
+        data = {'full_text': 'business', 'key_ideas': [], 'topics': [], 'entities': ['A', 'B', 'C', 'D', 'E']}
+        analysis = BusinessAnalyzer().analyze_business(data, [], budget.stage('business_analysis'), 3)
+        assert set(analysis['relationships']) <= {'A', 'B', 'C'}
+        assert analysis['value_network']['stakeholders'] == data['entities']
+
+        report = budget.report()
+        assert report['on_time'] and [entry['stage'] for entry in report['degradations']] == \
+            ['nlp', 'search', 'business_analysis']
+
+        # Past the deadline a stage still keeps a minimal sample
+        processed = SlowProcessor().process_documents(documents, budget.stage('nlp'))
+        assert processed['document_count'] == 1
+
+        # With time to spare the full relationship pass runs and nothing is reported
+        relaxed = RunBudget({'deadline_s': 60}, clock=lambda: now[0])
+        analysis = BusinessAnalyzer().analyze_business(data, [], relaxed.stage('business_analysis'), 3)
+        assert 'E' in analysis['relationships'] and not relaxed.degradations
+
+        class SlowDrive(GoogleDriveAccess):
+            def list_files(self):
+                return [{'id': str(i), 'name': f"doc{i}"} for i in range(10)]
+
+            def iter_documents(self, items=None):
+                for item in items:
+                    now[0] += 1
+                    yield {'name': item['name'], 'content': item['name']}
+
+        drive = SlowDrive({'token_path': 'unused-token.json', 'credentials_path': 'unused.json'})
+        drive_budget = RunBudget({'stages': {'drive': 3}}, clock=lambda: now[0])
+        downloaded = drive.get_documents(drive_budget.stage('drive'))
+        assert len(downloaded) == 3 and drive_budget.degraded('drive')
+        assert [d['name'] for d in downloaded] == sorted(d['name'] for d in downloaded)
+
+        # The pipelined path stops before downloading past the deadline, not after
+        from src.pipelined_ingest import PipelinedIngest
+
+        class SlowExtractor:
+            def __init__(self):
+                self.calls = 0
+
+            def extract(self, service, item):
+                self.calls += 1
+                now[0] += 1
+                yield item['name']
+
+        class Processor:
+            def new_corpus(self):
+                return TextProcessor.new_corpus(self)
+
+            def new_topic_counter(self):
+                from src.topic_counter import TopicCounter
+                return TopicCounter()
+
+            def process_document(self, document):
+                return {'text': document['content'], 'key_phrases': [], 'entities': [],
+                        'topics': [], 'language': 'en'}
+
+        class NoSearch:
+            max_queries = 0
+
+        streaming = GoogleDriveAccess({'token_path': 'unused-token.json', 'credentials_path': 'unused.json'})
+        streaming.list_files = lambda: [{'id': str(i), 'name': f"doc{i}", 'mimeType': 'text/plain'}
+                                        for i in range(10)]
+        streaming.service = object()
+        streaming.extractor = SlowExtractor()
+        ingest_budget = RunBudget({'stages': {'ingest': 3}}, clock=lambda: now[0])
+        processed, _, _ = PipelinedIngest(streaming, Processor(), NoSearch()).run(ingest_budget.stage('ingest'))
+        # Every download made it into the run; none was thrown away after the deadline
+        assert streaming.extractor.calls == 3 and processed['document_count'] >= 1
+        assert ingest_budget.degradations[0]['detail'] == "stopped downloading after 3 documents"
+
+        print("✓ Run budget degrades stages and reports them")
+        return True
+    except Exception as e:
+        print(f"✗ Run budget test error: {e}")
+        return False
+
+def _broker_worker(directory, action, barrier, worker):
+    """One process of the credential broker test: consent flow or refresh with a counted stub"""
+    from datetime import datetime, timedelta, timezone
+    from pathlib import Path
+    from google.oauth2.credentials import Credentials
+    from src.credential_broker import CredentialBroker
+
+    directory = Path(directory)
+    broker = CredentialBroker(directory / 'token.json', ['scope'])
+
+    def count(name):
+        with open(directory / name, 'a') as calls:
+            calls.write(f"{worker}\n")
+
+    def fresh_creds(token):
+        return Credentials(token, refresh_token='refresh', client_id='id', client_secret='secret',
+                           token_uri='https://oauth2.googleapis.com/token', scopes=['scope'],
+                           expiry=datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=1))
+
+    if action == 'authorize':
+        def run_flow():
+            count('flows')
+            return fresh_creds('consented')
+
+        barrier.wait()
+        creds = broker.authorize(run_flow)
+    else:
+        def refresh(self, request):
+            count('refreshes')
+            self.token = 'refreshed'
+            self.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=1)
+
+        Credentials.refresh = refresh
+        creds = broker.load()
+        # Everyone holds the expired token before anyone refreshes it
+        barrier.wait()
+        broker.refresh(creds)
+    (directory / f"token-{worker}").write_text(creds.token)
+
+
+def test_credential_broker_processes():
+    """Test that six processes sharing a token run one consent flow and one refresh"""
+    try:
+        import multiprocessing
+        import tempfile
+        from datetime import datetime, timedelta, timezone
+        from pathlib import Path
+        from google.oauth2.credentials import Credentials
+        from src.credential_broker import CredentialBroker
+
+        def run_workers(directory, action):
+            barrier = multiprocessing.Barrier(6)
+            workers = [multiprocessing.Process(target=_broker_worker, args=(directory, action, barrier, i))
+                       for i in range(6)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join(30)
+                assert worker.exitcode == 0, f"{action} worker failed"
+            return {Path(directory, f"token-{i}").read_text() for i in range(6)}
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            assert run_workers(tmp_dir, 'authorize') == {'consented'}
+            assert len(Path(tmp_dir, 'flows').read_text().split()) == 1
+
+            expired = Credentials('stale', refresh_token='refresh', client_id='id', client_secret='secret',
+                                  token_uri='https://oauth2.googleapis.com/token', scopes=['scope'],
+                                  expiry=datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(minutes=5))
+            CredentialBroker(Path(tmp_dir, 'token.json'), ['scope']).save(expired)
+            assert run_workers(tmp_dir, 'refresh') == {'refreshed'}
+            assert len(Path(tmp_dir, 'refreshes').read_text().split()) == 1
+
+        print("✓ Processes sharing a token run one consent flow and one refresh")
+        return True
+    except Exception as e:
+        print(f"✗ Credential broker test error: {e}")
+        return False
+
+
+class _FakeDriveFiles:
+    """Drive ``files()`` resource answering list/get from an in-memory folder tree"""
+
+    def __init__(self, drive):
+        self.drive = drive
+
+    def list(self, q, pageSize, pageToken, fields):
+        folder_id = q.split("'")[1]
+        self.drive.listed.append(folder_id)
+        children = self.drive.tree.get(folder_id, [])
+        start = int(pageToken or 0)
+        # Two children per page, so paging is followed too
+        page = {'files': children[start:start + 2]}
+        if start + 2 < len(children):
+            page['nextPageToken'] = str(start + 2)
+        return _FakeDriveRequest(page)
+
+    def get(self, fileId, fields):
+        return _FakeDriveRequest(self.drive.items[fileId])
+
+
+class _FakeDriveRequest:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self):
+        return self.result
+
+
+class _FakeDriveService:
+    """Stand-in for the Drive v3 client used by the folder tree test"""
+
+    FOLDER = 'application/vnd.google-apps.folder'
+    SHORTCUT = 'application/vnd.google-apps.shortcut'
+
+    def __init__(self):
+        folder, shortcut, text = self.FOLDER, self.SHORTCUT, 'text/plain'
+        self.items = {
+            'reports': {'id': 'reports', 'name': 'Reports', 'mimeType': folder},
+            'old': {'id': 'old', 'name': 'Old', 'mimeType': folder},
+            'archive': {'id': 'archive', 'name': 'Archive', 'mimeType': folder},
+            'plan': {'id': 'plan', 'name': 'plan.txt', 'mimeType': text},
+            'notes': {'id': 'notes', 'name': 'notes.txt', 'mimeType': text},
+            'deep': {'id': 'deep', 'name': 'deep.txt', 'mimeType': text},
+            'kept': {'id': 'kept', 'name': 'kept.txt', 'mimeType': text},
+            'sheet': {'id': 'sheet', 'name': 'budget', 'mimeType': 'application/vnd.google-apps.spreadsheet'},
+            'photo': {'id': 'photo', 'name': 'logo.png', 'mimeType': 'image/png'}
+        }
+        self.tree = {
+            'root': [self.items['reports'], self.items['archive'], self.items['plan'], self.items['sheet'],
+                     {'id': 's1', 'name': 'Shared notes.txt', 'mimeType': shortcut,
+                      'shortcutDetails': {'targetId': 'notes'}},
+                     {'id': 's2', 'name': 'Reports again', 'mimeType': shortcut,
+                      'shortcutDetails': {'targetId': 'reports'}},
+                     {'id': 's3', 'name': 'Logo', 'mimeType': shortcut,
+                      'shortcutDetails': {'targetId': 'photo'}}],
+            # notes.txt has two parents: the root shortcut and this folder
+            'reports': [self.items['notes'], self.items['old'], self.items['kept']],
+            'old': [self.items['deep']],
+            'archive': [{'id': 'hidden', 'name': 'hidden.txt', 'mimeType': text}]
+        }
+        self.listed = []
+
+    def files(self):
+        return _FakeDriveFiles(self)
+
+
+def test_drive_tree():
+    """Test recursive folder listing: depth limit, patterns, shortcuts and multi-parent files"""
+    try:
+        import tempfile
+        from src.drive_access import GoogleDriveAccess
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            def listing(**options):
+                service = _FakeDriveService()
+                drive = GoogleDriveAccess(dict({'token_path': f"{tmp_dir}/token.json",
+                                                'credentials_path': f"{tmp_dir}/credentials.json",
+                                                'folder_id': 'root', 'recursive': True, 'list_workers': 3},
+                                               **options))
+                # Worker threads build their own clients; hand them the fake as well
+                drive.service = service
+                drive._build_service = lambda: service
+                return {item['path']: item['id'] for item in drive.list_files()}, service
+
+            files, service = listing(exclude=['Archive'], include=['*.txt', 'budget'])
+            assert files == {'plan.txt': 'plan', 'budget': 'sheet', 'Shared notes.txt': 'notes',
+                             'Reports/kept.txt': 'kept', 'Reports/Old/deep.txt': 'deep'}
+            # The shortcut to Reports is not listed a second time, and Archive not at all
+            assert sorted(service.listed) == ['old', 'reports', 'reports', 'root', 'root', 'root', 'root']
+
+            files, _ = listing(max_depth=1, include=['*.txt'])
+            assert files == {'plan.txt': 'plan', 'Shared notes.txt': 'notes', 'Archive/hidden.txt': 'hidden',
+                             'Reports/kept.txt': 'kept'}
+
+            files, _ = listing(exclude=['Reports/*'])
+            assert set(files) == {'plan.txt', 'budget', 'Shared notes.txt', 'Archive/hidden.txt'}
+
+        print("✓ Drive folder tree listing follows depth, patterns and shortcuts")
+        return True
+    except Exception as e:
+        print(f"✗ Drive folder tree test error: {e}")
+        return False
+
+
+def test_drive_startup():
+    """Test deferred Drive authentication, the cached discovery document and background token refresh"""
+    try:
+        import tempfile
+        import threading
+        from datetime import datetime, timedelta, timezone
+        from src.drive_access import GoogleDriveAccess
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config = {'token_path': f"{tmp_dir}/token.json", 'credentials_path': f"{tmp_dir}/credentials.json",
+                      'folder_id': 'root', 'discovery_path': f"{tmp_dir}/drive.json", 'refresh_margin': 60}
+
+            # Constructing the client neither authenticates nor builds a service
+            calls = []
+            original_authenticate = GoogleDriveAccess.authenticate
+            GoogleDriveAccess.authenticate = lambda self: calls.append('authenticate')
+            try:
+                drive = GoogleDriveAccess(config)
+            finally:
+                GoogleDriveAccess.authenticate = original_authenticate
+            assert calls == [] and drive.creds is None and drive._service is None
+
+            # The discovery document comes from the local copy, with no discovery request
+            import googleapiclient.discovery as discovery
+            with open(config['discovery_path'], 'w', encoding='utf-8') as f:
+                f.write('{"name": "drive", "version": "v3", "cached": true}')
+            built = []
+            original_cache = GoogleDriveAccess._discovery_document
+            original_build, original_from_document = discovery.build, discovery.build_from_document
+            GoogleDriveAccess._discovery_document = None
+            discovery.build = lambda *args, **kwargs: built.append('network')
+            discovery.build_from_document = lambda document, credentials=None: built.append(document)
+            try:
+                drive._build_service()
+            finally:
+                GoogleDriveAccess._discovery_document = original_cache
+                discovery.build, discovery.build_from_document = original_build, original_from_document
+            assert built == ['{"name": "drive", "version": "v3", "cached": true}']
+
+            # A token about to expire is refreshed in the background and the next refresh rescheduled
+            class Credentials:
+                refresh_token = 'refresh'
+
+                def __init__(self, expires_in):
+                    self.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=expires_in)
+
+            refreshed = threading.Event()
+            running = []
+
+            class Broker:
+                def refresh(self, creds):
+                    creds.expiry += timedelta(hours=1)
+                    running.append(drive._refresh_timer)
+                    refreshed.set()
+
+            drive.credential_broker = Broker()
+            drive.creds = Credentials(30)  # already inside the refresh margin
+            drive._schedule_refresh()
+            try:
+                assert refreshed.wait(5)
+                assert drive.creds.expiry - datetime.now(timezone.utc).replace(tzinfo=None) > timedelta(minutes=50)
+                def rescheduled():
+                    timer = drive._refresh_timer
+                    return timer not in (None, running[0]) and timer.is_alive()
+
+                for _ in range(500):
+                    if rescheduled():
+                        break
+                    threading.Event().wait(0.01)
+                assert rescheduled()
+            finally:
+                drive.close()
+            assert drive._refresh_timer is None
+
+        print("✓ Drive access defers auth, uses the cached discovery document and refreshes in the background")
+        return True
+    except Exception as e:
+        print(f"✗ Drive startup test error: {e}")
+        return False
+
+
+def _corpus_store_append(directory, worker):
+    """Appends from one worker process for the corpus store test"""
+    from src.corpus_store import CorpusStore
+
+    store = CorpusStore(directory)
+    for i in range(20):
+        store.append(f"w{worker}-{i}", '1', f"doc {i}", 'text/plain',
+                     (f"worker {worker} document {i} part {part}\n".encode('utf-8') for part in range(50)))
+
+
+def test_corpus_store():
+    """Test corpus store appends, lookups, reopening and recovery from torn writes"""
+    try:
+        import json
+        import pickle
+        import tempfile
+        from concurrent.futures import ProcessPoolExecutor
+        from src.corpus_store import CorpusStore
+
+        with tempfile.TemporaryDirectory() as store_dir:
+            store = CorpusStore(store_dir)
+            first = store.append('a', 'v1', 'A', 'text/plain', 'Café menu'.encode('utf-8'))
+            second = store.append('b', 'v1', 'B', 'text/plain', [b'chunk one, ', b'chunk two'])
+            assert store.lookup('a', 'v1') == first and store.lookup('a', 'v2') is None
+            assert store.lookup('missing', 'v1') is None
+            assert bytes(store.view(second)) == b'chunk one, chunk two'
+            document = store.document(first)
+            assert document['content'] == 'Café menu' and dict(document)['name'] == 'A'
+            assert pickle.loads(pickle.dumps(document))['content'] == 'Café menu'
+
+            # A newer version supersedes the old entry, also after reopening
+            store.append('a', 'v2', 'A', 'text/plain', b'New menu')
+            reopened = CorpusStore(store_dir)
+            assert reopened.lookup('a', 'v1') is None
+            assert reopened.document(reopened.lookup('a', 'v2'))['content'] == 'New menu'
+            assert bytes(reopened.view(reopened.lookup('b', 'v1'))) == b'chunk one, chunk two'
+
+            # A torn last line, or an entry whose bytes never reached the blob, is ignored
+            with open(store.index_path, 'a', encoding='utf-8') as index:
+                index.write(json.dumps({'id': 'c', 'version': 'v1', 'name': 'C', 'type': 'text/plain',
+                                        'offset': 10 ** 6, 'length': 5}) + '\n')
+                index.write('{"id": "d", "vers')
+            recovered = CorpusStore(store_dir)
+            assert set(recovered.entries) == {'a', 'b'}
+            assert recovered.document(recovered.lookup('a', 'v2'))['content'] == 'New menu'
+
+        # Worker processes appending to one store never interleave their bytes
+        with tempfile.TemporaryDirectory() as store_dir:
+            with ProcessPoolExecutor(max_workers=4) as executor:
+                list(executor.map(_corpus_store_append, [store_dir] * 4, range(4)))
+            store = CorpusStore(store_dir)
+            assert len(store.entries) == 80
+            for worker in range(4):
+                for i in range(20):
+                    content = store.document(store.lookup(f"w{worker}-{i}", '1'))['content']
+                    assert content == ''.join(f"worker {worker} document {i} part {part}\n" for part in range(50))
+
+        print("✓ Corpus store appends, reopens and recovers from torn writes")
+        return True
+    except Exception as e:
+        print(f"✗ Corpus store test error: {e}")
+        return False
+
+
+class _ShardTestDrive:
+    """Drive stand-in for the sharding test; worker processes need it importable"""
+
+    def __init__(self, texts):
+        self.items = [{'id': f"file{i}", 'name': f"doc{i}", 'modifiedTime': '1'} for i in range(len(texts))]
+        self.texts = {item['id']: text for item, text in zip(self.items, texts)}
+
+    def list_files(self):
+        return self.items
+
+    def iter_documents(self, items=None):
+        for item in (self.items if items is None else items):
+            yield {'name': item['name'], 'content': self.texts[item['id']]}
+
+
+class _ShardTestProcessor:
+    """Deterministic stand-in for ``TextProcessor.process_document``"""
+
+    def __init__(self, config=None):
+        self.config = config or {}
+
+    def process_document(self, document):
+        import re
+
+        text = document['content']
+        words = re.findall(r"\w+", text)
+        return {
+            'text': text,
+            'key_phrases': [f"{a} {b}".lower() for a, b in zip(words, words[1:])][:20],
+            'entities': [(m.group(), m.start()) for m in re.finditer(r"\b[A-Z]\w+", text)],
+            'topics': [word.lower() for word in words],
+            'language': 'en'
+        }
+
+
+def _shard_test_components(config):
+    return _ShardTestDrive(config['texts']), _ShardTestProcessor(config.get('nlp'))
+
+
+def _unavailable_components(config):
+    raise RuntimeError("shard should have been reused")
+
+
+def test_sharded_processing():
+    """Test that sharded map/reduce in several processes matches one machine"""
+    try:
+        import random
+        import tempfile
+        from src.sharding import CorpusPartial, ShardedIngest
+        from src.text_processor import CorpusBuilder
+        from src.topic_counter import TopicCounter
+        from src.vocabulary import Vocabulary
+
+        rng = random.Random(7)
+        names = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Stark', 'Wayne', 'Hooli']
+        words = ['growth', 'market', 'video', 'customer', 'service', 'brand', 'content']
+        texts = [' '.join(rng.choice(names + words * 2) for _ in range(rng.randint(5, 40))) for _ in range(30)]
+
+        corpus = CorpusBuilder(TopicCounter())
+        for document in _ShardTestDrive(texts).iter_documents():
+            corpus.add(_ShardTestProcessor().process_document(document))
+        expected = corpus.result()
+
+        with tempfile.TemporaryDirectory() as shard_dir:
+            config = {'texts': texts, 'sharding': {'shards': 5, 'workers': 3, 'dir': shard_dir}}
+            result = ShardedIngest(config, _ShardTestDrive(texts), _shard_test_components).run()
+
+            for key in ('full_text', 'document_count', 'languages'):
+                assert result[key] == expected[key], key
+            # Equal counts; only the order of ties may differ
+            assert dict(result['topics']) == dict(expected['topics'])
+            merged, single = result['vocabulary'], expected['vocabulary']
+            assert merged.terms == single.terms and merged.counts == single.counts
+            assert merged.doc_counts == single.doc_counts and merged.first_offsets == single.first_offsets
+            entity_ids = list(single.ids(single.ENTITY))
+            assert list(merged.cooccurring(entity_ids, 30)) == list(single.cooccurring(entity_ids, 30))
+
+            # Saved partials are reused instead of mapping the shards again
+            again = ShardedIngest(config, _ShardTestDrive(texts), _unavailable_components).run()
+            assert again['full_text'] == expected['full_text']
+
+            # Removing a file only invalidates its own shard; the others move to their new positions
+            from src.sharding import partition, shard_of
+            shrunk = _ShardTestDrive(texts)
+            shrunk.items = shrunk.items[1:]
+            ingest = ShardedIngest(config, shrunk, _shard_test_components)
+            stale = [index for index, shard in enumerate(partition(shrunk.items, 5))
+                     if ingest.load(index, shard) is None]
+            assert stale == [shard_of('file0', 5)]
+            corpus = CorpusBuilder(TopicCounter())
+            for document in shrunk.iter_documents():
+                corpus.add(_ShardTestProcessor().process_document(document))
+            expected_shrunk = corpus.result()
+            result = ingest.run()
+            for key in ('full_text', 'document_count'):
+                assert result[key] == expected_shrunk[key], key
+            assert result['vocabulary'].terms == expected_shrunk['vocabulary'].terms
+            assert result['vocabulary'].first_offsets == expected_shrunk['vocabulary'].first_offsets
+
+            # Partials built with another topic capacity are mapped again, and the reducer keeps it
+            import json
+            from pathlib import Path
+            small = dict(config, nlp={'topic_capacity': 3})
+            ShardedIngest(small, _ShardTestDrive(texts), _shard_test_components).run()
+            saved = [json.loads(path.read_text()) for path in Path(shard_dir).glob('partial-*.json')]
+            assert {entry['partial']['topics']['capacity'] for entry in saved} == {3}
+            assert len(ShardedIngest(small, _ShardTestDrive(texts), _unavailable_components).run()['topics']) <= 7
+
+            # Shard numbers outside the configured range are rejected
+            from main import map_shard
+            try:
+                ShardedIngest(config, _ShardTestDrive(texts), _shard_test_components).map(5)
+                assert False, "expected a ValueError"
+            except ValueError:
+                pass
+            assert map_shard(config, -1) is False
+
+        # Partials merge the same way in any grouping
+        partials = []
+        for position, document in enumerate(_ShardTestDrive(texts).iter_documents()):
+            partial = CorpusPartial()
+            partial.add(position, _ShardTestProcessor().process_document(document))
+            partials.append(CorpusPartial.from_dict(partial.to_dict()))
+        reduced = CorpusPartial()
+        for partial in reversed(partials):
+            reduced.merge(partial)
+        key_ideas = reduced.result()['vocabulary'].terms_of(Vocabulary.KEY_IDEA)
+        assert key_ideas == expected['vocabulary'].terms_of(Vocabulary.KEY_IDEA)
+
+        print("✓ Sharded processing matches single-machine results")
+        return True
+    except Exception as e:
+        print(f"✗ Sharded processing test error: {e}")
+        return False
+
 if __name__ == "__main__":
     print("Testing Business Content Agent...")
     print("=" * 40)
@@ -79,7 +1655,32 @@ if __name__ == "__main__":
     tests = [
         ("Main imports", test_main_imports),
         ("Config loading", test_config_loading),
-        ("Basic functionality", test_basic_functionality)
+        ("Basic functionality", test_basic_functionality),
+        ("Topic counter", test_topic_counter),
+        ("Duplicate detector", test_duplicate_detector),
+        ("Vocabulary relationships", test_vocabulary_relationships),
+        ("Pipelined ingest", test_pipelined_ingest),
+        ("Pipeline resume", test_pipeline_resume),
+        ("Checkpoint round trip", test_checkpoint_roundtrip),
+        ("Checkpoint resume", test_checkpoint_resume),
+        ("DOCX extraction", test_docx_extraction),
+        ("Import time", test_import_time),
+        ("Daemon round trip", test_daemon_roundtrip),
+        ("Language model pool", test_language_model_pool),
+        ("Page fetch cache", test_page_fetch_cache),
+        ("Search quota", test_search_quota),
+        ("Query planner", test_query_planner),
+        ("Idea store", test_idea_store),
+        ("Ideas API", test_ideas_api),
+        ("Web server", test_web_server),
+        ("Feedback log", test_feedback_log),
+        ("Speculative form", test_speculative_form),
+        ("Run budget", test_run_budget),
+        ("Credential broker", test_credential_broker_processes),
+        ("Drive folder tree", test_drive_tree),
+        ("Drive startup", test_drive_startup),
+        ("Corpus store", test_corpus_store),
+        ("Sharded processing", test_sharded_processing)
     ]
 
     passed = 0